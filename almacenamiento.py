@@ -0,0 +1,819 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import metricas
+from compacto import COLUMNAS_APUESTA, COLUMNAS_MOVIMIENTO, Apuestas, Movimientos, a_json
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+# Archivos de datos
+DIRECTORIO_DATOS = 'data'
+NOMBRE_DATOS = 'tournament_data.json'
+NOMBRE_DIARIO = 'tournament_journal.jsonl'
+NOMBRE_SQLITE = 'tournament.db'
+NOMBRE_COLUMNAR = 'tournament_data.bin'
+NOMBRE_BLOQUEO = 'tournament.lock'
+NOMBRE_METRICAS = 'metrics.prom'
+NOMBRE_ESPECTADOR_JSON = 'spectator.json'
+NOMBRE_ESPECTADOR_HTML = 'spectator.html'
+NOMBRE_CONFIGURACION = 'league.json'
+RUTA_DATOS = os.path.join(DIRECTORIO_DATOS, NOMBRE_DATOS)
+
+# Cada cuántos eventos del diario se reescribe la foto completa
+COMPACTAR_CADA = 500
+
+# Eventos que se conservan al compactar (ya están en la foto y al cargar se
+# saltan): con ellos, un proceso un poco atrasado se pone al día sin recargar
+DIARIO_RETENIDO = 200
+
+# Torneos: el predeterminado usa data/ y cada uno de los demás data/<id>/,
+# que existe si tiene su league.json
+TORNEO_PREDETERMINADO = 'principal'
+PATRON_TORNEO = re.compile(r'[A-Za-z0-9_-]{1,40}')
+
+# Jugadores predeterminados (10 jugadores)
+JUGADORES_PREDETERMINADOS = [
+    "Tomás", "Lezcano", "Bawe", "Juanda", "Fili",
+    "Higinio", "David", "Anto", "Cata", "Aleja"
+]
+
+GRUPOS_PREDETERMINADOS = {
+    "Grupo A": ["Liverpool", "Atlético Nacional", "Barcelona", "Manchester City"],
+    "Grupo B": ["Real Madrid", "AC Milán", "Independiente Medellín", "PSG"]
+}
+
+ADMIN_PREDETERMINADO = "Aleja"
+
+def jugador_nuevo():
+    return {
+        "dinero": 1000,
+        "apuestas_ganadas": 0,
+        "apuestas_perdidas": 0
+    }
+
+def datos_iniciales(grupos=None, jugadores=None):
+    """Estado de un torneo recién creado (con los grupos y jugadores predeterminados si no se dan)"""
+    return {
+        "groups": {grupo: list(equipos) for grupo, equipos in (grupos or GRUPOS_PREDETERMINADOS).items()},
+        "players": {
+            jugador: jugador_nuevo() for jugador in (jugadores or JUGADORES_PREDETERMINADOS)
+        },
+        "matches": [],
+        "semifinals": [],
+        "final": None,
+        "third_place": None,
+        "phase": "groups",
+        "bets": Apuestas(),
+        "ledger": Movimientos(),
+        "secuencia": 0
+    }
+
+def completar_jugadores(data, jugadores=JUGADORES_PREDETERMINADOS):
+    """Asegura que todos los jugadores del torneo existan"""
+    for jugador in jugadores:
+        if jugador not in data["players"]:
+            data["players"][jugador] = jugador_nuevo()
+    return data
+
+def _agregar_apuesta(data, apuesta, seq):
+    data["players"][apuesta["jugador"]]["dinero"] -= apuesta["monto"]
+    data["bets"].append(apuesta)
+    data["ledger"].append({"seq": seq, "apuesta": len(data["bets"]) - 1,
+                           "jugador": apuesta["jugador"], "concepto": "apuesta", "monto": -apuesta["monto"]})
+
+def aplicar_evento(data, evento):
+    """Aplica un evento del diario sobre el estado del torneo"""
+    tipo = evento["tipo"]
+
+    if tipo == "apuesta":
+        _agregar_apuesta(data, evento["apuesta"], evento["seq"])
+    elif tipo == "resultado":
+        # Apuestas que llegan junto con los resultados (importación masiva):
+        # van antes que los partidos, así que ya se liquidan en este evento
+        for apuesta in evento.get("apuestas", ()):
+            _agregar_apuesta(data, apuesta, evento["seq"])
+
+        for partido in evento["partidos"]:
+            if partido.get("fase") == "groups":
+                data["matches"].append(partido)
+            elif partido.get("fase") == "semifinals":
+                data["semifinals"].append(partido)
+
+        for liquidacion in evento["liquidaciones"]:
+            apuesta = data["bets"][liquidacion["apuesta"]]
+            if apuesta.get("procesada", False):
+                # Ya liquidada: nunca pagar dos veces
+                continue
+            jugador = data["players"][apuesta["jugador"]]
+            if liquidacion["resultado"] == "GANADA":
+                jugador["dinero"] += liquidacion["ganancias"]
+                jugador["apuestas_ganadas"] += 1
+            else:
+                jugador["apuestas_perdidas"] += 1
+            apuesta["resultado"] = liquidacion["resultado"]
+            apuesta["ganancias"] = liquidacion["ganancias"]
+            apuesta["procesada"] = True
+            data["ledger"].append({"seq": evento["seq"], "apuesta": liquidacion["apuesta"],
+                                   "jugador": apuesta["jugador"], "concepto": "liquidacion",
+                                   "monto": liquidacion["ganancias"]})
+    elif tipo == "fase":
+        data["phase"] = evento["fase"]
+    elif tipo == "reinicio":
+        # Vuelve al inicio con los mismos grupos y jugadores. Clave por clave y
+        # sin vaciar antes el dict: quien lo lee sin bloqueo nunca lo ve vacío
+        iniciales = datos_iniciales(data["groups"], list(data["players"]))
+        for clave in data.keys() - iniciales.keys():
+            del data[clave]
+        data.update(iniciales)
+    else:
+        raise ValueError(f"Evento desconocido: {tipo}")
+
+    data["secuencia"] = evento["seq"]
+
+def cambios_del_evento(data, evento):
+    """Lo que agregará un evento, calculado antes de aplicarlo y sin tocar data.
+
+    Devuelve las apuestas nuevas como pares (índice, apuesta) y las
+    liquidaciones que de verdad se van a aplicar como pares (liquidación,
+    jugador): sin las de apuestas ya procesadas ni las repetidas, igual que
+    aplicar_evento. Sirve también de comprobación: KeyError si una apuesta
+    es de un jugador que no existe, IndexError si se liquida una que no hay.
+    """
+    tipo = evento["tipo"]
+    if tipo not in ("apuesta", "resultado", "fase", "reinicio"):
+        raise ValueError(f"Evento desconocido: {tipo}")
+    primera = len(data["bets"])
+    if tipo == "apuesta":
+        nuevas = [evento["apuesta"]]
+    else:
+        nuevas = list(evento.get("apuestas", ())) if tipo == "resultado" else []
+    faltan = {apuesta["jugador"] for apuesta in nuevas} - data["players"].keys()
+    if faltan:
+        raise KeyError(f"Jugadores que no existen: {', '.join(sorted(faltan))}")
+
+    liquidaciones = []
+    procesadas = set()
+    for liquidacion in evento.get("liquidaciones", ()) if tipo == "resultado" else ():
+        indice = liquidacion["apuesta"]
+        apuesta = data["bets"][indice] if indice < primera else nuevas[indice - primera]
+        if indice in procesadas or apuesta.get("procesada", False):
+            continue
+        procesadas.add(indice)
+        liquidaciones.append((liquidacion, apuesta["jugador"]))
+    return [(primera + i, apuesta) for i, apuesta in enumerate(nuevas)], liquidaciones
+
+def movimientos_del_evento(data, evento):
+    """Movimientos del ledger que generó un evento ya aplicado (están al final)"""
+    ledger = data["ledger"]
+    inicio = len(ledger)
+    while inicio > 0 and ledger[inicio - 1]["seq"] == evento["seq"]:
+        inicio -= 1
+    return ledger[inicio:]
+
+def escribir_json(data, ruta):
+    """Escribe el torneo en el formato JSON de siempre (el que importan los almacenes)"""
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False, default=a_json)
+
+def directorio_torneo(torneo):
+    """Directorio de datos de un torneo; ValueError si el id no es válido"""
+    if not PATRON_TORNEO.fullmatch(torneo or ''):
+        raise ValueError(f"Id de torneo no válido: {torneo!r}")
+    if torneo == TORNEO_PREDETERMINADO:
+        return DIRECTORIO_DATOS
+    return os.path.join(DIRECTORIO_DATOS, torneo)
+
+def existe_torneo(torneo):
+    try:
+        directorio = directorio_torneo(torneo)
+    except ValueError:
+        return False
+    return torneo == TORNEO_PREDETERMINADO or os.path.isfile(os.path.join(directorio, NOMBRE_CONFIGURACION))
+
+def _textos(valor):
+    return isinstance(valor, list) and bool(valor) and all(isinstance(texto, str) and texto for texto in valor)
+
+# Forma que debe tener cada clave de league.json
+VALIDAR_CONFIGURACION = {
+    "nombre": lambda valor: isinstance(valor, str) and bool(valor.strip()),
+    "admin": lambda valor: isinstance(valor, str) and bool(valor),
+    "jugadores": _textos,
+    "grupos": lambda valor: isinstance(valor, dict) and bool(valor) and all(map(_textos, valor.values())),
+}
+
+def leer_configuracion(directorio):
+    """Nombre, grupos, jugadores y administrador del torneo: league.json sobre los predeterminados.
+
+    Un archivo que no se puede leer o una clave con un valor inválido no
+    impiden abrir el torneo: se usan los predeterminados y el problema queda
+    en ``errores`` (lista de textos) para mostrárselo al administrador.
+    """
+    configuracion = {
+        "nombre": "Liga FIFA",
+        "grupos": GRUPOS_PREDETERMINADOS,
+        "jugadores": JUGADORES_PREDETERMINADOS,
+        "admin": ADMIN_PREDETERMINADO,
+        "errores": []
+    }
+    try:
+        with open(os.path.join(directorio, NOMBRE_CONFIGURACION), encoding='utf-8') as f:
+            leida = json.load(f)
+    except FileNotFoundError:
+        return configuracion
+    except (OSError, ValueError) as error:
+        configuracion["errores"].append(f"No se pudo leer {NOMBRE_CONFIGURACION}: {error}")
+        return configuracion
+    if not isinstance(leida, dict):
+        configuracion["errores"].append(f"{NOMBRE_CONFIGURACION} debe ser un objeto JSON")
+        return configuracion
+    for clave, valor in leida.items():
+        if clave not in VALIDAR_CONFIGURACION:
+            configuracion["errores"].append(f"Clave desconocida en {NOMBRE_CONFIGURACION}: {clave!r}")
+        elif not VALIDAR_CONFIGURACION[clave](valor):
+            configuracion["errores"].append(f"Valor inválido para {clave!r} en {NOMBRE_CONFIGURACION}; "
+                                            "se usa el predeterminado")
+        else:
+            configuracion[clave] = valor
+    return configuracion
+
+@contextmanager
+def bloqueo_archivo(ruta):
+    """Bloqueo exclusivo entre procesos sobre un archivo .lock"""
+    os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+    with open(ruta, 'a') as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+class AlmacenJSON:
+    """Foto JSON del torneo más un diario de eventos de solo anexado"""
+
+    NOMBRE_FOTO = NOMBRE_DATOS
+
+    def __init__(self, directorio=DIRECTORIO_DATOS):
+        self.directorio = directorio
+        self.configuracion = leer_configuracion(directorio)
+        self.ruta_datos = os.path.join(directorio, self.NOMBRE_FOTO)
+        self.ruta_diario = os.path.join(directorio, NOMBRE_DIARIO)
+        # Eventos escritos en el diario desde la última foto
+        self.eventos_en_diario = 0
+        # Foto, diario y posición en el diario que ya conoce este proceso
+        self._firma = None
+        self._offset = 0
+        # Si el hilo tiene el bloqueo del torneo (solo entonces se repara el diario)
+        self._hilo = threading.local()
+
+    @contextmanager
+    def bloqueo(self):
+        with bloqueo_archivo(os.path.join(self.directorio, NOMBRE_BLOQUEO)):
+            self._hilo.bloqueado = True
+            try:
+                yield
+            finally:
+                self._hilo.bloqueado = False
+
+    def _firma_archivos(self):
+        """Identidad de la foto y del diario: cambia al compactar o reiniciar"""
+        try:
+            info = os.stat(self.ruta_datos)
+            foto = (info.st_ino, info.st_mtime_ns, info.st_size)
+        except FileNotFoundError:
+            foto = None
+        try:
+            # El diario solo crece mientras es el mismo archivo; compactar lo reemplaza
+            diario = os.stat(self.ruta_diario).st_ino
+        except FileNotFoundError:
+            diario = None
+        return (foto, diario)
+
+    def _leer_diario(self, desde, offset=0):
+        """Lee los eventos posteriores a la secuencia indicada a partir de offset.
+
+        Devuelve los eventos, el offset tras la última línea completa y la
+        secuencia del primer evento leído (None si no había ninguno).
+        """
+        try:
+            with open(self.ruta_diario, 'rb') as f:
+                f.seek(offset)
+                contenido = f.read()
+        except FileNotFoundError:
+            return [], 0, None
+
+        # Una línea sin salto final está a medio escribir (o la dejó una caída)
+        completo = contenido[:contenido.rfind(b"\n") + 1]
+        eventos = []
+        primera = None
+        for linea in completo.decode('utf-8').splitlines():
+            try:
+                evento = json.loads(linea)
+            except json.JSONDecodeError as error:
+                # Saltarla perdería ese evento y todos los siguientes
+                raise ValueError(f"{self.ruta_diario}: línea ilegible después de la secuencia {desde}") from error
+            if primera is None:
+                primera = evento["seq"]
+            if evento["seq"] > desde:
+                eventos.append(evento)
+        return eventos, offset + len(completo), primera
+
+    def _reparar_diario(self):
+        """Quita la línea a medio escribir que haya dejado una caída al final del diario.
+
+        Solo con el bloqueo del torneo: sin él, la línea incompleta puede ser
+        la de otro proceso que está escribiendo.
+        """
+        try:
+            with open(self.ruta_diario, 'r+b') as f:
+                contenido = f.read()
+                if contenido and not contenido.endswith(b"\n"):
+                    f.truncate(contenido.rfind(b"\n") + 1)
+        except FileNotFoundError:
+            pass
+
+    def _recortar_diario(self):
+        """Reemplaza el diario por sus últimos DIARIO_RETENIDO eventos; devuelve su tamaño"""
+        try:
+            with open(self.ruta_diario, 'rb') as f:
+                lineas = f.read().splitlines(keepends=True)
+        except FileNotFoundError:
+            lineas = []
+        lineas = [linea for linea in lineas if linea.endswith(b"\n")][-DIARIO_RETENIDO:]
+        temporal = self.ruta_diario + '.tmp'
+        with open(temporal, 'wb') as f:
+            f.writelines(lineas)
+        os.replace(temporal, self.ruta_diario)
+        return sum(map(len, lineas))
+
+    def _leer_foto(self):
+        with open(self.ruta_datos, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        data["bets"] = Apuestas(data.get("bets", []))
+        data["ledger"] = Movimientos(data.get("ledger", []))
+        return data
+
+    def _escribir_foto(self, ruta, data):
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False, default=a_json)
+            f.flush()
+            os.fsync(f.fileno())
+
+    @metricas.medido("almacen.cargar")
+    def cargar(self):
+        """Carga la última foto y le aplica la cola del diario"""
+        if getattr(self._hilo, "bloqueado", False):
+            self._reparar_diario()
+        self._firma = self._firma_archivos()
+        try:
+            data = self._leer_foto()
+        except (FileNotFoundError, ValueError):
+            # Si no existe el archivo o está corrupto, crear uno nuevo
+            data = datos_iniciales(self.configuracion["grupos"], self.configuracion["jugadores"])
+
+        data.setdefault("secuencia", 0)
+        # Antes del diario: sus eventos pueden ser de jugadores agregados después de la foto
+        completar_jugadores(data, self.configuracion["jugadores"])
+        eventos, self._offset, _ = self._leer_diario(data["secuencia"])
+        for evento in eventos:
+            if evento["seq"] != data["secuencia"] + 1:
+                raise ValueError(f"{self.ruta_diario}: falta el evento {data['secuencia'] + 1} "
+                                 f"(sigue el {evento['seq']})")
+            aplicar_evento(data, evento)
+        self.eventos_en_diario = len(eventos)
+        return data
+
+    @metricas.medido("almacen.guardar")
+    def guardar(self, data):
+        """Escribe la foto completa del torneo y recorta el diario"""
+        os.makedirs(self.directorio, exist_ok=True)
+
+        # Escribir en un temporal y renombrar: la foto nunca queda a medias
+        temporal = self.ruta_datos + '.tmp'
+        self._escribir_foto(temporal, data)
+        os.replace(temporal, self.ruta_datos)
+
+        # La foto ya incluye todo lo del diario (los eventos con seq <= secuencia
+        # se ignoran al cargar, así que una caída entre ambos pasos es inofensiva)
+        self._offset = self._recortar_diario()
+        self._firma = self._firma_archivos()
+        self.eventos_en_diario = 0
+
+    def bytes_foto(self):
+        """Tamaño en disco de la foto"""
+        return os.path.getsize(self.ruta_datos) if os.path.exists(self.ruta_datos) else 0
+
+    @metricas.medido("almacen.registrar")
+    def registrar(self, data, evento):
+        """Persiste un evento todavía sin aplicar sobre data (una línea del diario)"""
+        os.makedirs(self.directorio, exist_ok=True)
+        # Con el bloqueo tomado: lo que siga a la última línea completa es de
+        # una escritura que no terminó, y el evento nuevo no debe quedar pegado
+        self._reparar_diario()
+        with open(self.ruta_diario, 'ab') as f:
+            f.write((json.dumps(evento, ensure_ascii=False) + "\n").encode('utf-8'))
+            self._offset = f.tell()
+        self.eventos_en_diario += 1
+
+    def tras_aplicar(self, data, evento):
+        """Compacta, con el evento ya aplicado sobre data, si toca.
+
+        Un reinicio deja obsoleta toda la historia anterior: foto nueva. Si el
+        proceso se cae antes, el reinicio ya está en el diario y se vuelve a
+        aplicar al cargar.
+        """
+        if evento["tipo"] == "reinicio" or self.eventos_en_diario >= COMPACTAR_CADA:
+            self.guardar(data)
+
+    def cambios_desde(self, secuencia):
+        """Eventos escritos por otros procesos, o None si hay que recargar todo"""
+        firma = self._firma_archivos()
+        if firma == self._firma:
+            eventos, self._offset, _ = self._leer_diario(secuencia, self._offset)
+            self.eventos_en_diario += len(eventos)
+            return eventos
+
+        # Otro proceso compactó o reinició: el diario es otro archivo. Si
+        # todavía empieza antes de lo que falta, alcanza con leerlo entero
+        eventos, offset, primera = self._leer_diario(secuencia)
+        if primera is None or primera > secuencia + 1:
+            return None
+        self._firma = firma
+        self._offset = offset
+        self.eventos_en_diario = len(eventos)
+        return eventos
+
+    # Consultas (sobre las columnas de las apuestas)
+    def apuestas_de_jugador(self, data, jugador):
+        bets = data["bets"]
+        return [bets[indice] for indice in bets.de_jugador(jugador)]
+
+    def apuestas_pendientes(self, data, partido_keys):
+        """Pares (índice, apuesta) sin procesar de un conjunto de partidos, en una pasada"""
+        bets = data["bets"]
+        return [(indice, bets[indice]) for indice in bets.pendientes(partido_keys)]
+
+    def contar_apuestas(self, data, partido_key):
+        return data["bets"].contar(partido_key)
+
+class AlmacenColumnar(AlmacenJSON):
+    """Como AlmacenJSON, pero con una foto binaria por columnas.
+
+    El archivo empieza con una línea JSON (el resto del torneo y cómo leer
+    las columnas) seguida de las columnas de apuestas y ledger tal como
+    están en memoria, así que cargarlo no interpreta una fila por apuesta.
+    Comparte el formato del diario con AlmacenJSON.
+    """
+
+    NOMBRE_FOTO = NOMBRE_COLUMNAR
+
+    def __init__(self, directorio=DIRECTORIO_DATOS):
+        super().__init__(directorio)
+        self.ruta_json = os.path.join(directorio, NOMBRE_DATOS)
+
+    def _leer_foto(self):
+        with open(self.ruta_datos, 'rb') as f:
+            data = json.loads(f.readline())
+            columnas = data.pop("columnas")
+            try:
+                data["bets"] = Apuestas.leer_de(f, columnas["bets"])
+                data["ledger"] = Movimientos.leer_de(f, columnas["ledger"])
+            except EOFError:
+                raise ValueError(f"{self.ruta_datos} está incompleto")
+        return data
+
+    def _escribir_foto(self, ruta, data):
+        resto = {clave: valor for clave, valor in data.items() if clave not in ("bets", "ledger")}
+        resto["columnas"] = {"bets": data["bets"].descripcion(), "ledger": data["ledger"].descripcion()}
+        with open(ruta, 'wb') as f:
+            f.write((json.dumps(resto, ensure_ascii=False) + "\n").encode('utf-8'))
+            data["bets"].escribir_en(f)
+            data["ledger"].escribir_en(f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def cargar(self):
+        if not os.path.exists(self.ruta_datos) and os.path.exists(self.ruta_json):
+            # Primera vez: importar la foto JSON (con su diario)
+            self.importar_json(self.ruta_json)
+        return super().cargar()
+
+    def importar_json(self, ruta):
+        """Convierte una foto JSON del torneo (con su diario, si lo hay) a este formato"""
+        self.guardar(AlmacenJSON(os.path.dirname(ruta) or '.').cargar())
+
+    def exportar_json(self, ruta):
+        """Escribe el torneo en el formato JSON de siempre"""
+        escribir_json(self.cargar(), ruta)
+
+ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jugadores (
+    nombre TEXT PRIMARY KEY,
+    dinero INTEGER NOT NULL,
+    apuestas_ganadas INTEGER NOT NULL,
+    apuestas_perdidas INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS partidos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    lista TEXT NOT NULL,
+    datos TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS apuestas (
+    id INTEGER PRIMARY KEY,
+    jugador TEXT NOT NULL,
+    partido TEXT NOT NULL,
+    local TEXT,
+    visitante TEXT,
+    prediccion TEXT NOT NULL,
+    monto INTEGER NOT NULL,
+    fase TEXT,
+    procesada INTEGER NOT NULL DEFAULT 0,
+    resultado TEXT,
+    ganancias INTEGER
+);
+CREATE TABLE IF NOT EXISTS movimientos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    seq INTEGER NOT NULL,
+    apuesta INTEGER NOT NULL,
+    jugador TEXT NOT NULL,
+    concepto TEXT NOT NULL,
+    monto INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS eventos (
+    seq INTEGER PRIMARY KEY,
+    datos TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_apuestas_partido ON apuestas (partido, procesada);
+CREATE INDEX IF NOT EXISTS idx_apuestas_jugador ON apuestas (jugador);
+"""
+
+# Claves del torneo guardadas como JSON en la tabla meta
+CLAVES_META = ["groups", "final", "third_place", "phase", "secuencia"]
+
+class AlmacenSQLite:
+    """Torneo en SQLite con las apuestas indexadas por partido y por jugador"""
+
+    def __init__(self, directorio=DIRECTORIO_DATOS):
+        self.directorio = directorio
+        self.configuracion = leer_configuracion(directorio)
+        self.ruta_db = os.path.join(directorio, NOMBRE_SQLITE)
+        self.ruta_json = os.path.join(directorio, NOMBRE_DATOS)
+        self._lock = threading.Lock()
+        os.makedirs(directorio, exist_ok=True)
+        self._conn = sqlite3.connect(self.ruta_db, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(ESQUEMA_SQLITE)
+
+    def bloqueo(self):
+        return bloqueo_archivo(os.path.join(self.directorio, NOMBRE_BLOQUEO))
+
+    def _vacio(self):
+        return self._conn.execute("SELECT 1 FROM meta LIMIT 1").fetchone() is None
+
+    @staticmethod
+    def _fila_a_apuesta(fila):
+        apuesta = {columna: fila[columna] for columna in COLUMNAS_APUESTA}
+        apuesta["procesada"] = bool(apuesta["procesada"])
+        if apuesta["ganancias"] is None:
+            del apuesta["ganancias"]
+        return apuesta
+
+    def _escribir_todo(self, data):
+        """Reemplaza el contenido de la base por data (dentro de una transacción)"""
+        cur = self._conn.cursor()
+        for tabla in ("meta", "jugadores", "partidos", "apuestas", "movimientos"):
+            cur.execute(f"DELETE FROM {tabla}")
+        cur.executemany(
+            "INSERT INTO meta (clave, valor) VALUES (?, ?)",
+            [(clave, json.dumps(data.get(clave), ensure_ascii=False)) for clave in CLAVES_META]
+        )
+        cur.executemany(
+            "INSERT INTO jugadores VALUES (?, ?, ?, ?)",
+            [(nombre, datos["dinero"], datos.get("apuestas_ganadas", 0), datos.get("apuestas_perdidas", 0))
+             for nombre, datos in data["players"].items()]
+        )
+        cur.executemany(
+            "INSERT INTO partidos (lista, datos) VALUES (?, ?)",
+            [(lista, json.dumps(partido, ensure_ascii=False))
+             for lista in ("matches", "semifinals") for partido in data.get(lista, [])]
+        )
+        cur.executemany(
+            "INSERT INTO apuestas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((indice, *fila) for indice, fila in enumerate(data["bets"].columnas(*COLUMNAS_APUESTA)))
+        )
+        self._insertar_movimientos(cur, data["ledger"].columnas(*COLUMNAS_MOVIMIENTO))
+
+    @staticmethod
+    def _insertar_movimientos(cur, filas):
+        cur.executemany(
+            "INSERT INTO movimientos (seq, apuesta, jugador, concepto, monto) VALUES (?, ?, ?, ?, ?)", filas
+        )
+
+    @metricas.medido("almacen.cargar")
+    def cargar(self):
+        with self._lock:
+            if self._vacio():
+                # Primera vez: importar la foto JSON si existe
+                self.importar_json(self.ruta_json)
+
+            data = {}
+            for fila in self._conn.execute("SELECT clave, valor FROM meta"):
+                data[fila["clave"]] = json.loads(fila["valor"])
+            data["players"] = {
+                fila["nombre"]: {
+                    "dinero": fila["dinero"],
+                    "apuestas_ganadas": fila["apuestas_ganadas"],
+                    "apuestas_perdidas": fila["apuestas_perdidas"]
+                } for fila in self._conn.execute("SELECT * FROM jugadores ORDER BY rowid")
+            }
+            data["matches"] = []
+            data["semifinals"] = []
+            for fila in self._conn.execute("SELECT lista, datos FROM partidos ORDER BY id"):
+                data[fila["lista"]].append(json.loads(fila["datos"]))
+            # Fila a fila, sin pasar por una lista de dicts con todo el historial
+            data["bets"] = Apuestas(self._fila_a_apuesta(fila)
+                                    for fila in self._conn.execute("SELECT * FROM apuestas ORDER BY id"))
+            data["ledger"] = Movimientos(self._conn.execute(
+                f"SELECT {', '.join(COLUMNAS_MOVIMIENTO)} FROM movimientos ORDER BY id"))
+
+            # Los jugadores nuevos de la configuración van también a la base:
+            # sus apuestas y premios actualizan filas que tienen que existir
+            nuevos = [jugador for jugador in self.configuracion["jugadores"] if jugador not in data["players"]]
+            completar_jugadores(data, nuevos)
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO jugadores VALUES (?, ?, ?, ?)",
+                    [(jugador, data["players"][jugador]["dinero"], data["players"][jugador]["apuestas_ganadas"],
+                      data["players"][jugador]["apuestas_perdidas"]) for jugador in nuevos]
+                )
+        return data
+
+    @metricas.medido("almacen.guardar")
+    def guardar(self, data):
+        with self._lock, self._conn:
+            self._escribir_todo(data)
+
+    def bytes_foto(self):
+        """Tamaño en disco de la base"""
+        return os.path.getsize(self.ruta_db)
+
+    @staticmethod
+    def _actualizar_jugador(cur, sql, parametros):
+        """UPDATE de la fila de un jugador; ValueError (y la transacción se deshace) si no está"""
+        cur.execute(sql, parametros)
+        if cur.rowcount != 1:
+            raise ValueError(f"El jugador {parametros[-1]!r} no está en la base")
+
+    @metricas.medido("almacen.registrar")
+    def registrar(self, data, evento):
+        """Persiste un evento todavía sin aplicar sobre data en una sola transacción"""
+        tipo = evento["tipo"]
+        nuevas, liquidaciones = cambios_del_evento(data, evento)
+        # Los movimientos en el orden en que aplicar_evento los agrega al ledger
+        movimientos = [(evento["seq"], indice, apuesta["jugador"], "apuesta", -apuesta["monto"])
+                       for indice, apuesta in nuevas]
+        with self._lock, self._conn:
+            cur = self._conn.cursor()
+            # Los últimos eventos quedan en la base para que otros procesos se
+            # pongan al día sin recargar todo (ver cambios_desde)
+            cur.execute("INSERT OR REPLACE INTO eventos (seq, datos) VALUES (?, ?)",
+                        (evento["seq"], json.dumps(evento, ensure_ascii=False)))
+            cur.execute("DELETE FROM eventos WHERE seq <= ?", (evento["seq"] - DIARIO_RETENIDO,))
+            if tipo == "reinicio":
+                iniciales = datos_iniciales(data["groups"], list(data["players"]))
+                self._escribir_todo({**iniciales, "secuencia": evento["seq"]})
+                return
+
+            if nuevas:
+                # Por la tabla compacta: cada fila queda como la tendrá la apuesta en memoria
+                filas = Apuestas(apuesta for _, apuesta in nuevas).columnas(*COLUMNAS_APUESTA)
+                cur.executemany("INSERT INTO apuestas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                [(indice, *fila) for (indice, _), fila in zip(nuevas, filas)])
+                for _, apuesta in nuevas:
+                    self._actualizar_jugador(cur, "UPDATE jugadores SET dinero = dinero - ? WHERE nombre = ?",
+                                             (apuesta["monto"], apuesta["jugador"]))
+            if tipo == "resultado":
+                for partido in evento["partidos"]:
+                    if partido.get("fase") in ("groups", "semifinals"):
+                        lista = "matches" if partido["fase"] == "groups" else "semifinals"
+                        cur.execute("INSERT INTO partidos (lista, datos) VALUES (?, ?)",
+                                    (lista, json.dumps(partido, ensure_ascii=False)))
+                # Solo las liquidaciones que el evento va a aplicar de verdad
+                for liquidacion, jugador in liquidaciones:
+                    cur.execute("UPDATE apuestas SET procesada = 1, resultado = ?, ganancias = ? WHERE id = ?",
+                                (liquidacion["resultado"], liquidacion["ganancias"], liquidacion["apuesta"]))
+                    if liquidacion["resultado"] == "GANADA":
+                        self._actualizar_jugador(cur, "UPDATE jugadores SET dinero = dinero + ?, "
+                                                 "apuestas_ganadas = apuestas_ganadas + 1 WHERE nombre = ?",
+                                                 (liquidacion["ganancias"], jugador))
+                    else:
+                        self._actualizar_jugador(cur, "UPDATE jugadores SET apuestas_perdidas = apuestas_perdidas + 1 "
+                                                 "WHERE nombre = ?", (jugador,))
+                    movimientos.append((evento["seq"], liquidacion["apuesta"], jugador, "liquidacion",
+                                        liquidacion["ganancias"]))
+            elif tipo == "fase":
+                cur.execute("UPDATE meta SET valor = ? WHERE clave = 'phase'", (json.dumps(evento["fase"]),))
+
+            self._insertar_movimientos(cur, movimientos)
+            cur.execute("INSERT OR REPLACE INTO meta (clave, valor) VALUES ('secuencia', ?)",
+                        (json.dumps(evento["seq"]),))
+
+    def tras_aplicar(self, data, evento):
+        """Nada que hacer: registrar ya dejó la base como queda data con el evento"""
+
+    def cambios_desde(self, secuencia):
+        """Eventos escritos desde la secuencia dada, o None si ya no están todos (recargar)"""
+        with self._lock:
+            fila = self._conn.execute("SELECT valor FROM meta WHERE clave = 'secuencia'").fetchone()
+            if fila is not None and json.loads(fila[0]) == secuencia:
+                return []
+            filas = self._conn.execute("SELECT seq, datos FROM eventos WHERE seq > ? ORDER BY seq",
+                                       (secuencia,)).fetchall()
+        if not filas or filas[0]["seq"] != secuencia + 1:
+            return None
+        return [json.loads(fila["datos"]) for fila in filas]
+
+    def importar_json(self, ruta):
+        """Carga una foto JSON del torneo (con su diario, si lo hay) en la base"""
+        data = AlmacenJSON(os.path.dirname(ruta) or '.').cargar()
+        with self._conn:
+            self._escribir_todo(data)
+
+    def exportar_json(self, ruta):
+        """Escribe el torneo en el formato JSON de siempre"""
+        escribir_json(self.cargar(), ruta)
+
+    # Consultas (búsquedas por índice en lugar de recorrer todas las apuestas)
+    def apuestas_de_jugador(self, data, jugador):
+        with self._lock:
+            filas = self._conn.execute("SELECT * FROM apuestas WHERE jugador = ? ORDER BY id", (jugador,)).fetchall()
+        return [self._fila_a_apuesta(fila) for fila in filas]
+
+    def apuestas_pendientes(self, data, partido_keys):
+        partido_keys = list(partido_keys)
+        marcadores = ", ".join("?" * len(partido_keys))
+        with self._lock:
+            filas = self._conn.execute(
+                f"SELECT id FROM apuestas WHERE partido IN ({marcadores}) AND procesada = 0 ORDER BY id",
+                partido_keys
+            ).fetchall()
+        return [(fila["id"], data["bets"][fila["id"]]) for fila in filas]
+
+    def contar_apuestas(self, data, partido_key):
+        with self._lock:
+            fila = self._conn.execute("SELECT COUNT(*) FROM apuestas WHERE partido = ?", (partido_key,)).fetchone()
+        return fila[0]
+
+ALMACENES = {
+    "json": AlmacenJSON,
+    "columnar": AlmacenColumnar,
+    "sqlite": AlmacenSQLite,
+}
+
+ALMACEN_PREDETERMINADO = "columnar"
+
+_almacen = None
+
+def crear_almacen(directorio=DIRECTORIO_DATOS):
+    """Almacén elegido con la variable de entorno FIFA_ALMACEN sobre un directorio"""
+    return ALMACENES[os.environ.get("FIFA_ALMACEN", ALMACEN_PREDETERMINADO)](directorio)
+
+def obtener_almacen():
+    """Almacén configurado del proceso (uno solo, sobre data/)"""
+    global _almacen
+    if _almacen is None:
+        _almacen = crear_almacen()
+    return _almacen
+
+# Cargar datos del torneo
+def load_tournament_data(almacen=None):
+    return (almacen or obtener_almacen()).cargar()
+
+def save_tournament_data(data, almacen=None):
+    (almacen or obtener_almacen()).guardar(data)
+
+def registrar_evento(data, evento, almacen=None):
+    """Persiste un evento y recién después lo aplica (una sola línea o transacción por acción).
+
+    Antes de escribir se comprueba que el evento se pueda aplicar: si la
+    escritura falla, la memoria queda como el disco, sin el evento.
+    """
+    almacen = almacen or obtener_almacen()
+    evento["seq"] = data.get("secuencia", 0) + 1
+    cambios_del_evento(data, evento)
+    almacen.registrar(data, evento)
+    aplicar_evento(data, evento)
+    almacen.tras_aplicar(data, evento)
@@ -1,9 +1,18 @@
-import streamlit as st
-import pandas as pd
-import json
 import os
+import time
+
+import pandas as pd
+import streamlit as st
 from datetime import datetime
 
+import metricas
+import trabajadores
+from almacenamiento import DIRECTORIO_DATOS, NOMBRE_METRICAS, TORNEO_PREDETERMINADO, existe_torneo
+from compacto import ESTADOS_APUESTA, PREDICCIONES
+from importacion import leer_filas
+from torneo import COLUMNAS_TABLA, clasificados_semifinales, id_partido
+from torneos import Torneos
+
 # Configuración para móviles
 st.set_page_config(
     page_title="Liga FIFA - Apuestas",
@@ -12,155 +21,162 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# Jugadores predeterminados (10 jugadores)
-JUGADORES_PREDETERMINADOS = [
-    "Tomás", "Lezcano", "Bawe", "Juanda", "Fili", 
-    "Higinio", "David", "Anto", "Cata", "Aleja"
-]
+# Apuestas por página en el historial
+APUESTAS_POR_PAGINA = 10
 
-# Cargar datos del torneo
-def load_tournament_data():
-    try:
-        with open('data/tournament_data.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            
-            # Asegurar que todos los jugadores predeterminados existan
-            for jugador in JUGADORES_PREDETERMINADOS:
-                if jugador not in data["players"]:
-                    data["players"][jugador] = {
-                        "dinero": 1000,
-                        "apuestas_ganadas": 0,
-                        "apuestas_perdidas": 0
-                    }
-            
-            return data
-    except (FileNotFoundError, json.JSONDecodeError):
-        # Si no existe el archivo o está corrupto, crear uno nuevo
-        return {
-            "groups": {
-                "Grupo A": ["Liverpool", "Atlético Nacional", "Barcelona", "Manchester City"],
-                "Grupo B": ["Real Madrid", "AC Milán", "Independiente Medellín", "PSG"]
-            },
-            "players": {
-                jugador: {
-                    "dinero": 1000,
-                    "apuestas_ganadas": 0,
-                    "apuestas_perdidas": 0
-                } for jugador in JUGADORES_PREDETERMINADOS
-            },
-            "matches": [],
-            "semifinals": [],
-            "final": None,
-            "third_place": None,
-            "phase": "groups",
-            "bets": []
-        }
+# Jugadores mostrados en el ranking
+TOP_POSICIONES = 50
+# Hasta cuántas filas una tabla se dibuja como markdown (sin DataFrame ni Arrow)
+FILAS_TABLA_SIMPLE = 50
+# Jugadores del ranking en el gráfico de evolución (más el de la sesión) y
+# jornadas que se grafican como mucho (repartidas entre todas)
+TOP_EVOLUCION = 5
+PUNTOS_EVOLUCION = 100
+
+# Errores de importación mostrados (el resto solo se cuenta)
+MAX_ERRORES_IMPORTACION = 20
+
+# Avisos de cambios mostrados por rerun (el resto se resume en uno)
+MAX_AVISOS = 5
+
+# Actualización en vivo: segundos entre dos consultas de cambios de una
+# sesión abierta. Está desactivada por defecto (0: la página solo se
+# actualiza cuando el usuario hace algo) porque cada sesión que espera
+# ocupa un hilo del servidor mientras la página siga abierta. Los
+# espectadores tienen su propio ajuste, también desactivado por defecto
+REFRESCO = float(os.environ.get("FIFA_REFRESCO", "0"))
+REFRESCO_ESPECTADOR = float(os.environ.get("FIFA_REFRESCO_ESPECTADOR", "0"))
+
+# Cada cuánto la espera de cambios deja que Streamlit atienda un clic
+PAUSA_ESPERA = 0.25
 
-def save_tournament_data(data):
-    os.makedirs('data', exist_ok=True)
-    with open('data/tournament_data.json', 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+# Segundos antes de volver a lanzar una simulación que falló
+REINTENTO_SIMULACION = 30
+
+# Métricas en formato Prometheus (si FIFA_METRICAS=1)
+RUTA_METRICAS = os.path.join(DIRECTORIO_DATOS, NOMBRE_METRICAS)
 
 # Funciones auxiliares
+def mostrar_tabla(filas, columnas):
+    """Tabla chica como markdown; las grandes con st.dataframe"""
+    if len(filas) > FILAS_TABLA_SIMPLE:
+        st.dataframe(pd.DataFrame(filas, columns=columnas), use_container_width=True, hide_index=True)
+        return
+    lineas = ["| " + " | ".join(columnas) + " |", "|:---|" + "---:|" * (len(columnas) - 1)]
+    for fila in filas:
+        lineas.append("| " + " | ".join(str(fila[columna]).replace("|", "\\|") for columna in columnas) + " |")
+    st.markdown("\n".join(lineas))
+
+@metricas.medido("obtener_partidos_para_apostar")
 def obtener_partidos_para_apostar():
     """Obtiene partidos que aún no han comenzado (sin resultado)"""
-    partidos_para_apostar = []
-    partidos_con_resultado = [f"{p['local']} vs {p['visitante']}" 
-                            for p in st.session_state.tournament_data["matches"]]
-    
-    for grupo, equipos in st.session_state.tournament_data["groups"].items():
-        for i, local in enumerate(equipos):
-            for j, visitante in enumerate(equipos):
-                if i != j:
-                    partido_key = f"{local} vs {visitante}"
-                    if partido_key not in partidos_con_resultado:
-                        partidos_para_apostar.append({
-                            "local": local,
-                            "visitante": visitante,
-                            "fase": "groups",
-                            "grupo": grupo
-                        })
-    
-    return partidos_para_apostar
+    return list(estado.vista("calendario").pendientes())
 
+@metricas.medido("calcular_tabla")
 def calcular_tabla(grupo):
-    """Calcula la tabla de posiciones de un grupo"""
-    equipos = st.session_state.tournament_data["groups"][grupo]
-    partidos = [p for p in st.session_state.tournament_data["matches"]
-                if p.get("grupo") == grupo and p.get("fase") == "groups"]
-
-    tabla = {}
-    for equipo in equipos:
-        tabla[equipo] = {"PJ": 0, "G": 0, "E": 0, "P": 0, "GF": 0, "GC": 0, "DG": 0, "PTS": 0}
-
-    for partido in partidos:
-        local = partido["local"]
-        visitante = partido["visitante"]
-        gl = partido["goles_local"]
-        gv = partido["goles_visitante"]
-
-        for equipo, goles_favor, goles_contra in [(local, gl, gv), (visitante, gv, gl)]:
-            if equipo in tabla:
-                tabla[equipo]["PJ"] += 1
-                tabla[equipo]["GF"] += goles_favor
-                tabla[equipo]["GC"] += goles_contra
-                tabla[equipo]["DG"] = tabla[equipo]["GF"] - tabla[equipo]["GC"]
-
-        if gl > gv:
-            tabla[local]["G"] += 1
-            tabla[local]["PTS"] += 3
-            tabla[visitante]["P"] += 1
-        elif gv > gl:
-            tabla[visitante]["G"] += 1
-            tabla[visitante]["PTS"] += 3
-            tabla[local]["P"] += 1
-        else:
-            tabla[local]["E"] += 1
-            tabla[visitante]["E"] += 1
-            tabla[local]["PTS"] += 1
-            tabla[visitante]["PTS"] += 1
-
-    df = pd.DataFrame.from_dict(tabla, orient='index')
-    df = df.reset_index().rename(columns={"index": "Equipo"})
-    df = df.sort_values(by=["PTS", "DG", "GF"], ascending=[False, False, False])
-    return df
+    """Tabla de posiciones de un grupo (mantenida al registrar cada resultado)"""
+    return estado.vista("tabla").tabla(grupo)
 
 def obtener_clasificados_semifinales():
-    """Obtiene los clasificados a semifinales"""
-    clasificados = []
-    for grupo in ["Grupo A", "Grupo B"]:
-        df = calcular_tabla(grupo)
-        top2 = df.head(2)["Equipo"].tolist()
-        clasificados.extend(top2)
-    return clasificados
-
-def procesar_apuestas_partido(partido):
-    """Procesa las apuestas de un partido"""
-    partido_key = f"{partido['local']} vs {partido['visitante']}"
-    goles_local = partido['goles_local']
-    goles_visitante = partido['goles_visitante']
-
-    if goles_local > goles_visitante:
-        resultado_real = "Local"
-    elif goles_visitante > goles_local:
-        resultado_real = "Visitante"
+    """Obtiene los clasificados a semifinales (los dos primeros de cada grupo)"""
+    return clasificados_semifinales(estado.vista("tabla"))
+
+@st.cache_resource(max_entries=8)
+def simulacion_en_curso(torneo, version_resultados, intento):
+    """Future de la simulación, lanzada una vez por proceso para cada torneo y versión de los resultados.
+
+    Las apuestas no cambian las probabilidades, así que solo se vuelve a
+    simular cuando se registra un resultado (o se reinicia el torneo).
+    ``intento`` cambia cuando una simulación falla, para lanzar otra.
+    """
+    with estado.transaccion() as datos:
+        return trabajadores.simular(estado.vista("tabla"), list(estado.vista("calendario").pendientes()),
+                                    datos["matches"], semilla=version_resultados)
+
+@st.cache_resource(max_entries=8)
+def ultima_simulacion(torneo):
+    """Último resultado terminado del torneo, compartido: se muestra mientras se calcula el siguiente.
+
+    También guarda el último fallo (versión, momento, error) y el número de intento.
+    """
+    return {"intento": 0}
+
+def simulacion_actual():
+    """Future de la simulación de los resultados actuales, o None si acaba de fallar.
+
+    Un future que falló (error en la simulación, trabajador caído o sin
+    memoria) no se vuelve a consultar: se pasa a otro intento, que se lanza
+    en una rerun posterior y no antes de REINTENTO_SIMULACION segundos.
+    """
+    ultima = ultima_simulacion(activo.id)
+    version = estado.versiones["resultados"]
+    fallo = ultima.get("fallo")
+    if fallo and fallo[0] == version and time.monotonic() - fallo[1] < REINTENTO_SIMULACION:
+        return None
+    intento = ultima["intento"]
+    futuro = simulacion_en_curso(activo.id, version, intento)
+    if futuro.done() and futuro.exception() is not None:
+        if ultima["intento"] == intento:
+            ultima["intento"] += 1
+            ultima["fallo"] = (version, time.monotonic(), futuro.exception())
+            metricas.contar("simulaciones_fallidas")
+        return None
+    return futuro
+
+def resultado_simulacion():
+    """Simulación de los resultados actuales si ya terminó; si no, la anterior (o None)"""
+    futuro = simulacion_actual()
+    ultima = ultima_simulacion(activo.id)
+    if futuro is not None and futuro.done():
+        ultima["resultado"] = futuro.result()
+        ultima.pop("fallo", None)
+    return ultima.get("resultado")
+
+def simulacion_al_dia():
+    """True si no queda nada por esperar: la simulación actual terminó o falló"""
+    futuro = simulacion_actual()
+    return futuro is None or futuro.done()
+
+def error_simulacion():
+    """Error de la última simulación de los resultados actuales, si falló"""
+    fallo = ultima_simulacion(activo.id).get("fallo")
+    return fallo[2] if fallo and fallo[0] == estado.versiones["resultados"] else None
+
+def texto_cuotas(partido):
+    """Cuotas justas de un partido pendiente, para mostrar junto a él"""
+    simulacion = resultado_simulacion()
+    cuotas = simulacion and simulacion["partidos"].get(id_partido(partido["local"], partido["visitante"]))
+    if not cuotas:
+        return "calculando…" if not simulacion_al_dia() else ""
+    return " · ".join(f"{resultado} {valor:.2f}" for resultado, valor in cuotas["cuotas"].items() if valor)
+
+def texto_pozo(partido, jugador=None):
+    """Dinero apostado a cada predicción de un partido y lo que pagaría el pozo"""
+    pozos = estado.vista("pozos")
+    clave = id_partido(partido["local"], partido["visitante"])
+    if not pozos.cantidad(clave):
+        return "Todavía no hay apuestas en este partido"
+    partes = []
+    for prediccion in PREDICCIONES:
+        cuota = pozos.cuota_parimutuel(clave, prediccion)
+        partes.append(f"{prediccion} ${pozos.monto(clave, prediccion)} ({pozos.cantidad(clave, prediccion)})"
+                      + (f" x{cuota:.2f}" if cuota else ""))
+    texto = "Pozo: " + " · ".join(partes)
+    if jugador:
+        propias = {prediccion: monto for prediccion, monto in pozos.del_jugador(clave, jugador).items() if monto}
+        if propias:
+            texto += " — tú: " + ", ".join(f"{prediccion} ${monto}" for prediccion, monto in propias.items())
+    return texto
+
+def apostar(apuesta, dinero_visto):
+    """Registra la apuesta si el saldo sigue siendo el que vio el jugador y el partido sigue pendiente"""
+    if estado.apostar(apuesta, dinero_visto):
+        return True
+    if estado.vista("calendario").partido(apuesta["partido"]) is None:
+        st.error("❌ Ese partido ya tiene resultado, elige otro")
     else:
-        resultado_real = "Empate"
-
-    for apuesta in st.session_state.tournament_data["bets"]:
-        if not apuesta.get("procesada", False) and apuesta["partido"] == partido_key:
-            if apuesta["prediccion"] == resultado_real:
-                monto_ganado = apuesta["monto"] * 2
-                st.session_state.tournament_data["players"][apuesta["jugador"]]["dinero"] += monto_ganado
-                st.session_state.tournament_data["players"][apuesta["jugador"]]["apuestas_ganadas"] += 1
-                apuesta["resultado"] = "GANADA"
-                apuesta["ganancias"] = monto_ganado
-            else:
-                st.session_state.tournament_data["players"][apuesta["jugador"]]["apuestas_perdidas"] += 1
-                apuesta["resultado"] = "PERDIDA"
-                apuesta["ganancias"] = 0
-
-            apuesta["procesada"] = True
+        st.error("❌ Tu saldo cambió, revisa e intenta de nuevo")
+    return False
 
 # Funciones de UI
 def mostrar_panel_apuestas_movil():
@@ -175,7 +191,12 @@ def mostrar_panel_apuestas_movil():
     jugador = st.session_state.jugador_seleccionado
 
     # Mostrar dinero disponible
-    dinero_actual = st.session_state.tournament_data["players"][jugador]["dinero"]
+    dinero_actual = estado.datos["players"][jugador]["dinero"]
+    # La apuesta se compara con el saldo que se mostró en la vista anterior
+    # (el del clic): en esta rerun el saldo ya se volvió a leer
+    mostrado = st.session_state.get("dinero_mostrado")
+    dinero_visto = mostrado[1] if mostrado and mostrado[0] == jugador else dinero_actual
+    st.session_state.dinero_mostrado = (jugador, dinero_actual)
     st.markdown(f"**Dinero disponible:** `${dinero_actual}`")
 
     # Partidos disponibles para apostar
@@ -191,6 +212,8 @@ def mostrar_panel_apuestas_movil():
         format_func=lambda x: f"{x['local']} vs {x['visitante']}",
         key="apuesta_partido"
     )
+    st.caption(f"Cuotas justas según la simulación: {texto_cuotas(partido_apostar)}")
+    st.caption(texto_pozo(partido_apostar, jugador))
 
     # Opciones de apuesta en botones
     st.markdown("**Tu predicción:**")
@@ -207,7 +230,7 @@ def mostrar_panel_apuestas_movil():
         # CORREGIDO: Crear nueva apuesta correctamente
         nueva_apuesta = {
             "jugador": jugador,
-            "partido": f"{partido_apostar['local']} vs {partido_apostar['visitante']}",
+            "partido": id_partido(partido_apostar['local'], partido_apostar['visitante']),
             "local": partido_apostar['local'],
             "visitante": partido_apostar['visitante'],
             "prediccion": prediccion,
@@ -217,10 +240,8 @@ def mostrar_panel_apuestas_movil():
             "resultado": "PENDIENTE"
         }
 
-        # CORREGIDO: Restar el monto correctamente
-        st.session_state.tournament_data["players"][jugador]["dinero"] -= monto_apuesta
-        st.session_state.tournament_data["bets"].append(nueva_apuesta)
-        save_tournament_data(st.session_state.tournament_data)
+        if not apostar(nueva_apuesta, dinero_visto):
+            return
         st.success(f"✅ Apostaste ${monto_apuesta} por {prediccion}")
         st.rerun()
 
@@ -241,7 +262,7 @@ def mostrar_panel_apuestas_movil():
         if dinero_actual < 10:
             st.warning("No tienes suficiente dinero para apostar")
         else:
-            opcion_apuesta = st.selectbox("Predicción", ["Local", "Empate", "Visitante"], key="prediccion_select")
+            opcion_apuesta = st.selectbox("Predicción", PREDICCIONES, key="prediccion_select")
             
             # CORREGIDO: Valor por defecto seguro
             monto_default = min(100, dinero_actual)
@@ -261,7 +282,7 @@ def mostrar_panel_apuestas_movil():
                     # CORREGIDO: Crear apuesta personalizada correctamente
                     nueva_apuesta = {
                         "jugador": jugador,
-                        "partido": f"{partido_apostar['local']} vs {partido_apostar['visitante']}",
+                        "partido": id_partido(partido_apostar['local'], partido_apostar['visitante']),
                         "local": partido_apostar['local'],
                         "visitante": partido_apostar['visitante'],
                         "prediccion": opcion_apuesta,
@@ -271,38 +292,62 @@ def mostrar_panel_apuestas_movil():
                         "resultado": "PENDIENTE"
                     }
 
-                    # CORREGIDO: Restar el monto correctamente
-                    st.session_state.tournament_data["players"][jugador]["dinero"] -= monto_apuesta
-                    st.session_state.tournament_data["bets"].append(nueva_apuesta)
-                    save_tournament_data(st.session_state.tournament_data)
-                    st.success(f"✅ Apostaste ${monto_apuesta} por {opcion_apuesta}")
-                    st.rerun()
+                    if apostar(nueva_apuesta, dinero_visto):
+                        st.success(f"✅ Apostaste ${monto_apuesta} por {opcion_apuesta}")
+                        st.rerun()
 
+@metricas.medido("pestaña.torneo")
 def mostrar_torneo():
     """Muestra la información del torneo"""
     st.markdown("### 📊 Fase de Grupos")
 
-    col1, col2 = st.columns(2)
-
-    with col1:
-        st.markdown("**Grupo A**")
-        df_a = calcular_tabla("Grupo A")
-        st.dataframe(df_a, use_container_width=True, hide_index=True)
-
-    with col2:
-        st.markdown("**Grupo B**")
-        df_b = calcular_tabla("Grupo B")
-        st.dataframe(df_b, use_container_width=True, hide_index=True)
+    # Dos grupos por fila, para cualquier número de grupos
+    grupos = estado.vista("tabla").grupos()
+    for inicio in range(0, len(grupos), 2):
+        columnas = st.columns(2)
+        for columna, grupo in zip(columnas, grupos[inicio:inicio + 2]):
+            with columna:
+                st.markdown(f"**{grupo}**")
+                mostrar_tabla(calcular_tabla(grupo), ["Equipo"] + COLUMNAS_TABLA)
 
     # Próximos partidos
     st.markdown("### ⏭️ Próximos Partidos")
-    partidos_futuros = obtener_partidos_para_apostar()[:3]
+    partidos_futuros = estado.vista("calendario").proximos(3)
     if partidos_futuros:
         for partido in partidos_futuros:
             st.write(f"**{partido['local']}** vs **{partido['visitante']}** - {partido['grupo']}")
+            st.caption(f"Cuotas justas: {texto_cuotas(partido)}")
     else:
         st.info("🎉 Todos los partidos han sido jugados")
 
+    # Probabilidades de pasar a semifinales (simulando lo que falta de la fase de grupos)
+    st.markdown("### 🔮 Probabilidades de Clasificar")
+    simulacion = resultado_simulacion()
+    error = error_simulacion()
+    if simulacion is None:
+        if error is not None:
+            st.warning(f"⚠️ No se pudo simular el resto de la fase de grupos ({error!r}); se reintenta en unos segundos")
+        else:
+            st.info("⏳ Simulando el resto de la fase de grupos…")
+        return
+    if error is not None:
+        st.caption(f"⚠️ Falló la simulación con el último resultado ({error!r}); se muestra la anterior")
+    elif not simulacion_al_dia():
+        st.caption("⏳ Actualizando con el último resultado…")
+    clasificacion = simulacion["clasificacion"]
+    for inicio in range(0, len(grupos), 2):
+        columnas = st.columns(2)
+        for columna, grupo in zip(columnas, grupos[inicio:inicio + 2]):
+            with columna:
+                st.markdown(f"**{grupo}**")
+                if grupo not in clasificacion:
+                    continue
+                filas = [{"Equipo": fila["Equipo"], "Primero %": round(fila["Primero"] * 100, 1),
+                          "Clasifica %": round(fila["Clasifica"] * 100, 1)}
+                         for fila in sorted(clasificacion[grupo], key=lambda fila: -fila["Clasifica"])]
+                mostrar_tabla(filas, ["Equipo", "Primero %", "Clasifica %"])
+
+@metricas.medido("pestaña.apuestas")
 def mostrar_apuestas():
     """Muestra el historial de apuestas"""
     st.markdown("### 📋 Tus Apuestas")
@@ -314,53 +359,97 @@ def mostrar_apuestas():
 
     jugador_actual = st.session_state.jugador_seleccionado
 
-    apuestas_jugador = [a for a in st.session_state.tournament_data.get("bets", []) if a["jugador"] == jugador_actual]
+    indice = estado.vista("apuestas")
 
-    if not apuestas_jugador:
+    if not indice.total(jugador_actual):
         st.info("📝 Aún no has hecho apuestas")
         return
 
-    for apuesta in reversed(apuestas_jugador):
-        estado = "✅ GANADA" if apuesta.get("resultado") == "GANADA" else "❌ PERDIDA" if apuesta.get("resultado") == "PERDIDA" else "⏳ PENDIENTE"
+    col1, col2 = st.columns(2)
+    with col1:
+        filtro = st.selectbox("Estado", ["Todas"] + ESTADOS_APUESTA, key="filtro_apuestas")
+    filtro = None if filtro == "Todas" else filtro
+
+    total = indice.total(jugador_actual, filtro)
+    if not total:
+        st.info("📝 No hay apuestas con ese estado")
+        return
+
+    paginas = (total + APUESTAS_POR_PAGINA - 1) // APUESTAS_POR_PAGINA
+    with col2:
+        pagina = st.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, value=1,
+                                 key="pagina_apuestas")
+
+    # Una sola tarjeta HTML por página: el costo depende del tamaño de página, no del historial
+    tarjetas = []
+    for apuesta in indice.pagina(jugador_actual, pagina - 1, APUESTAS_POR_PAGINA, filtro):
+        estado_apuesta = "✅ GANADA" if apuesta.get("resultado") == "GANADA" else "❌ PERDIDA" if apuesta.get("resultado") == "PERDIDA" else "⏳ PENDIENTE"
         color = "green" if apuesta.get("resultado") == "GANADA" else "red" if apuesta.get("resultado") == "PERDIDA" else "gray"
-        
-        st.markdown(f"""
-        <div style='border: 1px solid {color}; padding: 10px; border-radius: 5px; margin: 5px 0;'>
-            <h4>{apuesta['partido']}</h4>
-            <p><strong>Predicción:</strong> {apuesta['prediccion']} - ${apuesta['monto']} - {estado}</p>
-        """, unsafe_allow_html=True)
-        
-        if apuesta.get("ganancias"):
-            st.write(f"**Ganancias:** ${apuesta['ganancias']}")
-        st.markdown("</div>", unsafe_allow_html=True)
+        ganancias = f"<p><strong>Ganancias:</strong> ${apuesta['ganancias']}</p>" if apuesta.get("ganancias") else ""
+        tarjetas.append(
+            f"<div style='border: 1px solid {color}; padding: 10px; border-radius: 5px; margin: 5px 0;'>"
+            f"<h4>{apuesta['partido']}</h4>"
+            f"<p><strong>Predicción:</strong> {apuesta['prediccion']} - ${apuesta['monto']} - {estado_apuesta}</p>"
+            f"{ganancias}</div>"
+        )
+    st.markdown("".join(tarjetas), unsafe_allow_html=True)
+
+@st.cache_data(max_entries=8)
+def tabla_clasificacion(torneo, version_saldos, k):
+    """Ranking ya formateado; se recalcula solo cuando cambia algún saldo"""
+    return [{**fila, "Dinero": f"${fila['Dinero']}"} for fila in estado.vista("clasificacion").primeros(k)]
+
+@st.cache_data(max_entries=8)
+def evolucion_dinero(torneo, version_saldos, jugadores):
+    """Dinero de esos jugadores al inicio y después de cada jornada (o de PUNTOS_EVOLUCION de ellas)"""
+    historial = estado.vista("historial")
+    jornadas = len(historial.jornadas)
+    numeros = list(range(0, jornadas, max(1, -(-jornadas // PUNTOS_EVOLUCION)))) + [jornadas]
+    df = pd.DataFrame({jugador: historial.por_jornada(jugador, numeros) for jugador in jugadores}, index=numeros)
+    df.index.name = "Jornada"
+    return df
 
+@metricas.medido("pestaña.posiciones")
 def mostrar_posiciones():
     """Muestra el ranking de apostadores"""
     st.markdown("### 🏆 Ranking de Apostadores")
 
-    if not st.session_state.tournament_data.get("players"):
+    if not estado.datos.get("players"):
         st.info("👥 Aún no hay jugadores")
         return
 
-    jugadores_data = []
-    for jugador, datos in st.session_state.tournament_data["players"].items():
-        jugadores_data.append({
-            "Jugador": jugador,
-            "Dinero": datos['dinero'],
-            "Ganadas": datos.get("apuestas_ganadas", 0),
-            "Perdidas": datos.get("apuestas_perdidas", 0),
-            "Balance": datos.get("apuestas_ganadas", 0) - datos.get("apuestas_perdidas", 0)
-        })
-
-    df_jugadores = pd.DataFrame(jugadores_data)
-    df_jugadores = df_jugadores.sort_values("Dinero", ascending=False)
-    df_jugadores["Dinero"] = "$" + df_jugadores["Dinero"].astype(str)
-    st.dataframe(df_jugadores, use_container_width=True, hide_index=True)
-
+    clasificacion = estado.vista("clasificacion")
+    mostrar_tabla(tabla_clasificacion(activo.id, estado.versiones["saldos"], TOP_POSICIONES),
+                  ["Jugador", "Dinero", "Ganadas", "Perdidas", "Balance"])
+
+    if len(clasificacion) > TOP_POSICIONES:
+        st.caption(f"Primeros {TOP_POSICIONES} de {len(clasificacion)} jugadores")
+    jugador = st.session_state.get('jugador_seleccionado')
+    if jugador:
+        st.markdown(f"**Tu posición:** #{clasificacion.posicion(jugador)}")
+
+    historial = estado.vista("historial")
+    if historial.jornadas:
+        st.markdown("#### 📈 Evolución del Dinero")
+        jugadores = [fila["Jugador"] for fila in clasificacion.primeros(TOP_EVOLUCION)]
+        if jugador and jugador not in jugadores:
+            jugadores.append(jugador)
+        st.line_chart(evolucion_dinero(activo.id, estado.versiones["saldos"], tuple(jugadores)))
+        ultima = len(historial.jornadas)
+        cambios = [f"{nombre} {cambio:+}" for nombre, cambio in
+                   historial.mayores_cambios(historial.seq_jornada(ultima - 1), historial.seq_jornada(ultima))
+                   if cambio]
+        if cambios:
+            st.caption("Mayores cambios en la última jornada: " + " · ".join(cambios))
+
+@metricas.medido("pestaña.admin")
 def mostrar_admin():
     """Muestra el panel de administración - SOLO PARA ALEJA"""
     st.markdown("### ⚙️ Panel de Administración")
     st.warning("🔒 Esta sección es solo para el administrador")
+    # league.json con problemas: el torneo funciona con los predeterminados
+    for error in activo.configuracion["errores"]:
+        st.error(f"⚠️ {error}")
 
     # Registrar resultados
     st.markdown("#### 📝 Registrar Resultados")
@@ -384,25 +473,28 @@ def mostrar_admin():
             goles_visitante = st.number_input("Goles visitante", min_value=0, value=0, key="admin_gv")
 
         # Mostrar apuestas existentes para este partido
-        apuestas_partido = [a for a in st.session_state.tournament_data.get("bets", []) 
-                           if a["partido"] == f"{partido_registrar['local']} vs {partido_registrar['visitante']}"]
+        apuestas_partido = estado.vista("pozos").cantidad(
+            id_partido(partido_registrar['local'], partido_registrar['visitante']))
         
         if apuestas_partido:
-            st.markdown(f"**Apuestas en este partido:** {len(apuestas_partido)}")
+            st.markdown(f"**Apuestas en este partido:** {apuestas_partido}")
+            st.caption(texto_pozo(partido_registrar))
         
         if st.button("Registrar Resultado", type="primary", key="registrar_btn"):
             registrar_resultado_admin(partido_registrar, goles_local, goles_visitante)
     else:
         st.info("✅ Todos los partidos tienen resultado registrado")
 
+    mostrar_importacion()
+
     # Avanzar fases
     st.markdown("#### 🚀 Control del Torneo")
-    if st.session_state.tournament_data.get("phase") == "groups":
+    if estado.datos.get("phase") == "groups":
         if st.button("Avanzar a Semifinales", key="avanzar_btn"):
+            # Pasan los dos primeros de cada grupo, sean cuantos sean los grupos
             clasificados = obtener_clasificados_semifinales()
-            if len(clasificados) == 4:
-                st.session_state.tournament_data["phase"] = "semifinals"
-                save_tournament_data(st.session_state.tournament_data)
+            if clasificados and len(clasificados) == 2 * len(estado.vista("tabla").grupos()):
+                estado.registrar({"tipo": "fase", "fase": "semifinals"})
                 st.success("🎉 Avanzando a Semifinales!")
                 st.rerun()
             else:
@@ -411,13 +503,61 @@ def mostrar_admin():
     # Reiniciar
     st.markdown("#### 🔄 Reiniciar Sistema")
     if st.button("Reiniciar Todo el Sistema", type="secondary", key="reiniciar_btn"):
-        st.session_state.tournament_data = load_tournament_data()
+        estado.registrar({"tipo": "reinicio"})
         if 'jugador_seleccionado' in st.session_state:
             del st.session_state.jugador_seleccionado
-        save_tournament_data(st.session_state.tournament_data)
         st.success("🔄 Sistema reiniciado completamente")
         st.rerun()
 
+    mostrar_metricas()
+
+def mostrar_importacion():
+    """Importa de una vez los resultados de una jornada (y apuestas históricas)"""
+    st.markdown("#### 📥 Importar Resultados")
+    st.caption("CSV o JSON con local, visitante, goles_local, goles_visitante (y fecha). "
+               "Las filas con jugador, prediccion y monto son apuestas, que se registran antes de los resultados.")
+    archivo = st.file_uploader("Archivo de resultados", type=["csv", "json"], key="importar_archivo")
+    if archivo is None:
+        return
+    if not st.button("Importar", type="primary", key="importar_btn"):
+        return
+
+    try:
+        filas = leer_filas(archivo, archivo.name)
+    except ValueError as error:
+        st.error(f"❌ {error}")
+        return
+
+    partidos, apuestas, errores = estado.importar(filas)
+    if errores:
+        st.error(f"❌ No se importó nada: {len(errores)} filas con problemas")
+        st.markdown("\n".join(f"- {error}" for error in errores[:MAX_ERRORES_IMPORTACION]))
+        if len(errores) > MAX_ERRORES_IMPORTACION:
+            st.caption(f"... y {len(errores) - MAX_ERRORES_IMPORTACION} más")
+    elif not partidos and not apuestas:
+        st.warning("El archivo no tiene filas")
+    else:
+        st.success(f"✅ {len(partidos)} resultados y {len(apuestas)} apuestas importados y liquidados")
+        st.rerun()
+
+def mostrar_metricas():
+    """Tiempos de las rutas calientes, contadores y tamaños de este proceso"""
+    st.markdown("#### 📈 Rendimiento")
+    if not metricas.ACTIVAS:
+        st.info("Las métricas están desactivadas (se activan con FIFA_METRICAS=1)")
+        return
+
+    datos = metricas.resumen()
+    if datos["tiempos"]:
+        st.dataframe(pd.DataFrame(datos["tiempos"]).round(2), use_container_width=True, hide_index=True)
+    medidas = {**datos["contadores"], **datos["valores"]}
+    if medidas:
+        st.dataframe(pd.DataFrame({"Medida": list(medidas), "Valor": list(medidas.values())}),
+                     use_container_width=True, hide_index=True)
+    if st.button("Exportar métricas", key="exportar_metricas_btn"):
+        metricas.exportar(RUTA_METRICAS)
+    st.caption(f"Formato Prometheus en {RUTA_METRICAS} (se actualiza cada {metricas.EXPORTAR_CADA} s)")
+
 def registrar_resultado_admin(partido, goles_local, goles_visitante):
     """Registra el resultado de un partido"""
     nuevo_partido = {
@@ -430,45 +570,156 @@ def registrar_resultado_admin(partido, goles_local, goles_visitante):
         "fecha": datetime.now().strftime("%Y-%m-%d %H:%M")
     }
 
-    if partido.get('fase') == 'groups':
-        st.session_state.tournament_data["matches"].append(nuevo_partido)
-    elif partido.get('fase') == 'semifinals':
+    if partido.get('fase') == 'semifinals':
         nuevo_partido["ganador"] = partido['local'] if goles_local > goles_visitante else partido['visitante'] if goles_visitante > goles_local else "Empate"
-        st.session_state.tournament_data["semifinals"].append(nuevo_partido)
 
-    procesar_apuestas_partido(nuevo_partido)
-    save_tournament_data(st.session_state.tournament_data)
+    # Un solo evento guarda el partido y la liquidación de sus apuestas; si
+    # otra sesión ya registró este partido no se registra dos veces
+    if not estado.registrar_resultados([nuevo_partido]):
+        st.error("❌ Ese partido ya tiene resultado registrado")
+        return
     st.success("✅ Resultado registrado y apuestas procesadas!")
     st.rerun()
 
-# Inicializar datos
-if 'tournament_data' not in st.session_state:
-    st.session_state.tournament_data = load_tournament_data()
-
-# Header optimizado para móviles
-st.markdown("""
-    <style>
-    .main-header {
-        font-size: 24px !important;
-        text-align: center;
-        margin-bottom: 1rem;
-        color: #1f77b4;
-        font-weight: bold;
-    }
-    .section-header {
-        font-size: 18px !important;
-        margin-top: 1rem;
-    }
-    </style>
-""", unsafe_allow_html=True)
+def avisar_cambios():
+    """Avisa lo que pasó desde la rerun anterior de esta sesión (resultados y premios del jugador)"""
+    vista = st.session_state.get("version_vista")
+    st.session_state.version_vista = estado.version
+    if vista is None or vista == estado.version:
+        return
+    cambios = estado.cambios_desde(vista)
+    if cambios is None:
+        st.toast("🔄 Datos actualizados")
+        return
+    # Los índices de apuestas de las liquidaciones apuntan a la tabla de
+    # apuestas de su momento: lo anterior al último reinicio ya no se mira
+    reinicios = [posicion for posicion, evento in enumerate(cambios) if evento["tipo"] == "reinicio"]
+    if reinicios:
+        cambios = cambios[reinicios[-1]:]
+
+    jugador = st.session_state.get("jugador_seleccionado")
+    avisos = []
+    for evento in cambios:
+        if evento["tipo"] == "resultado":
+            avisos += [f"⚽ {p['local']} {p['goles_local']}-{p['goles_visitante']} {p['visitante']}"
+                       for p in evento["partidos"]]
+            ganadas = jugador and [l for l in evento["liquidaciones"] if l["resultado"] == "GANADA"
+                                   and estado.datos["bets"][l["apuesta"]]["jugador"] == jugador]
+            if ganadas:
+                avisos.append(f"💰 Ganaste ${sum(l['ganancias'] for l in ganadas)} en {len(ganadas)} apuestas")
+        elif evento["tipo"] == "fase":
+            avisos.append("🚀 El torneo avanzó de fase")
+        elif evento["tipo"] == "reinicio":
+            avisos.append("🔄 El torneo se reinició")
+    for aviso in avisos[:MAX_AVISOS]:
+        st.toast(aviso)
+    if len(avisos) > MAX_AVISOS:
+        st.toast(f"... y {len(avisos) - MAX_AVISOS} novedades más")
+
+def esperar_cambios(refresco):
+    """Deja la sesión esperando eventos nuevos y vuelve a dibujar la página cuando llegan.
+
+    Cada PAUSA_ESPERA vacía un elemento vacío: ese envío es donde Streamlit
+    corta el script si el usuario hizo algo, para atender su rerun. Mientras
+    la página siga abierta, la sesión ocupa un hilo del servidor y consulta
+    el almacén cada ``refresco`` segundos.
+    """
+    version = estado.version
+    marcador = st.empty()
+    proxima = time.monotonic() + refresco
+    while True:
+        time.sleep(PAUSA_ESPERA)
+        marcador.empty()
+        if time.monotonic() >= proxima:
+            estado.sincronizar()
+            if estado.version != version:
+                st.rerun()
+            proxima = time.monotonic() + refresco
+
+def esperar_simulacion(futuro):
+    """Espera a que termine la simulación y vuelve a dibujar la página con ella.
+
+    Como en esperar_cambios, cada PAUSA_ESPERA se vacía un elemento vacío
+    para que un clic del usuario corte la espera en vez de quedar detrás de
+    la simulación entera.
+    """
+    marcador = st.empty()
+    while not futuro.done():
+        time.sleep(PAUSA_ESPERA)
+        marcador.empty()
+    st.rerun()
 
-st.markdown('<div class="main-header">⚽ LIGA FIFA - APUESTAS 🎯</div>', unsafe_allow_html=True)
+def mostrar_espectador():
+    """Vista de solo lectura: la misma instantánea ya dibujada para todos los espectadores"""
+    _, fragmento = activo.espectador.actual()
+    st.markdown(fragmento, unsafe_allow_html=True)
+
+# Torneos cargados en el proceso, compartidos por todas las sesiones
+@st.cache_resource
+def obtener_torneos():
+    return Torneos()
+
+inicio_rerun = time.perf_counter()
+parametros = st.experimental_get_query_params()
+torneo_id = parametros.get("torneo", [TORNEO_PREDETERMINADO])[0]
+torneos = obtener_torneos()
+if torneo_id not in torneos and not existe_torneo(torneo_id):
+    st.error(f"❌ No existe el torneo {torneo_id!r}")
+    st.stop()
+espectador = parametros.get("espectador", [""])[0].lower() in ("1", "true")
+nombre_torneo = torneos.configuracion(torneo_id)["nombre"]
+
+# El encabezado sale antes de cargar el torneo: es lo primero que se ve
+if espectador:
+    st.markdown(f"## ⚽ {nombre_torneo} - En Vivo 👀")
+else:
+    # Header optimizado para móviles
+    st.markdown("""
+        <style>
+        .main-header {
+            font-size: 24px !important;
+            text-align: center;
+            margin-bottom: 1rem;
+            color: #1f77b4;
+            font-weight: bold;
+        }
+        .section-header {
+            font-size: 18px !important;
+            margin-top: 1rem;
+        }
+        </style>
+    """, unsafe_allow_html=True)
+    st.markdown(f'<div class="main-header">⚽ {nombre_torneo.upper()} - APUESTAS 🎯</div>', unsafe_allow_html=True)
+
+# Un torneo que no está en memoria se carga ahora, con el encabezado ya visible
+if torneo_id in torneos:
+    activo = torneos.obtener(torneo_id)
+else:
+    with st.spinner("Cargando torneo…"):
+        activo = torneos.obtener(torneo_id)
+estado = activo.estado
+estado.sincronizar()
+
+# La sesión cambió de torneo: lo elegido y lo visto eran del anterior
+if st.session_state.get("torneo") != torneo_id:
+    for clave in ("jugador_seleccionado", "selector_jugador", "version_vista", "dinero_mostrado"):
+        st.session_state.pop(clave, None)
+    st.session_state.torneo = torneo_id
+
+# Modo espectador (?espectador=1): ni selector, ni pestañas, ni cálculos por vista
+if espectador:
+    mostrar_espectador()
+    if REFRESCO_ESPECTADOR > 0:
+        esperar_cambios(REFRESCO_ESPECTADOR)
+    st.stop()
+
+avisar_cambios()
 
 # Sidebar móvil optimizado
 with st.sidebar:
     st.markdown("### 🎮 Panel de Control")
 
-    # Selección de jugador - LISTA PREDETERMINADA
+    # Selección de jugador - jugadores del torneo
     st.markdown("#### 👥 Selecciona Tu Nombre")
     
     # Inicializar jugador seleccionado si no existe
@@ -477,7 +728,7 @@ with st.sidebar:
     
     jugador_seleccionado = st.selectbox(
         "Elige tu nombre:",
-        [""] + JUGADORES_PREDETERMINADOS,
+        [""] + list(estado.datos["players"]),
         key="selector_jugador"
     )
     
@@ -489,13 +740,13 @@ with st.sidebar:
     # Mostrar información del jugador seleccionado
     if st.session_state.jugador_seleccionado:
         jugador = st.session_state.jugador_seleccionado
-        dinero = st.session_state.tournament_data["players"][jugador]["dinero"]
+        dinero = estado.datos["players"][jugador]["dinero"]
         st.markdown(f"**Jugador activo:** {jugador}")
         st.markdown(f"**Dinero disponible:** ${dinero}")
         
         # Mostrar estadísticas rápidas
-        ganadas = st.session_state.tournament_data["players"][jugador].get("apuestas_ganadas", 0)
-        perdidas = st.session_state.tournament_data["players"][jugador].get("apuestas_perdidas", 0)
+        ganadas = estado.datos["players"][jugador].get("apuestas_ganadas", 0)
+        perdidas = estado.datos["players"][jugador].get("apuestas_perdidas", 0)
         st.markdown(f"**Apuestas ganadas:** {ganadas}")
         st.markdown(f"**Apuestas perdidas:** {perdidas}")
 
@@ -509,8 +760,8 @@ with st.sidebar:
 # Crear pestañas dinámicamente según el usuario
 jugador_actual = st.session_state.get('jugador_seleccionado', '')
 
-if jugador_actual == 'Aleja':
-    # Aleja ve todas las pestañas incluyendo Admin
+if jugador_actual == activo.configuracion["admin"]:
+    # El administrador del torneo ve todas las pestañas incluyendo Admin
     tab1, tab2, tab3, tab4 = st.tabs(["🏆 Torneo", "📊 Apuestas", "📈 Posiciones", "⚙️ Admin"])
     
     with tab1:
@@ -531,3 +782,17 @@ else:
         mostrar_apuestas()
     with tab3:
         mostrar_posiciones()
+
+# Si la simulación de los resultados actuales sigue en los trabajadores, se
+# espera aquí, con toda la página ya dibujada, y se vuelve a dibujar con ella
+futuro = simulacion_actual()
+if futuro is not None and not futuro.done():
+    metricas.anotar("rerun", time.perf_counter() - inicio_rerun)
+    esperar_simulacion(futuro)
+
+metricas.anotar("rerun", time.perf_counter() - inicio_rerun)
+metricas.exportar_si_toca(RUTA_METRICAS)
+
+# Actualización en vivo (FIFA_REFRESCO)
+if REFRESCO > 0:
+    esperar_cambios(REFRESCO)
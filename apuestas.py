@@ -0,0 +1,215 @@
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from almacenamiento import movimientos_del_evento
+from compacto import ESTADOS_APUESTA, PREDICCIONES
+
+class IndiceApuestas:
+    """Índices de las apuestas de cada jugador, total y por estado.
+
+    Cada lista guarda posiciones en datos["bets"] en orden de creación, así
+    que una página (de la más nueva a la más vieja) es un corte del final y
+    no hace falta recorrer todo el historial del jugador.
+    """
+
+    def __init__(self, datos):
+        self.datos = datos
+        self._todas = defaultdict(list)
+        self._por_estado = defaultdict(lambda: {estado: [] for estado in ESTADOS_APUESTA})
+        columnas = datos["bets"].columnas("jugador", "resultado")
+        for indice, (jugador, resultado) in enumerate(columnas):
+            self._agregar(indice, jugador, resultado)
+
+    @classmethod
+    def desde_datos(cls, datos):
+        return cls(datos)
+
+    def _agregar(self, indice, jugador, resultado):
+        self._todas[jugador].append(indice)
+        self._por_estado[jugador][resultado].append(indice)
+
+    def aplicar(self, evento):
+        if evento["tipo"] == "apuesta":
+            apuesta = evento["apuesta"]
+            self._agregar(len(self.datos["bets"]) - 1, apuesta["jugador"], apuesta.get("resultado", "PENDIENTE"))
+        elif evento["tipo"] == "resultado":
+            # Las apuestas que trajo el evento y las que liquidó de verdad, en orden
+            for movimiento in movimientos_del_evento(self.datos, evento):
+                indice = movimiento["apuesta"]
+                if movimiento["concepto"] == "apuesta":
+                    self._agregar(indice, movimiento["jugador"], "PENDIENTE")
+                    continue
+                listas = self._por_estado[movimiento["jugador"]]
+                pendientes = listas["PENDIENTE"]
+                del pendientes[bisect_left(pendientes, indice)]
+                insort(listas[self.datos["bets"][indice]["resultado"]], indice)
+
+    def _lista(self, jugador, estado):
+        if estado is None:
+            return self._todas.get(jugador, [])
+        if jugador not in self._por_estado:
+            return []
+        return self._por_estado[jugador][estado]
+
+    def total(self, jugador, estado=None):
+        return len(self._lista(jugador, estado))
+
+    def pagina(self, jugador, numero, tamano, estado=None):
+        """Apuestas de la página ``numero`` (desde 0), de la más nueva a la más vieja"""
+        indices = self._lista(jugador, estado)
+        fin = max(0, len(indices) - numero * tamano)
+        inicio = max(0, fin - tamano)
+        bets = self.datos["bets"]
+        return [bets[indice] for indice in reversed(indices[inicio:fin])]
+
+class Clasificacion:
+    """Ranking de apostadores por dinero, mantenido con cada cambio de saldo.
+
+    Guarda una lista ordenada de claves (dinero descendente; a igualdad, el
+    orden de alta del jugador). Consultar los primeros K o la posición de un
+    jugador no recorre ni reordena a todos los jugadores.
+    """
+
+    def __init__(self, datos):
+        self.datos = datos
+        self._alta = {jugador: i for i, jugador in enumerate(datos["players"])}
+        self._claves = {jugador: self._clave(jugador) for jugador in datos["players"]}
+        self._orden = sorted(self._claves.values())
+
+    @classmethod
+    def desde_datos(cls, datos):
+        return cls(datos)
+
+    def _clave(self, jugador):
+        return (-self.datos["players"][jugador]["dinero"], self._alta[jugador], jugador)
+
+    def _actualizar(self, jugador):
+        if jugador not in self._alta:
+            self._alta[jugador] = len(self._alta)
+        else:
+            del self._orden[bisect_left(self._orden, self._claves[jugador])]
+        clave = self._clave(jugador)
+        self._claves[jugador] = clave
+        insort(self._orden, clave)
+
+    def aplicar(self, evento):
+        if evento["tipo"] == "apuesta":
+            self._actualizar(evento["apuesta"]["jugador"])
+        elif evento["tipo"] == "resultado":
+            for jugador in {m["jugador"] for m in movimientos_del_evento(self.datos, evento)}:
+                self._actualizar(jugador)
+
+    def __len__(self):
+        return len(self._orden)
+
+    def primeros(self, k=None):
+        """Filas del ranking de los primeros k jugadores (todos si k es None)"""
+        filas = []
+        for clave in self._orden[:k]:
+            jugador = clave[-1]
+            datos = self.datos["players"][jugador]
+            filas.append({
+                "Jugador": jugador,
+                "Dinero": datos['dinero'],
+                "Ganadas": datos.get("apuestas_ganadas", 0),
+                "Perdidas": datos.get("apuestas_perdidas", 0),
+                "Balance": datos.get("apuestas_ganadas", 0) - datos.get("apuestas_perdidas", 0)
+            })
+        return filas
+
+    def posicion(self, jugador):
+        """Puesto del jugador en el ranking, empezando en 1"""
+        return bisect_left(self._orden, self._claves[jugador]) + 1
+
+class Pozos:
+    """Pozo de apuestas de cada partido, mantenido con cada apuesta.
+
+    Por partido guarda cuántas apuestas y cuánto dinero hay en cada
+    predicción, lo que lleva apostado cada jugador y las apuestas todavía
+    sin liquidar (en orden de creación). Consultar un pozo no recorre las
+    apuestas, y la liquidación toma de aquí las pendientes de sus partidos.
+    """
+
+    def __init__(self, datos):
+        self.datos = datos
+        self._pozos = {}
+        columnas = datos["bets"].columnas("partido", "jugador", "prediccion", "monto", "procesada")
+        for indice, (partido, jugador, prediccion, monto, procesada) in enumerate(columnas):
+            self._agregar(indice, partido, jugador, prediccion, monto, procesada)
+
+    @classmethod
+    def desde_datos(cls, datos):
+        return cls(datos)
+
+    def _pozo(self, partido):
+        pozo = self._pozos.get(partido)
+        if pozo is None:
+            pozo = self._pozos[partido] = {
+                "cantidad": dict.fromkeys(PREDICCIONES, 0),
+                "monto": dict.fromkeys(PREDICCIONES, 0),
+                "jugadores": {},
+                # Índices en datos["bets"]; el dict conserva el orden y borra en O(1)
+                "pendientes": {}
+            }
+        return pozo
+
+    def _agregar(self, indice, partido, jugador, prediccion, monto, procesada=False):
+        pozo = self._pozo(partido)
+        pozo["cantidad"][prediccion] += 1
+        pozo["monto"][prediccion] += monto
+        del_jugador = pozo["jugadores"].setdefault(jugador, dict.fromkeys(PREDICCIONES, 0))
+        del_jugador[prediccion] += monto
+        if not procesada:
+            pozo["pendientes"][indice] = None
+
+    def _agregar_apuesta(self, indice):
+        apuesta = self.datos["bets"][indice]
+        self._agregar(indice, apuesta["partido"], apuesta["jugador"], apuesta["prediccion"], apuesta["monto"])
+
+    def aplicar(self, evento):
+        if evento["tipo"] == "apuesta":
+            self._agregar_apuesta(len(self.datos["bets"]) - 1)
+        elif evento["tipo"] == "resultado":
+            for movimiento in movimientos_del_evento(self.datos, evento):
+                indice = movimiento["apuesta"]
+                if movimiento["concepto"] == "apuesta":
+                    self._agregar_apuesta(indice)
+                else:
+                    self._pozos[self.datos["bets"][indice]["partido"]]["pendientes"].pop(indice, None)
+
+    def cantidad(self, partido, prediccion=None):
+        """Apuestas del partido (en una predicción, o en total)"""
+        pozo = self._pozos.get(partido)
+        if pozo is None:
+            return 0
+        return pozo["cantidad"][prediccion] if prediccion else sum(pozo["cantidad"].values())
+
+    def monto(self, partido, prediccion=None):
+        """Dinero apostado al partido (en una predicción, o en total)"""
+        pozo = self._pozos.get(partido)
+        if pozo is None:
+            return 0
+        return pozo["monto"][prediccion] if prediccion else sum(pozo["monto"].values())
+
+    def del_jugador(self, partido, jugador):
+        """Dinero que el jugador lleva apostado a cada predicción del partido"""
+        pozo = self._pozos.get(partido)
+        if pozo is None or jugador not in pozo["jugadores"]:
+            return dict.fromkeys(PREDICCIONES, 0)
+        return dict(pozo["jugadores"][jugador])
+
+    def cuota_parimutuel(self, partido, prediccion):
+        """Lo que pagaría cada peso apostado a la predicción si el pozo entero
+        se repartiera entre los que aciertan; None si nadie apostó a ella"""
+        apostado = self.monto(partido, prediccion)
+        return self.monto(partido) / apostado if apostado else None
+
+    def apuestas_pendientes(self, datos, partido_keys):
+        """Pares (índice, apuesta) sin liquidar de esos partidos, como los del almacén"""
+        bets = datos["bets"]
+        indices = []
+        for partido in partido_keys:
+            pozo = self._pozos.get(partido)
+            if pozo is not None:
+                indices.extend(pozo["pendientes"])
+        return [(indice, bets[indice]) for indice in sorted(indices)]
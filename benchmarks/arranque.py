@@ -0,0 +1,176 @@
+"""Arranque en frío: importaciones y primera vista de la app.
+
+Desde la raíz del repositorio:
+
+    python -m benchmarks.arranque --jugadores 1000 --grupos 50 --apuestas 100000
+
+Mide, cada vez en un proceso nuevo:
+
+- ``importaciones``: cuánto tarda en importarse Streamlit (que ya trae
+  pandas) y los módulos de la app.
+- ``primera vista``: levanta ``streamlit run app.py`` sobre un torneo
+  sintético y abre una sesión con el mismo protocolo que el navegador. Se
+  mide desde que la sesión pide la página hasta que llegan el primer
+  elemento, el encabezado, el selector de jugador y el ranking, y hasta que
+  termina la ejecución. La actualización en vivo se desactiva
+  (FIFA_REFRESCO=0) para que la ejecución termine.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from almacenamiento import DIRECTORIO_DATOS, crear_almacen
+from benchmarks.sintetico import torneo_sintetico
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUTA_APP = os.path.join(RAIZ, "app.py")
+
+# Segundos máximos para que el servidor responda y para que termine la primera vista
+ESPERA_SERVIDOR = 60
+ESPERA_VISTA = 120
+
+CODIGO_IMPORTACIONES = """
+import json, sys, time
+tiempos = {}
+for nombre, modulos in [("streamlit", ["streamlit"]),
+                        ("módulos de la app", ["estado", "torneos", "trabajadores", "importacion", "simulacion"])]:
+    inicio = time.perf_counter()
+    for modulo in modulos:
+        __import__(modulo)
+    tiempos[nombre] = time.perf_counter() - inicio
+print(json.dumps(tiempos))
+"""
+
+def medir_importaciones():
+    salida = subprocess.run([sys.executable, "-c", CODIGO_IMPORTACIONES], cwd=RAIZ,
+                            capture_output=True, text=True, check=True)
+    return json.loads(salida.stdout)
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _esperar_servidor(puerto, proceso):
+    limite = time.monotonic() + ESPERA_SERVIDOR
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError("streamlit terminó antes de responder")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{puerto}/_stcore/health", timeout=1) as respuesta:
+                if respuesta.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("streamlit no respondió a tiempo")
+
+def _hito(mensaje):
+    """Nombre del hito que marca un mensaje del servidor, o None"""
+    tipo = mensaje.WhichOneof("type")
+    if tipo == "script_finished":
+        # La ejecución que se corta con st.rerun() no cuenta: sigue la siguiente
+        if mensaje.script_finished == mensaje.FINISHED_EARLY_FOR_RERUN:
+            return None
+        return "ejecución terminada"
+    if tipo != "delta" or mensaje.delta.WhichOneof("type") != "new_element":
+        return None
+    elemento = mensaje.delta.new_element
+    clase = elemento.WhichOneof("type")
+    if clase == "markdown" and "main-header" in elemento.markdown.body:
+        return "encabezado"
+    if clase == "selectbox" and elemento.selectbox.id and "selector_jugador" in elemento.selectbox.id:
+        return "selector de jugador"
+    if clase == "markdown" and "Ranking de Apostadores" in elemento.markdown.body:
+        return "ranking"
+    return "primer elemento"
+
+async def _abrir_sesion(puerto):
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+    from tornado.websocket import websocket_connect
+
+    conexion = await websocket_connect(f"ws://127.0.0.1:{puerto}/_stcore/stream")
+    pedido = BackMsg()
+    pedido.rerun_script.query_string = ""
+    pedido.rerun_script.page_script_hash = ""
+    inicio = time.perf_counter()
+    await conexion.write_message(pedido.SerializeToString(), binary=True)
+
+    hitos = {}
+    while "ejecución terminada" not in hitos:
+        crudo = await asyncio.wait_for(conexion.read_message(), ESPERA_VISTA)
+        if crudo is None:
+            raise RuntimeError("el servidor cerró la sesión")
+        mensaje = ForwardMsg()
+        mensaje.ParseFromString(crudo)
+        hito = _hito(mensaje)
+        if hito is not None:
+            hitos.setdefault(hito, time.perf_counter() - inicio)
+    conexion.close()
+    return hitos
+
+def medir_primera_vista(directorio):
+    """Servidor nuevo sobre el torneo de ``directorio`` y una sesión: segundos hasta cada hito"""
+    puerto = _puerto_libre()
+    entorno = {**os.environ, "FIFA_REFRESCO": "0", "PYTHONPATH": RAIZ}
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", RUTA_APP, "--server.headless", "true",
+         "--server.port", str(puerto), "--browser.gatherUsageStats", "false"],
+        cwd=directorio, env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        _esperar_servidor(puerto, proceso)
+        hitos = {"servidor listo (desde el arranque)": time.perf_counter() - inicio}
+        hitos.update(asyncio.run(_abrir_sesion(puerto)))
+        return hitos
+    finally:
+        proceso.terminate()
+        proceso.wait()
+
+def _mediana(muestras, clave):
+    valores = [muestra[clave] for muestra in muestras if clave in muestra]
+    return statistics.median(valores) if valores else None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jugadores", type=int, default=10)
+    parser.add_argument("--grupos", type=int, default=2)
+    parser.add_argument("--equipos", type=int, default=4, help="equipos por grupo")
+    parser.add_argument("--apuestas", type=int, default=0)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--resultados", help="escribir los resultados en este archivo JSON")
+    args = parser.parse_args()
+
+    importaciones = [medir_importaciones() for _ in range(args.repeticiones)]
+    with tempfile.TemporaryDirectory() as directorio:
+        crear_almacen(os.path.join(directorio, DIRECTORIO_DATOS)).guardar(
+            torneo_sintetico(args.jugadores, args.grupos, args.equipos, args.apuestas))
+        vistas = [medir_primera_vista(directorio) for _ in range(args.repeticiones)]
+
+    resultados = {}
+    print(f"Medianas de {args.repeticiones} arranques en frío")
+    for titulo, muestras in (("importaciones", importaciones), ("primera vista", vistas)):
+        print(f"\n{titulo}")
+        claves = []
+        for muestra in muestras:
+            claves += [clave for clave in muestra if clave not in claves]
+        for clave in claves:
+            mediana = _mediana(muestras, clave)
+            resultados[f"{titulo}: {clave}"] = mediana
+            print(f"  {clave:<38} {mediana * 1000:>9.1f} ms")
+
+    if args.resultados:
+        with open(args.resultados, 'w', encoding='utf-8') as f:
+            json.dump({"parametros": vars(args), "resultados": resultados}, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
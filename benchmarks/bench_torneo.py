@@ -0,0 +1,129 @@
+"""Benchmarks de las rutas calientes del torneo, sin Streamlit.
+
+Desde la raíz del repositorio:
+
+    python -m benchmarks.bench_torneo --jugadores 1000 --grupos 50 --apuestas 1000000
+
+Mide tiempo y memoria pico (tracemalloc) de carga, guardado, tabla de
+posiciones, listado de partidos pendientes y liquidación, para cada almacén,
+y la simulación en este proceso y repartida entre FIFA_TRABAJADORES procesos.
+"""
+import argparse
+import copy
+import gc
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import trabajadores
+from almacenamiento import ALMACENES, registrar_evento
+from apuestas import Pozos
+from benchmarks.sintetico import jornada_sintetica, torneo_sintetico
+from liquidacion import liquidar_partidos
+from simulacion import simular
+from torneo import Calendario, TablaPosiciones, id_partido
+
+class Medidor:
+    """Ejecuta pasos medidos y acumula los resultados"""
+
+    def __init__(self, memoria=True):
+        self.memoria = memoria
+        self.resultados = []
+
+    def medir(self, nombre, funcion):
+        gc.collect()
+        if self.memoria:
+            tracemalloc.start()
+        inicio = time.perf_counter()
+        valor = funcion()
+        segundos = time.perf_counter() - inicio
+        pico = None
+        if self.memoria:
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        self.resultados.append({"paso": nombre, "segundos": segundos, "memoria_pico": pico})
+        memoria = f"{pico / 2 ** 20:>9.1f} MiB" if pico is not None else ""
+        print(f"{nombre:<42} {segundos * 1000:>11.1f} ms {memoria}")
+        return valor
+
+def bench_logica(medidor, datos, jornada):
+    """Pasos que no dependen del almacén"""
+    tabla = medidor.medir("tabla: construir", lambda: TablaPosiciones.desde_datos(datos))
+    medidor.medir("tabla: leer todos los grupos", lambda: [tabla.tabla(g) for g in tabla.grupos()])
+    medidor.medir("tabla: agregar un resultado", lambda: tabla.agregar_partido(jornada[0]))
+
+    calendario = medidor.medir("calendario: construir", lambda: Calendario.desde_datos(datos))
+    medidor.medir("calendario: listar pendientes", lambda: list(calendario.pendientes()))
+    medidor.medir("calendario: próximos 3", lambda: calendario.proximos(3))
+
+    pendientes = list(calendario.pendientes())
+    medidor.medir("simulación: un proceso", lambda: simular(tabla, pendientes, datos["matches"], semilla=0))
+    medidor.medir(f"simulación: {trabajadores.TRABAJADORES} trabajadores",
+                  lambda: trabajadores.simular(tabla, pendientes, datos["matches"], semilla=0).result())
+
+def bench_almacen(medidor, nombre, datos, jornada, directorio):
+    """Pasos de persistencia y liquidación con un almacén concreto"""
+    almacen = ALMACENES[nombre](directorio)
+
+    medidor.medir(f"{nombre}: guardar todo", lambda: almacen.guardar(datos))
+    tamano = sum(os.path.getsize(os.path.join(directorio, f)) for f in os.listdir(directorio))
+    print(f"{nombre + ': tamaño en disco':<42} {tamano / 2 ** 20:>11.1f} MiB")
+    medidor.resultados.append({"paso": f"{nombre}: tamaño en disco", "bytes": tamano})
+
+    cargados = medidor.medir(f"{nombre}: cargar", almacen.cargar)
+
+    partido = jornada[0]
+    evento = {"tipo": "apuesta", "apuesta": {
+        "jugador": next(iter(cargados["players"])),
+        "partido": id_partido(partido["local"], partido["visitante"]),
+        "local": partido["local"],
+        "visitante": partido["visitante"],
+        "prediccion": "Local",
+        "monto": 100,
+        "fase": "groups",
+        "procesada": False,
+        "resultado": "PENDIENTE"
+    }}
+    medidor.medir(f"{nombre}: registrar una apuesta", lambda: registrar_evento(cargados, evento, almacen))
+
+    # Las pendientes de la jornada, con las consultas del almacén o con la vista de pozos
+    pozos = medidor.medir(f"{nombre}: armar los pozos", lambda: Pozos.desde_datos(cargados))
+    medidor.medir(f"{nombre}: liquidar jornada con los pozos", lambda: liquidar_partidos(cargados, jornada, pozos))
+    liquidaciones = medidor.medir(f"{nombre}: liquidar jornada ({len(jornada)} partidos)",
+                                  lambda: liquidar_partidos(cargados, jornada, almacen))
+    medidor.medir(f"{nombre}: registrar la jornada", lambda: registrar_evento(
+        cargados, {"tipo": "resultado", "partidos": jornada, "liquidaciones": liquidaciones}, almacen))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jugadores", type=int, default=1000)
+    parser.add_argument("--grupos", type=int, default=50)
+    parser.add_argument("--equipos", type=int, default=4, help="equipos por grupo")
+    parser.add_argument("--apuestas", type=int, default=1_000_000)
+    parser.add_argument("--jornada", type=int, default=10, help="partidos liquidados de una vez")
+    parser.add_argument("--almacenes", nargs="+", default=list(ALMACENES), choices=list(ALMACENES))
+    parser.add_argument("--sin-memoria", action="store_true", help="no medir memoria (tracemalloc)")
+    parser.add_argument("--resultados", help="escribir los resultados en este archivo JSON")
+    args = parser.parse_args()
+
+    print(f"Generando torneo: {args.jugadores} jugadores, {args.grupos} grupos de {args.equipos}, "
+          f"{args.apuestas} apuestas")
+    datos = torneo_sintetico(args.jugadores, args.grupos, args.equipos, args.apuestas)
+    jornada = jornada_sintetica(datos, args.jornada)
+
+    medidor = Medidor(memoria=not args.sin_memoria)
+    bench_logica(medidor, datos, jornada)
+    for nombre in args.almacenes:
+        with tempfile.TemporaryDirectory() as directorio:
+            bench_almacen(medidor, nombre, copy.deepcopy(datos), jornada, directorio)
+
+    if args.resultados:
+        with open(args.resultados, 'w', encoding='utf-8') as f:
+            json.dump({"parametros": vars(args), "resultados": medidor.resultados}, f, indent=2,
+                      ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
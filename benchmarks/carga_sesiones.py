@@ -0,0 +1,304 @@
+"""Prueba de carga con varias sesiones simultáneas contra el mismo torneo.
+
+Desde la raíz del repositorio:
+
+    python -m benchmarks.carga_sesiones --sesiones 50 --procesos 4 --apuestas 5
+
+Cada sesión elige su nombre en el selector, hace apuestas rápidas con los
+botones Local/Empate/Visitante y una sesión de administradora registra
+resultados. Se informa la latencia de cada rerun (p50/p95/p99), el
+rendimiento y las actualizaciones perdidas: apuestas que la app dio por
+aceptadas y que no están en el almacén al terminar. Aparte se cuentan los
+saldos que no cuadran con el ledger. Los clics sin efecto son los de
+sesiones que aún mostraban un partido que otra sesión ya había liquidado:
+al cambiar la etiqueta del botón Streamlit lo trata como otro widget y el
+clic se pierde, igual que en el navegador, pero no se descuenta nada.
+
+Modos:
+
+- ``apptest``: ejecuta app.py de verdad con ``streamlit.testing.v1.AppTest``.
+  AppTest usa un Runtime global por proceso, así que las sesiones de un mismo
+  proceso se turnan y la concurrencia real viene de usar varios procesos.
+  La latencia de un clic incluye la rerun que pide la app con st.rerun().
+- ``directo``: sustituto sin Streamlit que hace por cada acción lo mismo que
+  una rerun (sincronizar, leer tablas, calendario, historial y ranking, y
+  apostar), con las sesiones en hilos dentro de cada proceso.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+
+from almacenamiento import DIRECTORIO_DATOS, crear_almacen, datos_iniciales, jugador_nuevo
+from liquidacion import MULTIPLICADOR_PREMIO
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUTA_APP = os.path.join(RAIZ, "app.py")
+
+ADMIN = "Aleja"
+BOTONES = {"local_btn": "Local", "empate_btn": "Empate", "visitante_btn": "Visitante"}
+MONTO_RAPIDO = 100
+
+def nombre_sesion(i):
+    return f"Jugador {i + 1}"
+
+def preparar_torneo(directorio, sesiones):
+    """Torneo nuevo con un jugador por sesión, en el almacén configurado"""
+    datos = datos_iniciales()
+    for i in range(sesiones):
+        datos["players"][nombre_sesion(i)] = jugador_nuevo()
+    almacen = crear_almacen(os.path.join(directorio, DIRECTORIO_DATOS))
+    almacen.guardar(datos)
+
+def _parchear_apptest():
+    """Ajustes para AppTest de Streamlit 1.28 (no cambian la app).
+
+    - ``AppTest.run`` vuelve en cuanto la ejecución se corta por ``st.rerun()``,
+      con la rerun aún corriendo en otro hilo: se espera a que termine y el
+      árbol se arma solo con los mensajes de la última ejecución.
+    - En esa rerun el botón pulsado sigue activo y la app entra en bucle;
+      el frontend real manda la rerun sin el disparador.
+    - Los selectbox con opciones dict (partidos) fallan al serializar su valor.
+    """
+    from streamlit.runtime.scriptrunner import ScriptRunnerEvent
+    from streamlit.runtime.scriptrunner.script_runner import ScriptRunner
+    from streamlit.testing.v1.element_tree import Selectbox, parse_tree_from_messages
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+    run = LocalScriptRunner.run
+
+    def _run(self, *args, **kwargs):
+        run(self, *args, **kwargs)
+        self.join()
+        inicio = max(i for i, evento in enumerate(self.events) if evento == ScriptRunnerEvent.SCRIPT_STARTED)
+        mensajes = [datos["forward_msg"]
+                    for evento, datos in zip(self.events[inicio:], self.event_data[inicio:])
+                    if evento == ScriptRunnerEvent.ENQUEUE_FORWARD_MSG]
+        return parse_tree_from_messages(mensajes)
+
+    LocalScriptRunner.run = _run
+
+    run_script = ScriptRunner._run_script
+
+    def _run_script(self, rerun_data):
+        if rerun_data.widget_states is None:
+            self._session_state._state._reset_triggers()
+        return run_script(self, rerun_data)
+
+    ScriptRunner._run_script = _run_script
+
+    indice = Selectbox.index
+
+    def _indice(self):
+        if self.value is not None and not isinstance(self.value, str) and self.options:
+            return self.proto.default
+        return indice.fget(self)
+
+    Selectbox.index = property(_indice)
+
+def _medir(latencias, funcion):
+    inicio = time.perf_counter()
+    valor = funcion()
+    latencias.append((time.perf_counter() - inicio) * 1000)
+    return valor
+
+def _apuesta_aceptada(antes, despues):
+    """Si la apuesta rápida de un clic se aceptó, por el saldo mostrado antes y después.
+
+    Entre las dos vistas también pueden llegar premios, pero son múltiplos
+    de MULTIPLICADOR_PREMIO * MONTO_RAPIDO (par): la apuesta se aceptó si
+    el saldo bajó un múltiplo impar de MONTO_RAPIDO.
+    """
+    return (antes - despues) // MONTO_RAPIDO % 2 == 1
+
+def _correr_apptest(nombres, apuestas, resultados, semilla):
+    from streamlit.testing.v1 import AppTest
+
+    assert MULTIPLICADOR_PREMIO % 2 == 0, "_apuesta_aceptada supone premios pares"
+    # Con la actualización en vivo la ejecución de cada sesión no termina
+    os.environ["FIFA_REFRESCO"] = os.environ["FIFA_REFRESCO_ESPECTADOR"] = "0"
+    _parchear_apptest()
+    azar = random.Random(semilla)
+    latencias = []
+    conteo = {"intentadas": 0, "rechazadas": 0, "aceptadas": {}}
+
+    sesiones = []
+    for nombre in nombres:
+        at = AppTest.from_file(RUTA_APP, default_timeout=120)
+        _medir(latencias, at.run)
+        at.selectbox(key="selector_jugador").select(nombre)
+        _medir(latencias, at.run)
+        sesiones.append(at)
+
+    # Acciones intercaladas: en cada ronda cada sesión hace una acción
+    acciones = [("apuesta", at) for at in sesiones for _ in range(apuestas)]
+    acciones += [("resultado", at) for at in sesiones if at.session_state["jugador_seleccionado"] == ADMIN
+                 for _ in range(resultados)]
+    azar.shuffle(acciones)
+
+    for tipo, at in acciones:
+        if tipo == "apuesta":
+            jugador, antes = at.session_state["dinero_mostrado"]
+            at.button(key=azar.choice(list(BOTONES))).click()
+            conteo["intentadas"] += 1
+        else:
+            at.number_input(key="admin_gl").set_value(azar.randint(0, 4))
+            at.number_input(key="admin_gv").set_value(azar.randint(0, 4))
+            at.button(key="registrar_btn").click()
+        _medir(latencias, at.run)
+        if tipo == "apuesta" and at.error:
+            conteo["rechazadas"] += 1
+        elif tipo == "apuesta" and _apuesta_aceptada(antes, at.session_state["dinero_mostrado"][1]):
+            conteo["aceptadas"][jugador] = conteo["aceptadas"].get(jugador, 0) + 1
+
+    return latencias, conteo
+
+def _correr_directo(nombres, apuestas, resultados, semilla):
+    from estado import EstadoTorneo
+    from torneo import id_partido
+
+    # Un estado por proceso, como st.cache_resource
+    estado = EstadoTorneo()
+    latencias = []
+    conteo = {"intentadas": 0, "rechazadas": 0, "aceptadas": {}}
+
+    def rerun(jugador):
+        """Lo que lee una rerun de la app antes de pintar"""
+        estado.sincronizar()
+        tabla = estado.vista("tabla")
+        for grupo in tabla.grupos():
+            tabla.tabla(grupo)
+        calendario = estado.vista("calendario")
+        pendientes = list(calendario.pendientes())
+        estado.vista("apuestas").pagina(jugador, 0, 10)
+        estado.vista("clasificacion").primeros(50)
+        return pendientes
+
+    def sesion(nombre, semilla_sesion):
+        azar = random.Random(semilla_sesion)
+        # Apuestas intentadas y aceptadas por la app (las demás, rechazadas)
+        propias = [0, 0]
+        for _ in range(apuestas if nombre != ADMIN else resultados):
+            inicio = time.perf_counter()
+            pendientes = rerun(nombre)
+            if not pendientes:
+                break
+            partido = pendientes[0]
+            if nombre == ADMIN:
+                estado.registrar_resultados([{**partido, "goles_local": azar.randint(0, 4),
+                                              "goles_visitante": azar.randint(0, 4), "fecha": ""}])
+            else:
+                propias[0] += 1
+                apuesta = {
+                    "jugador": nombre,
+                    "partido": id_partido(partido["local"], partido["visitante"]),
+                    "local": partido["local"],
+                    "visitante": partido["visitante"],
+                    "prediccion": azar.choice(list(BOTONES.values())),
+                    "monto": MONTO_RAPIDO,
+                    "fase": "groups",
+                    "procesada": False,
+                    "resultado": "PENDIENTE"
+                }
+                if estado.apostar(apuesta, estado.datos["players"][nombre]["dinero"]):
+                    propias[1] += 1
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        return propias
+
+    with ThreadPoolExecutor(max_workers=len(nombres)) as hilos:
+        for nombre, (intentadas, aceptadas) in zip(nombres, hilos.map(sesion, nombres,
+                                                                      range(semilla, semilla + len(nombres)))):
+            conteo["intentadas"] += intentadas
+            conteo["rechazadas"] += intentadas - aceptadas
+            if aceptadas:
+                conteo["aceptadas"][nombre] = aceptadas
+
+    return latencias, conteo
+
+def trabajador(modo, directorio, nombres, apuestas, resultados, semilla):
+    """Corre un grupo de sesiones dentro de un proceso"""
+    os.chdir(directorio)
+    correr = _correr_apptest if modo == "apptest" else _correr_directo
+    return correr(nombres, apuestas, resultados, semilla)
+
+def verificar(directorio, sesiones):
+    """Apuestas registradas por jugador y saldos que no cuadran con el ledger"""
+    almacen = crear_almacen(os.path.join(directorio, DIRECTORIO_DATOS))
+    datos = almacen.cargar()
+    nombres = {nombre_sesion(i) for i in range(sesiones)} | {ADMIN}
+    registradas = {}
+    for apuesta in datos["bets"]:
+        if apuesta["jugador"] in nombres:
+            registradas[apuesta["jugador"]] = registradas.get(apuesta["jugador"], 0) + 1
+
+    movimientos = {}
+    for movimiento in datos["ledger"]:
+        movimientos[movimiento["jugador"]] = movimientos.get(movimiento["jugador"], 0) + movimiento["monto"]
+    inicial = jugador_nuevo()["dinero"]
+    descuadrados = [jugador for jugador, datos_jugador in datos["players"].items()
+                    if datos_jugador["dinero"] != inicial + movimientos.get(jugador, 0)]
+    return registradas, descuadrados
+
+def percentil(valores, p):
+    return statistics.quantiles(valores, n=100, method="inclusive")[p - 1] if len(valores) > 1 else valores[0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sesiones", type=int, default=50, help="jugadores simultáneos")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--apuestas", type=int, default=5, help="apuestas rápidas por jugador")
+    parser.add_argument("--resultados", type=int, default=5, help="resultados que registra la administradora")
+    parser.add_argument("--modo", choices=["apptest", "directo"], default="apptest")
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.modo == "apptest":
+        try:
+            import streamlit.testing.v1  # noqa: F401
+        except ImportError:
+            print("Streamlit no está instalado: usando el modo directo")
+            args.modo = "directo"
+
+    procesos = max(1, min(args.procesos, args.sesiones))
+    nombres = [nombre_sesion(i) for i in range(args.sesiones)]
+    repartos = [nombres[i::procesos] for i in range(procesos)]
+    repartos[0].append(ADMIN)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        preparar_torneo(directorio, args.sesiones)
+
+        inicio = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=get_context("spawn")) as pool:
+            futuros = [pool.submit(trabajador, args.modo, directorio, reparto, args.apuestas,
+                                   args.resultados, args.semilla + i * 1000)
+                       for i, reparto in enumerate(repartos)]
+            salidas = [futuro.result() for futuro in futuros]
+        segundos = time.perf_counter() - inicio
+
+        registradas, descuadrados = verificar(directorio, args.sesiones)
+
+    latencias = [latencia for salida in salidas for latencia in salida[0]]
+    intentadas = sum(salida[1]["intentadas"] for salida in salidas)
+    rechazadas = sum(salida[1]["rechazadas"] for salida in salidas)
+    aceptadas = {}
+    for salida in salidas:
+        aceptadas.update(salida[1]["aceptadas"])
+    # Aceptadas por la app y que no quedaron guardadas
+    perdidas = sum(max(0, cantidad - registradas.get(jugador, 0)) for jugador, cantidad in aceptadas.items())
+    sin_efecto = intentadas - rechazadas - sum(aceptadas.values())
+
+    print(f"Sesiones: {args.sesiones} + administradora en {procesos} procesos (modo {args.modo})")
+    print(f"Reruns: {len(latencias)} en {segundos:.1f} s -> {len(latencias) / segundos:.1f} reruns/s")
+    print(f"Latencia (ms): p50 {percentil(latencias, 50):.1f}  p95 {percentil(latencias, 95):.1f}  "
+          f"p99 {percentil(latencias, 99):.1f}  máx {max(latencias):.1f}")
+    print(f"Apuestas: {intentadas} intentadas, {sum(aceptadas.values())} aceptadas, "
+          f"{sum(registradas.values())} registradas, {rechazadas} rechazadas, {sin_efecto} clics sin efecto")
+    print(f"Actualizaciones perdidas: {perdidas}")
+    print(f"Saldos que no cuadran con el ledger: {len(descuadrados)}")
+
+if __name__ == "__main__":
+    main()
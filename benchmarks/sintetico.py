@@ -0,0 +1,78 @@
+import random
+
+from almacenamiento import datos_iniciales
+from compacto import PREDICCIONES
+from liquidacion import MULTIPLICADOR_PREMIO, resultado_real
+from torneo import id_partido, obtener_partidos_para_apostar
+
+# Saldo inicial alto para que ningún jugador sintético quede en negativo
+DINERO_SINTETICO = 10 ** 9
+
+def torneo_sintetico(jugadores=1000, grupos=50, equipos_por_grupo=4, apuestas=1_000_000,
+                     jugados=0.5, semilla=0):
+    """Torneo con datos aleatorios pero coherentes (saldos, liquidaciones y ledger)"""
+    azar = random.Random(semilla)
+    datos = datos_iniciales()
+    datos["groups"] = {
+        f"Grupo {g + 1}": [f"Equipo {g + 1}-{i + 1}" for i in range(equipos_por_grupo)]
+        for g in range(grupos)
+    }
+    datos["players"] = {
+        f"Jugador {i + 1}": {"dinero": DINERO_SINTETICO, "apuestas_ganadas": 0, "apuestas_perdidas": 0}
+        for i in range(jugadores)
+    }
+
+    partidos = obtener_partidos_para_apostar(datos)
+    resultados = {}
+    for partido in azar.sample(partidos, int(len(partidos) * jugados)):
+        jugado = {**partido, "goles_local": azar.randint(0, 4), "goles_visitante": azar.randint(0, 4),
+                  "fecha": "2025-01-01 20:00"}
+        datos["matches"].append(jugado)
+        resultados[id_partido(partido["local"], partido["visitante"])] = resultado_real(jugado)
+
+    nombres = list(datos["players"])
+    seq = 0
+    for indice in range(apuestas):
+        seq += 1
+        partido = azar.choice(partidos)
+        clave = id_partido(partido["local"], partido["visitante"])
+        jugador = azar.choice(nombres)
+        monto = azar.randrange(10, 110, 10)
+        apuesta = {
+            "jugador": jugador,
+            "partido": clave,
+            "local": partido["local"],
+            "visitante": partido["visitante"],
+            "prediccion": azar.choice(PREDICCIONES),
+            "monto": monto,
+            "fase": "groups",
+            "procesada": False,
+            "resultado": "PENDIENTE"
+        }
+        datos["players"][jugador]["dinero"] -= monto
+        datos["ledger"].append({"seq": seq, "apuesta": indice, "jugador": jugador,
+                                "concepto": "apuesta", "monto": -monto})
+
+        if clave in resultados:
+            seq += 1
+            ganada = apuesta["prediccion"] == resultados[clave]
+            ganancias = monto * MULTIPLICADOR_PREMIO if ganada else 0
+            apuesta.update(procesada=True, resultado="GANADA" if ganada else "PERDIDA", ganancias=ganancias)
+            datos["players"][jugador]["dinero"] += ganancias
+            datos["players"][jugador]["apuestas_ganadas" if ganada else "apuestas_perdidas"] += 1
+            datos["ledger"].append({"seq": seq, "apuesta": indice, "jugador": jugador,
+                                    "concepto": "liquidacion", "monto": ganancias})
+        # Las apuestas se guardan por columnas: se agrega ya con su liquidación
+        datos["bets"].append(apuesta)
+
+    datos["secuencia"] = seq
+    return datos
+
+def jornada_sintetica(datos, partidos=10, semilla=1):
+    """Resultados aleatorios para los próximos partidos pendientes"""
+    azar = random.Random(semilla)
+    return [
+        {**partido, "goles_local": azar.randint(0, 4), "goles_visitante": azar.randint(0, 4),
+         "fecha": "2025-01-02 20:00"}
+        for partido in obtener_partidos_para_apostar(datos)[:partidos]
+    ]
@@ -0,0 +1,366 @@
+"""Representación compacta de las apuestas y del ledger.
+
+Son las dos partes del torneo que crecen sin límite. En lugar de un dict
+por fila se guardan en columnas de enteros (``array``): los nombres
+(jugadores, equipos, partidos) pasan por un catálogo que les da un id y los
+valores fijos (predicción, resultado, fase, concepto) son códigos. Cada fila
+se sigue usando como un dict a través de un ``Registro`` con ``__slots__``
+que solo apunta a su posición.
+"""
+import sys
+from array import array
+from collections.abc import Mapping
+
+import numpy as np
+
+# Vocabularios del torneo, definidos solo aquí y de aquí importados en los
+# demás módulos. El orden da los códigos que se guardan en memoria y en disco
+PREDICCIONES = ["Local", "Empate", "Visitante"]
+ESTADOS_APUESTA = ["PENDIENTE", "GANADA", "PERDIDA"]
+FASES = ["groups", "semifinals", "final", "third_place"]
+CONCEPTOS = ["apuesta", "liquidacion"]
+
+# Código de cada predicción, que es también el del resultado de un partido
+CODIGOS_PREDICCION = {prediccion: codigo for codigo, prediccion in enumerate(PREDICCIONES)}
+
+# Claves de una apuesta y de un movimiento del ledger, en orden
+COLUMNAS_APUESTA = ("jugador", "partido", "local", "visitante", "prediccion",
+                    "monto", "fase", "procesada", "resultado", "ganancias")
+COLUMNAS_MOVIMIENTO = ("seq", "apuesta", "jugador", "concepto", "monto")
+
+# Ganancias de una apuesta que todavía no se liquidó (la clave no existe)
+SIN_GANANCIAS = -1
+
+class Catalogo:
+    """Nombres con un id entero, en orden de alta (los textos se internan)"""
+
+    __slots__ = ("nombres", "_ids")
+
+    def __init__(self, nombres=()):
+        self.nombres = []
+        self._ids = {}
+        for nombre in nombres:
+            self.id(nombre)
+
+    def id(self, nombre):
+        codigo = self._ids.get(nombre)
+        if codigo is None:
+            if isinstance(nombre, str):
+                nombre = sys.intern(nombre)
+            codigo = self._ids[nombre] = len(self.nombres)
+            self.nombres.append(nombre)
+        return codigo
+
+    def buscar(self, nombre):
+        """Id del nombre, o None si nunca se dio de alta"""
+        return self._ids.get(nombre)
+
+    def __getitem__(self, codigo):
+        return self.nombres[codigo]
+
+    def __len__(self):
+        return len(self.nombres)
+
+class Registro(Mapping):
+    """Fila de una tabla compacta que se lee y se modifica como un dict"""
+
+    __slots__ = ("_tabla", "_indice")
+
+    def __init__(self, tabla, indice):
+        self._tabla = tabla
+        self._indice = indice
+
+    def __getitem__(self, campo):
+        return self._tabla.leer(self._indice, campo)
+
+    def __setitem__(self, campo, valor):
+        self._tabla.escribir(self._indice, campo, valor)
+
+    def update(self, *args, **kwargs):
+        for campo, valor in dict(*args, **kwargs).items():
+            self[campo] = valor
+
+    def __iter__(self):
+        return (campo for campo in self._tabla.CAMPOS if self._tabla.tiene(self._indice, campo))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+class TablaCompacta:
+    """Base de las tablas por columnas.
+
+    Cada subclase declara sus CAMPOS (las claves de cada fila, en orden),
+    los atributos ``array`` que guarda (ARREGLOS) y sus catálogos
+    (CATALOGOS), que es todo lo que hace falta para escribirla y leerla, y
+    da ``columna(campo)`` con los valores de un campo en todas las filas.
+    """
+
+    CAMPOS = ()
+    # Campos que pueden faltar en una fila (su columna da None)
+    OPCIONALES = ()
+    ARREGLOS = ()
+    CATALOGOS = ()
+
+    def __len__(self):
+        return len(getattr(self, self.ARREGLOS[-1]))
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [Registro(self, i) for i in range(*indice.indices(len(self)))]
+        if indice < 0:
+            indice += len(self)
+        if not 0 <= indice < len(self):
+            raise IndexError(indice)
+        return Registro(self, indice)
+
+    def __iter__(self):
+        return (Registro(self, indice) for indice in range(len(self)))
+
+    def extend(self, filas):
+        for fila in filas:
+            self.append(fila)
+
+    def tiene(self, indice, campo):
+        return campo in self.CAMPOS
+
+    def columnas(self, *campos):
+        """Tuplas con esos campos de cada fila, sin crear registros"""
+        return zip(*(self.columna(campo) for campo in campos))
+
+    def a_dicts(self):
+        filas = []
+        for valores in self.columnas(*self.CAMPOS):
+            fila = dict(zip(self.CAMPOS, valores))
+            for campo in self.OPCIONALES:
+                if fila[campo] is None:
+                    del fila[campo]
+            filas.append(fila)
+        return filas
+
+    def descripcion(self):
+        """Catálogos y forma de las columnas: lo que leer_de necesita además de los bytes"""
+        return {
+            "orden": sys.byteorder,
+            "catalogos": {nombre: getattr(self, nombre).nombres for nombre in self.CATALOGOS},
+            "arreglos": {nombre: [getattr(self, nombre).typecode, len(getattr(self, nombre))]
+                         for nombre in self.ARREGLOS}
+        }
+
+    def escribir_en(self, f):
+        """Escribe las columnas, tal como están en memoria, en el archivo binario f"""
+        for nombre in self.ARREGLOS:
+            getattr(self, nombre).tofile(f)
+
+    @classmethod
+    def leer_de(cls, f, descripcion):
+        """Tabla escrita con escribir_en, a partir de su descripcion"""
+        tabla = cls()
+        for nombre, nombres in descripcion["catalogos"].items():
+            setattr(tabla, nombre, Catalogo(nombres))
+        for nombre, (tipo, largo) in descripcion["arreglos"].items():
+            columna = array(tipo)
+            columna.fromfile(f, largo)
+            if descripcion["orden"] != sys.byteorder:
+                columna.byteswap()
+            setattr(tabla, nombre, columna)
+        return tabla
+
+def _copia_numpy(columna, dtype):
+    # Copia en una sola llamada: una vista sobre el buffer impediría que
+    # otro hilo agregue filas mientras tanto
+    return np.array(columna, dtype=dtype) if len(columna) else np.zeros(0, dtype=dtype)
+
+class Apuestas(TablaCompacta):
+    """Apuestas del torneo (datos["bets"]) por columnas.
+
+    Cada partido se guarda una vez en el catálogo de partidos, con sus dos
+    equipos; las apuestas solo llevan el id del partido.
+    """
+
+    CAMPOS = COLUMNAS_APUESTA
+    OPCIONALES = ("ganancias",)
+    CATALOGOS = ("jugadores", "equipos", "partidos", "predicciones", "fases", "resultados")
+    ARREGLOS = ("equipos_partido", "jugador", "partido", "prediccion", "fase",
+                "resultado", "procesada", "ganancias", "monto")
+
+    def __init__(self, filas=()):
+        self.jugadores = Catalogo()
+        self.equipos = Catalogo()
+        self.partidos = Catalogo()
+        self.predicciones = Catalogo(PREDICCIONES)
+        self.fases = Catalogo(FASES)
+        self.resultados = Catalogo(ESTADOS_APUESTA)
+        # Local y visitante de cada partido del catálogo, intercalados
+        self.equipos_partido = array('i')
+
+        self.jugador = array('i')
+        self.partido = array('i')
+        self.prediccion = array('b')
+        self.fase = array('b')
+        self.resultado = array('b')
+        self.procesada = array('b')
+        self.ganancias = array('q')
+        self.monto = array('q')
+        self.extend(filas)
+
+    def _id_partido(self, apuesta):
+        codigo = self.partidos.buscar(apuesta["partido"])
+        if codigo is None:
+            codigo = self.partidos.id(apuesta["partido"])
+            self.equipos_partido.append(self.equipos.id(apuesta.get("local")))
+            self.equipos_partido.append(self.equipos.id(apuesta.get("visitante")))
+        return codigo
+
+    def append(self, apuesta):
+        ganancias = apuesta.get("ganancias")
+        self.jugador.append(self.jugadores.id(apuesta["jugador"]))
+        self.partido.append(self._id_partido(apuesta))
+        self.prediccion.append(self.predicciones.id(apuesta["prediccion"]))
+        self.fase.append(self.fases.id(apuesta.get("fase")))
+        self.resultado.append(self.resultados.id(apuesta.get("resultado", "PENDIENTE")))
+        self.procesada.append(bool(apuesta.get("procesada", False)))
+        self.ganancias.append(SIN_GANANCIAS if ganancias is None else ganancias)
+        # La última columna: len() ya cuenta la fila cuando todo está escrito
+        self.monto.append(apuesta["monto"])
+
+    def columna(self, campo):
+        """Valores de un campo en todas las apuestas (None si no hay ganancias)"""
+        if campo == "jugador":
+            return map(self.jugadores.nombres.__getitem__, self.jugador)
+        if campo == "partido":
+            return map(self.partidos.nombres.__getitem__, self.partido)
+        if campo in ("local", "visitante"):
+            lado = campo == "visitante"
+            return (self.equipos[self.equipos_partido[2 * partido + lado]] for partido in self.partido)
+        if campo == "prediccion":
+            return map(self.predicciones.nombres.__getitem__, self.prediccion)
+        if campo == "fase":
+            return map(self.fases.nombres.__getitem__, self.fase)
+        if campo == "resultado":
+            return map(self.resultados.nombres.__getitem__, self.resultado)
+        if campo == "procesada":
+            return map(bool, self.procesada)
+        if campo == "ganancias":
+            return (None if ganancia == SIN_GANANCIAS else ganancia for ganancia in self.ganancias)
+        if campo == "monto":
+            return iter(self.monto)
+        raise KeyError(campo)
+
+    def leer(self, indice, campo):
+        if campo == "jugador":
+            return self.jugadores[self.jugador[indice]]
+        if campo == "partido":
+            return self.partidos[self.partido[indice]]
+        if campo in ("local", "visitante"):
+            return self.equipos[self.equipos_partido[2 * self.partido[indice] + (campo == "visitante")]]
+        if campo == "prediccion":
+            return self.predicciones[self.prediccion[indice]]
+        if campo == "monto":
+            return self.monto[indice]
+        if campo == "fase":
+            return self.fases[self.fase[indice]]
+        if campo == "procesada":
+            return bool(self.procesada[indice])
+        if campo == "resultado":
+            return self.resultados[self.resultado[indice]]
+        if campo == "ganancias" and self.ganancias[indice] != SIN_GANANCIAS:
+            return self.ganancias[indice]
+        raise KeyError(campo)
+
+    def escribir(self, indice, campo, valor):
+        """Solo cambia lo que cambia al liquidar; el resto de la apuesta es fijo"""
+        if campo == "resultado":
+            self.resultado[indice] = self.resultados.id(valor)
+        elif campo == "ganancias":
+            self.ganancias[indice] = valor
+        elif campo == "procesada":
+            self.procesada[indice] = bool(valor)
+        else:
+            raise KeyError(f"{campo} no se puede modificar")
+
+    def tiene(self, indice, campo):
+        if campo == "ganancias":
+            return self.ganancias[indice] != SIN_GANANCIAS
+        return campo in self.CAMPOS
+
+    # Consultas sobre las columnas
+    def pendientes(self, partido_keys):
+        """Índices de las apuestas sin procesar de un conjunto de partidos"""
+        ids = [codigo for codigo in map(self.partidos.buscar, partido_keys) if codigo is not None]
+        if not ids:
+            return []
+        partidos = _copia_numpy(self.partido, np.int32)
+        procesadas = _copia_numpy(self.procesada, np.int8)
+        return np.flatnonzero(np.isin(partidos, ids) & (procesadas == 0)).tolist()
+
+    def de_jugador(self, jugador):
+        codigo = self.jugadores.buscar(jugador)
+        if codigo is None:
+            return []
+        return np.flatnonzero(_copia_numpy(self.jugador, np.int32) == codigo).tolist()
+
+    def contar(self, partido_key):
+        codigo = self.partidos.buscar(partido_key)
+        return 0 if codigo is None else self.partido.count(codigo)
+
+class Movimientos(TablaCompacta):
+    """Ledger del torneo (datos["ledger"]) por columnas"""
+
+    CAMPOS = COLUMNAS_MOVIMIENTO
+    CATALOGOS = ("jugadores", "conceptos")
+    ARREGLOS = ("seq", "apuesta", "jugador", "concepto", "monto")
+
+    def __init__(self, filas=()):
+        self.jugadores = Catalogo()
+        self.conceptos = Catalogo(CONCEPTOS)
+        self.seq = array('q')
+        self.apuesta = array('q')
+        self.jugador = array('i')
+        self.concepto = array('b')
+        self.monto = array('q')
+        self.extend(filas)
+
+    def append(self, movimiento):
+        self.seq.append(movimiento["seq"])
+        self.apuesta.append(movimiento["apuesta"])
+        self.jugador.append(self.jugadores.id(movimiento["jugador"]))
+        self.concepto.append(self.conceptos.id(movimiento["concepto"]))
+        self.monto.append(movimiento["monto"])
+
+    def columna(self, campo):
+        if campo == "jugador":
+            return map(self.jugadores.nombres.__getitem__, self.jugador)
+        if campo == "concepto":
+            return map(self.conceptos.nombres.__getitem__, self.concepto)
+        if campo in self.CAMPOS:
+            return iter(getattr(self, campo))
+        raise KeyError(campo)
+
+    def leer(self, indice, campo):
+        if campo == "jugador":
+            return self.jugadores[self.jugador[indice]]
+        if campo == "concepto":
+            return self.conceptos[self.concepto[indice]]
+        if campo in self.CAMPOS:
+            return getattr(self, campo)[indice]
+        raise KeyError(campo)
+
+    def escribir(self, indice, campo, valor):
+        raise KeyError(f"{campo} no se puede modificar: el ledger es de solo anexado")
+
+    def arreglos(self):
+        """Copias NumPy de seq, jugador (id en el catálogo jugadores), concepto (código) y monto"""
+        filas = len(self)
+        return (_copia_numpy(self.seq[:filas], np.int64), _copia_numpy(self.jugador[:filas], np.int32),
+                _copia_numpy(self.concepto[:filas], np.int8), _copia_numpy(self.monto[:filas], np.int64))
+
+def a_json(valor):
+    """Para json.dump(default=...): las tablas compactas se escriben como listas de dicts"""
+    if isinstance(valor, TablaCompacta):
+        return valor.a_dicts()
+    if isinstance(valor, Registro):
+        return dict(valor)
+    raise TypeError(f"{type(valor).__name__} no se puede escribir como JSON")
@@ -0,0 +1,116 @@
+"""Instantánea de solo lectura para espectadores.
+
+Tablas de posiciones, próximos partidos y ranking, armados una sola vez por
+versión de los datos, como dict y como HTML ya dibujado: cada espectador
+recibe el mismo texto y verlo no recalcula nada, vean cuantos vean. Los
+dos también se escriben en data/ (spectator.json y spectator.html) para
+servirlos como archivos estáticos, sin pasar por Streamlit.
+"""
+import html
+import json
+import os
+import threading
+from datetime import datetime
+
+from almacenamiento import NOMBRE_ESPECTADOR_HTML, NOMBRE_ESPECTADOR_JSON, a_json
+from torneo import COLUMNAS_TABLA
+
+# Próximos partidos y jugadores del ranking que se muestran
+PROXIMOS = 5
+TOP_RANKING = 50
+
+COLUMNAS_RANKING = ["Jugador", "Dinero", "Ganadas", "Perdidas", "Balance"]
+
+ESTILO = (
+    "<style>"
+    ".espectador table{border-collapse:collapse;width:100%;margin-bottom:1rem}"
+    ".espectador th,.espectador td{border-bottom:1px solid #ddd;padding:4px 8px;text-align:right}"
+    ".espectador th:first-child,.espectador td:first-child{text-align:left}"
+    ".espectador .grupos{display:grid;grid-template-columns:repeat(auto-fit,minmax(320px,1fr));gap:1rem}"
+    "</style>"
+)
+
+def _tabla_html(columnas, filas):
+    encabezado = "".join(f"<th>{html.escape(str(columna))}</th>" for columna in columnas)
+    cuerpo = "".join(
+        "<tr>" + "".join(f"<td>{html.escape(str(fila[columna]))}</td>" for columna in columnas) + "</tr>"
+        for fila in filas
+    )
+    return f"<table><thead><tr>{encabezado}</tr></thead><tbody>{cuerpo}</tbody></table>"
+
+def a_html(instantanea):
+    """Fragmento HTML de la instantánea (sin líneas en blanco, para st.markdown)"""
+    partes = [ESTILO, "<div class='espectador'>", "<h3>📊 Fase de Grupos</h3><div class='grupos'>"]
+    for grupo, filas in instantanea["grupos"].items():
+        partes.append(f"<div><strong>{html.escape(grupo)}</strong>{_tabla_html(['Equipo'] + COLUMNAS_TABLA, filas)}</div>")
+    partes.append("</div><h3>⏭️ Próximos Partidos</h3>")
+    if instantanea["proximos"]:
+        partes.append("<ul>" + "".join(
+            f"<li><strong>{html.escape(p['local'])}</strong> vs <strong>{html.escape(p['visitante'])}</strong>"
+            f" - {html.escape(str(p.get('grupo') or ''))}</li>"
+            for p in instantanea["proximos"]
+        ) + "</ul>")
+    else:
+        partes.append("<p>🎉 Todos los partidos han sido jugados</p>")
+    partes.append("<h3>🏆 Ranking de Apostadores</h3>")
+    partes.append(_tabla_html(COLUMNAS_RANKING, instantanea["ranking"]))
+    partes.append(f"<p><small>Versión {instantanea['version']} · {html.escape(instantanea['generada'])}</small></p>")
+    partes.append("</div>")
+    return "".join(partes)
+
+class Espectador:
+    """Instantánea del torneo para espectadores, regenerada una vez por versión.
+
+    Se suscribe a las escrituras del estado para regenerarse justo después
+    de cada una; los cambios que llegan de otros procesos se recogen al
+    pedirla (``actual``) con la versión nueva.
+    """
+
+    def __init__(self, estado, directorio=None):
+        self.estado = estado
+        directorio = directorio or estado.almacen.directorio
+        self.ruta_json = os.path.join(directorio, NOMBRE_ESPECTADOR_JSON)
+        self.ruta_html = os.path.join(directorio, NOMBRE_ESPECTADOR_HTML)
+        self._lock = threading.Lock()
+        # (instantánea, HTML): se reemplazan juntos
+        self._actual = (None, "")
+        estado.suscribir(self.actual)
+
+    def _generar(self):
+        estado = self.estado
+        tabla = estado.vista("tabla")
+        instantanea = {
+            "nombre": estado.almacen.configuracion["nombre"],
+            "version": estado.version,
+            "generada": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "fase": estado.datos.get("phase"),
+            "grupos": {grupo: tabla.tabla(grupo) for grupo in tabla.grupos()},
+            "proximos": estado.vista("calendario").proximos(PROXIMOS),
+            "ranking": estado.vista("clasificacion").primeros(TOP_RANKING),
+        }
+        fragmento = a_html(instantanea)
+        self._escribir(self.ruta_json, json.dumps(instantanea, ensure_ascii=False, default=a_json))
+        titulo = html.escape(instantanea["nombre"])
+        self._escribir(self.ruta_html, "<!doctype html><html><head><meta charset='utf-8'>"
+                                       f"<title>{titulo}</title></head><body>{fragmento}</body></html>")
+        self._actual = (instantanea, fragmento)
+
+    @staticmethod
+    def _escribir(ruta, texto):
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            f.write(texto)
+        os.replace(temporal, ruta)
+
+    def actual(self):
+        """(instantánea, HTML) de la versión actual; solo se regenera si cambió"""
+        if not self._al_dia():
+            with self._lock:
+                if not self._al_dia():
+                    self._generar()
+        return self._actual
+
+    def _al_dia(self):
+        instantanea = self._actual[0]
+        return instantanea is not None and instantanea["version"] == self.estado.version
@@ -0,0 +1,212 @@
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import metricas
+from almacenamiento import aplicar_evento, obtener_almacen, registrar_evento
+from apuestas import Clasificacion, IndiceApuestas, Pozos
+from historial import HistorialSaldos
+from importacion import validar
+from liquidacion import liquidar_partidos
+from torneo import Calendario, TablaPosiciones, id_partido
+
+# Vistas derivadas del estado: se construyen al pedirlas y luego se mantienen
+# evento a evento con su método aplicar
+VISTAS = {
+    "tabla": TablaPosiciones.desde_datos,
+    "calendario": Calendario.desde_datos,
+    "apuestas": IndiceApuestas.desde_datos,
+    "clasificacion": Clasificacion.desde_datos,
+    "pozos": Pozos.desde_datos,
+    "historial": HistorialSaldos.desde_datos,
+}
+
+# Partes del estado que cambia cada tipo de evento. Cada parte tiene su
+# versión (la secuencia del último evento que la tocó), así que las cachés
+# que dependen de una parte solo se invalidan cuando esa parte cambia
+PARTES_EVENTO = {
+    "apuesta": ("apuestas", "saldos"),
+    "resultado": ("resultados", "apuestas", "saldos"),
+    "fase": ("fase",),
+    "reinicio": ("resultados", "apuestas", "saldos", "fase"),
+}
+PARTES = PARTES_EVENTO["reinicio"]
+
+# Eventos recientes que recuerda cada proceso, para que una sesión vea qué
+# cambió desde su última rerun
+EVENTOS_RECIENTES = 1000
+
+class EstadoTorneo:
+    """Estado del torneo compartido por todas las sesiones del proceso.
+
+    Las lecturas usan directamente ``datos``; toda escritura pasa por
+    ``transaccion`` (bloqueo del proceso + bloqueo de archivo), que antes
+    incorpora lo que hayan escrito otros procesos. Las vistas derivadas
+    (tabla de posiciones, etc.) se actualizan con cada evento, y los últimos
+    eventos quedan en ``cambios_desde`` para las sesiones. ``torneo`` es la
+    etiqueta de sus métricas de tamaño cuando hay varios en el proceso.
+    """
+
+    def __init__(self, almacen=None, torneo=None):
+        self.almacen = almacen or obtener_almacen()
+        self.torneo = torneo
+        self._lock = threading.RLock()
+        self._en_transaccion = False
+        self._vistas = {}
+        self._recientes = deque(maxlen=EVENTOS_RECIENTES)
+        self._suscriptores = []
+        with self.almacen.bloqueo():
+            self.datos = self.almacen.cargar()
+        self.versiones = dict.fromkeys(PARTES, self.version)
+
+    @property
+    def version(self):
+        return self.datos["secuencia"]
+
+    def vista(self, nombre):
+        """Vista derivada por nombre (ver VISTAS), construida la primera vez"""
+        with self._lock:
+            if nombre not in self._vistas:
+                self._vistas[nombre] = VISTAS[nombre](self.datos)
+            return self._vistas[nombre]
+
+    def suscribir(self, funcion):
+        """Llama a ``funcion()`` después de cada transacción que escribió algo (fuera de los bloqueos)"""
+        self._suscriptores.append(funcion)
+
+    def cambios_desde(self, version):
+        """Eventos posteriores a ``version``, o None si este proceso ya no los tiene todos"""
+        with self._lock:
+            if version == self.version:
+                return []
+            if not self._recientes or not self._recientes[0]["seq"] <= version + 1 <= self.version:
+                return None
+            return [evento for evento in self._recientes if evento["seq"] > version]
+
+    def _actualizar_vistas(self, evento):
+        self._recientes.append(evento)
+        for parte in PARTES_EVENTO[evento["tipo"]]:
+            self.versiones[parte] = evento["seq"]
+        if evento["tipo"] == "reinicio":
+            self._vistas.clear()
+            return
+        for vista in self._vistas.values():
+            vista.aplicar(evento)
+
+    def _medir_tamano(self):
+        if metricas.ACTIVAS:
+            etiquetas = {"torneo": self.torneo} if self.torneo is not None else {}
+            metricas.fijar("apuestas", len(self.datos["bets"]), **etiquetas)
+            metricas.fijar("movimientos", len(self.datos["ledger"]), **etiquetas)
+            metricas.fijar("jugadores", len(self.datos["players"]), **etiquetas)
+            metricas.fijar("secuencia", self.version, **etiquetas)
+            metricas.fijar("foto_bytes", self.almacen.bytes_foto(), **etiquetas)
+
+    @metricas.medido("estado.sincronizar")
+    def sincronizar(self):
+        """Incorpora los eventos escritos por otros procesos"""
+        with self._lock:
+            cambios = self.almacen.cambios_desde(self.version)
+            if cambios is None:
+                # Un dict nuevo que reemplaza al anterior de una vez: las
+                # sesiones leen ``datos`` sin bloqueo y nunca lo ven a medio
+                # llenar (las vistas viejas siguen sobre el anterior)
+                self.datos = self.almacen.cargar()
+                self._vistas = {}
+                self._recientes.clear()
+                self.versiones = dict.fromkeys(PARTES, self.version)
+            else:
+                for evento in cambios:
+                    aplicar_evento(self.datos, evento)
+                    self._actualizar_vistas(evento)
+            self._medir_tamano()
+
+    @contextmanager
+    def transaccion(self):
+        """Acceso exclusivo a los datos ya sincronizados (reentrante)"""
+        with self._lock:
+            if self._en_transaccion:
+                yield self.datos
+                return
+            with self.almacen.bloqueo():
+                self._en_transaccion = True
+                try:
+                    self.sincronizar()
+                    version = self.version
+                    yield self.datos
+                    escribio = self.version != version
+                finally:
+                    self._en_transaccion = False
+        if escribio:
+            for funcion in self._suscriptores:
+                funcion()
+
+    def registrar(self, evento):
+        with self.transaccion():
+            registrar_evento(self.datos, evento, self.almacen)
+            self._actualizar_vistas(evento)
+            self._medir_tamano()
+
+    def apostar(self, apuesta, dinero_visto):
+        """Descuenta la apuesta solo si el saldo sigue siendo el que vio el jugador.
+
+        Devuelve False si el saldo cambió entretanto o no alcanza, o si el
+        partido ya no está pendiente (nada volvería a liquidar la apuesta).
+        """
+        with self.transaccion() as datos:
+            dinero = datos["players"][apuesta["jugador"]]["dinero"]
+            pendiente = self.vista("calendario").partido(apuesta["partido"]) is not None
+            if not pendiente or dinero != dinero_visto or apuesta["monto"] > dinero:
+                metricas.contar("apuestas_rechazadas")
+                return False
+            self.registrar({"tipo": "apuesta", "apuesta": apuesta})
+            metricas.contar("apuestas_registradas")
+            return True
+
+    def registrar_resultados(self, partidos, apuestas=()):
+        """Registra un lote de resultados y liquida sus apuestas en un solo evento.
+
+        La liquidación se calcula dentro de la transacción para no perder
+        apuestas hechas mientras tanto, con las pendientes que da el pozo de
+        cada partido. ``apuestas`` son apuestas históricas
+        que entran en el mismo evento, antes de los partidos.
+
+        Los partidos que ya no están pendientes en el calendario (otra sesión
+        registró su resultado entretanto) se saltan. Devuelve los partidos
+        registrados; si no queda ninguno (ni apuestas) no se registra nada.
+        """
+        with self.transaccion() as datos:
+            calendario = self.vista("calendario")
+            claves = set()
+            registrados = []
+            for partido in partidos:
+                clave = id_partido(partido["local"], partido["visitante"])
+                if calendario.partido(clave) is not None and clave not in claves:
+                    claves.add(clave)
+                    registrados.append(partido)
+            if not registrados and not apuestas:
+                metricas.contar("resultados_rechazados", len(partidos))
+                return []
+            evento = {"tipo": "resultado", "partidos": registrados}
+            if apuestas:
+                evento["apuestas"] = list(apuestas)
+            liquidaciones = liquidar_partidos(datos, registrados, self.vista("pozos"), apuestas)
+            self.registrar({**evento, "liquidaciones": liquidaciones})
+        metricas.contar("resultados_registrados", len(registrados))
+        metricas.contar("resultados_rechazados", len(partidos) - len(registrados))
+        metricas.contar("apuestas_importadas", len(apuestas))
+        metricas.contar("apuestas_liquidadas", len(liquidaciones))
+        return registrados
+
+    def importar(self, filas):
+        """Importación masiva: valida las filas y registra todo en un solo evento.
+
+        La validación va dentro de la transacción, contra el calendario y los
+        saldos de ese momento. Devuelve (partidos, apuestas, errores); si hay
+        errores no se registra nada.
+        """
+        with self.transaccion() as datos:
+            partidos, apuestas, errores = validar(filas, datos, self.vista("calendario"))
+            if not errores and (partidos or apuestas):
+                self.registrar_resultados(partidos, apuestas)
+        return partidos, apuestas, errores
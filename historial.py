@@ -0,0 +1,157 @@
+"""Historial de saldos de los jugadores, consultable en cualquier punto.
+
+Se arma una vez a partir del ledger y luego se mantiene evento a evento,
+como las demás vistas. Por jugador guarda la serie de saldos después de cada
+movimiento (sumas acumuladas, con la secuencia del evento), así que el saldo
+de un jugador en una secuencia es una búsqueda binaria. Para los saldos de
+todos a la vez hay además una foto de todos los saldos cada
+``CHECKPOINT_CADA`` movimientos: se parte de la última foto anterior y se
+aplican a lo sumo esa cantidad de movimientos, sin repetir todo el torneo.
+
+Una jornada es cada evento de resultados que liquidó apuestas (los que no
+liquidan nada no cambian ningún saldo).
+"""
+from array import array
+from bisect import bisect_right
+
+import numpy as np
+
+from almacenamiento import jugador_nuevo
+from compacto import CONCEPTOS
+
+# Movimientos del ledger entre dos fotos de todos los saldos
+CHECKPOINT_CADA = 1000
+
+class HistorialSaldos:
+    """Series de saldos por jugador, fotos periódicas y jornadas"""
+
+    def __init__(self, datos):
+        self.datos = datos
+        ledger = datos["ledger"]
+        seqs, codigos, conceptos, montos = ledger.arreglos()
+
+        self.jugadores = list(datos["players"])
+        self._ids = {jugador: i for i, jugador in enumerate(self.jugadores)}
+        # Ids del catálogo del ledger -> ids de aquí (un jugador solo del ledger se agrega)
+        traduccion = np.array([self._ids.get(nombre, -1) for nombre in ledger.jugadores.nombres], dtype=np.int32)
+        for codigo in np.flatnonzero(traduccion < 0):
+            traduccion[codigo] = self._ids[ledger.jugadores[codigo]] = len(self.jugadores)
+            self.jugadores.append(ledger.jugadores[codigo])
+        ids = traduccion[codigos] if len(codigos) else codigos
+        cantidad = len(self.jugadores)
+
+        # Saldo inicial = saldo actual menos todo lo que movió el ledger
+        actuales = np.array([datos["players"].get(jugador, jugador_nuevo())["dinero"] for jugador in self.jugadores],
+                            dtype=np.int64)
+        movido = np.bincount(ids, weights=montos, minlength=cantidad).astype(np.int64)
+        iniciales = actuales - movido
+        self._iniciales = iniciales.tolist()
+        self._saldos = actuales.tolist()
+
+        # Movimientos en orden (la secuencia nunca decrece)
+        self._seq = array('q', seqs.tobytes())
+        self._jugador = array('i', ids.astype(np.int32).tobytes())
+        self._monto = array('q', montos.tobytes())
+
+        # Por jugador: secuencias y saldo después de cada movimiento, con los
+        # movimientos agrupados por jugador (en orden) y sumas acumuladas
+        orden = np.argsort(ids, kind="stable")
+        limites = np.searchsorted(ids[orden], np.arange(cantidad + 1))
+        acumulado = np.cumsum(montos[orden])
+        self._serie_seq = []
+        self._serie_saldo = []
+        for jugador in range(cantidad):
+            inicio, fin = limites[jugador], limites[jugador + 1]
+            antes = acumulado[inicio - 1] if inicio else 0
+            self._serie_seq.append(array('q', seqs[orden[inicio:fin]].tobytes()))
+            self._serie_saldo.append(array('q', (acumulado[inicio:fin] - antes + iniciales[jugador]).tobytes()))
+
+        # Fotos de todos los saldos cada CHECKPOINT_CADA movimientos
+        self._checkpoints = [list(self._iniciales)]
+        saldos = iniciales.copy()
+        for inicio in range(0, len(ids) - len(ids) % CHECKPOINT_CADA, CHECKPOINT_CADA):
+            saldos += np.bincount(ids[inicio:inicio + CHECKPOINT_CADA], weights=montos[inicio:inicio + CHECKPOINT_CADA],
+                                  minlength=cantidad).astype(np.int64)
+            self._checkpoints.append(saldos.tolist())
+
+        # Jornadas: secuencias distintas de las liquidaciones
+        liquidaciones = seqs[conceptos == CONCEPTOS.index("liquidacion")]
+        cambia = np.ones(len(liquidaciones), dtype=bool)
+        cambia[1:] = liquidaciones[1:] != liquidaciones[:-1]
+        self.jornadas = liquidaciones[cambia].tolist()
+
+    @classmethod
+    def desde_datos(cls, datos):
+        return cls(datos)
+
+    def _id(self, jugador):
+        codigo = self._ids.get(jugador)
+        if codigo is None:
+            # Jugador dado de alta después: arranca con el saldo de un jugador nuevo
+            codigo = self._ids[jugador] = len(self.jugadores)
+            self.jugadores.append(jugador)
+            self._iniciales.append(jugador_nuevo()["dinero"])
+            self._saldos.append(self._iniciales[-1])
+            for checkpoint in self._checkpoints:
+                checkpoint.append(self._iniciales[-1])
+            self._serie_seq.append(array('q'))
+            self._serie_saldo.append(array('q'))
+        return codigo
+
+    def _agregar(self, seq, jugador, concepto, monto):
+        codigo = self._id(jugador)
+        self._saldos[codigo] += monto
+        self._seq.append(seq)
+        self._jugador.append(codigo)
+        self._monto.append(monto)
+        self._serie_seq[codigo].append(seq)
+        self._serie_saldo[codigo].append(self._saldos[codigo])
+        if concepto == "liquidacion" and (not self.jornadas or self.jornadas[-1] != seq):
+            self.jornadas.append(seq)
+        if len(self._seq) % CHECKPOINT_CADA == 0:
+            self._checkpoints.append(list(self._saldos))
+
+    def aplicar(self, evento):
+        # El ledger solo crece: lo nuevo es lo que está después del último movimiento visto
+        for movimiento in self.datos["ledger"][len(self._seq):]:
+            self._agregar(movimiento["seq"], movimiento["jugador"], movimiento["concepto"], movimiento["monto"])
+
+    def saldo(self, jugador, seq=None):
+        """Saldo del jugador después del evento ``seq`` (el actual si es None)"""
+        codigo = self._ids[jugador]
+        if seq is None:
+            return self._saldos[codigo]
+        posicion = bisect_right(self._serie_seq[codigo], seq)
+        return self._serie_saldo[codigo][posicion - 1] if posicion else self._iniciales[codigo]
+
+    def saldos(self, seq=None):
+        """Saldos de todos los jugadores después del evento ``seq``"""
+        if seq is None:
+            return dict(zip(self.jugadores, self._saldos))
+        fin = bisect_right(self._seq, seq)
+        checkpoint = fin // CHECKPOINT_CADA
+        saldos = list(self._checkpoints[checkpoint])
+        for posicion in range(checkpoint * CHECKPOINT_CADA, fin):
+            saldos[self._jugador[posicion]] += self._monto[posicion]
+        return dict(zip(self.jugadores, saldos))
+
+    def seq_jornada(self, numero):
+        """Secuencia del final de la jornada ``numero`` (desde 1; 0 es el inicio)"""
+        return self.jornadas[numero - 1] if numero else 0
+
+    def saldos_tras_jornada(self, numero):
+        return self.saldos(self.seq_jornada(numero))
+
+    def mayores_cambios(self, desde=0, hasta=None, k=5):
+        """Los k jugadores cuyo saldo más cambió entre dos secuencias: (jugador, cambio)"""
+        antes = self.saldos(desde)
+        despues = self.saldos(hasta)
+        cambios = [(jugador, despues[jugador] - antes[jugador]) for jugador in self.jugadores]
+        cambios.sort(key=lambda par: abs(par[1]), reverse=True)
+        return cambios[:k]
+
+    def por_jornada(self, jugador, numeros=None):
+        """Saldo del jugador después de esas jornadas (por defecto, al inicio y después de cada una)"""
+        if numeros is None:
+            numeros = range(len(self.jornadas) + 1)
+        return [self.saldo(jugador, self.seq_jornada(numero)) for numero in numeros]
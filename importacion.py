@@ -0,0 +1,147 @@
+"""Importación masiva de resultados (y apuestas históricas) desde CSV o JSON.
+
+Formatos aceptados:
+
+- CSV con encabezado. Las filas de resultados llevan ``local``,
+  ``visitante``, ``goles_local``, ``goles_visitante`` y opcionalmente
+  ``fecha``; las de apuestas ``jugador``, ``local``, ``visitante``,
+  ``prediccion`` y ``monto``. Se pueden mezclar en un mismo archivo: una
+  fila con ``prediccion`` es una apuesta (o lo indica una columna ``tipo``).
+- JSON: una lista de esas mismas filas, o un objeto
+  ``{"resultados": [...], "apuestas": [...]}``.
+
+Todo se valida contra el calendario antes de tocar nada: si una fila está
+mal no se importa ninguna. Lo válido se registra en un solo evento, que
+agrega las apuestas, los partidos y la liquidación en una sola escritura.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+
+from compacto import CODIGOS_PREDICCION
+from torneo import id_partido
+
+# Columnas obligatorias de cada tipo de fila
+COLUMNAS_FILA_RESULTADO = ["local", "visitante", "goles_local", "goles_visitante"]
+COLUMNAS_FILA_APUESTA = ["jugador", "local", "visitante", "prediccion", "monto"]
+
+def leer_filas(archivo, nombre):
+    """Filas (dicts) de un archivo binario CSV o JSON; ValueError si no se puede leer"""
+    try:
+        if nombre.lower().endswith(".json"):
+            contenido = json.load(archivo)
+            if isinstance(contenido, dict):
+                return ([{"tipo": "resultado", **fila} for fila in contenido.get("resultados", [])]
+                        + [{"tipo": "apuesta", **fila} for fila in contenido.get("apuestas", [])])
+            if not isinstance(contenido, list):
+                raise ValueError("se esperaba una lista de filas")
+            return contenido
+        return list(csv.DictReader(io.TextIOWrapper(archivo, encoding="utf-8-sig", newline="")))
+    except (ValueError, TypeError, csv.Error) as error:
+        raise ValueError(f"No se pudo leer {nombre}: {error}") from error
+
+def _texto(fila, columna):
+    valor = fila.get(columna)
+    return "" if valor is None else str(valor).strip()
+
+def tipo_fila(fila):
+    """resultado o apuesta"""
+    tipo = _texto(fila, "tipo").lower()
+    if tipo:
+        return tipo
+    return "apuesta" if _texto(fila, "prediccion") else "resultado"
+
+def _entero(valor, minimo):
+    """Entero >= minimo a partir de un texto o número; None si no lo es"""
+    try:
+        numero = int(str(valor).strip())
+    except (TypeError, ValueError):
+        return None
+    return numero if numero >= minimo else None
+
+def validar(filas, datos, calendario):
+    """Partidos y apuestas listos para registrar, y los errores encontrados.
+
+    Los resultados tienen que ser de partidos pendientes del calendario (y
+    no repetirse); las apuestas, de jugadores existentes, sobre partidos que
+    estaban pendientes antes de importar y sin pasar el saldo de cada uno.
+    """
+    partidos = []
+    apuestas = []
+    errores = []
+    en_archivo = set()
+    saldos = {}
+    fecha = datetime.now().strftime("%Y-%m-%d %H:%M")
+
+    for numero, fila in enumerate(filas, start=1):
+        if not isinstance(fila, dict):
+            errores.append(f"Fila {numero}: no es un objeto con columnas")
+            continue
+        tipo = tipo_fila(fila)
+        if tipo not in ("resultado", "apuesta"):
+            errores.append(f"Fila {numero}: tipo desconocido {tipo!r}")
+            continue
+        columnas = COLUMNAS_FILA_RESULTADO if tipo == "resultado" else COLUMNAS_FILA_APUESTA
+        faltan = [columna for columna in columnas if _texto(fila, columna) == ""]
+        if faltan:
+            errores.append(f"Fila {numero}: faltan {', '.join(faltan)}")
+            continue
+
+        local = _texto(fila, "local")
+        visitante = _texto(fila, "visitante")
+        clave = id_partido(local, visitante)
+        partido = calendario.partido(clave)
+        if partido is None:
+            motivo = "ya tiene resultado" if clave in calendario.jugados else "no está en el calendario"
+            errores.append(f"Fila {numero}: {clave} {motivo}")
+            continue
+
+        if tipo == "resultado":
+            goles_local = _entero(fila["goles_local"], 0)
+            goles_visitante = _entero(fila["goles_visitante"], 0)
+            if goles_local is None or goles_visitante is None:
+                errores.append(f"Fila {numero}: los goles tienen que ser enteros no negativos")
+            elif clave in en_archivo:
+                errores.append(f"Fila {numero}: {clave} está repetido en el archivo")
+            else:
+                en_archivo.add(clave)
+                partidos.append({
+                    "fase": partido.get("fase", "groups"),
+                    "grupo": partido.get("grupo"),
+                    "local": local,
+                    "visitante": visitante,
+                    "goles_local": goles_local,
+                    "goles_visitante": goles_visitante,
+                    "fecha": _texto(fila, "fecha") or fecha
+                })
+            continue
+
+        jugador = _texto(fila, "jugador")
+        prediccion = _texto(fila, "prediccion")
+        monto = _entero(fila["monto"], 1)
+        if jugador not in datos["players"]:
+            errores.append(f"Fila {numero}: el jugador {jugador} no existe")
+        elif prediccion not in CODIGOS_PREDICCION:
+            errores.append(f"Fila {numero}: predicción {prediccion!r} (Local, Empate o Visitante)")
+        elif monto is None:
+            errores.append(f"Fila {numero}: el monto tiene que ser un entero positivo")
+        else:
+            saldo = saldos.get(jugador, datos["players"][jugador]["dinero"])
+            if monto > saldo:
+                errores.append(f"Fila {numero}: a {jugador} no le alcanza el saldo (${saldo}) para ${monto}")
+                continue
+            saldos[jugador] = saldo - monto
+            apuestas.append({
+                "jugador": jugador,
+                "partido": clave,
+                "local": local,
+                "visitante": visitante,
+                "prediccion": prediccion,
+                "monto": monto,
+                "fase": partido.get("fase", "groups"),
+                "procesada": False,
+                "resultado": "PENDIENTE"
+            })
+
+    return partidos, apuestas, errores
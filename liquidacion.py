@@ -0,0 +1,56 @@
+import numpy as np
+
+import metricas
+from compacto import CODIGOS_PREDICCION
+from torneo import id_partido
+
+# La apuesta ganadora cobra el doble de lo apostado
+MULTIPLICADOR_PREMIO = 2
+
+def resultado_real(partido):
+    """Local, Empate o Visitante según los goles del partido"""
+    if partido['goles_local'] > partido['goles_visitante']:
+        return "Local"
+    elif partido['goles_visitante'] > partido['goles_local']:
+        return "Visitante"
+    return "Empate"
+
+@metricas.medido("liquidar_partidos")
+def liquidar_partidos(datos, partidos, almacen, nuevas=()):
+    """Liquidación de todas las apuestas pendientes de un lote de resultados.
+
+    Las apuestas pendientes de todos los partidos se obtienen de una vez (de
+    ``almacen.apuestas_pendientes``: el almacén o la vista de pozos) y los
+    premios se calculan en bloque con NumPy. Solo se calcula: el evento
+    "resultado" que lleva estas liquidaciones es el que paga, y como salta las
+    apuestas ya procesadas, repetir una liquidación nunca paga dos veces.
+
+    ``nuevas`` son apuestas que el mismo evento agrega antes de los partidos
+    (importación masiva): todavía no están en datos y se liquidan en la misma
+    pasada con los índices que van a tener.
+    """
+    resultados = {id_partido(p['local'], p['visitante']): CODIGOS_PREDICCION[resultado_real(p)]
+                  for p in partidos}
+    pendientes = almacen.apuestas_pendientes(datos, resultados) if resultados else []
+    primera = len(datos["bets"])
+    pendientes += [(primera + i, apuesta) for i, apuesta in enumerate(nuevas) if apuesta["partido"] in resultados]
+    if not pendientes:
+        return []
+
+    indices = np.fromiter((indice for indice, _ in pendientes), dtype=np.int64, count=len(pendientes))
+    montos = np.fromiter((a["monto"] for _, a in pendientes), dtype=np.int64, count=len(pendientes))
+    predicciones = np.fromiter((CODIGOS_PREDICCION[a["prediccion"]] for _, a in pendientes),
+                               dtype=np.int8, count=len(pendientes))
+    reales = np.fromiter((resultados[a["partido"]] for _, a in pendientes), dtype=np.int8, count=len(pendientes))
+
+    aciertos = predicciones == reales
+    ganancias = np.where(aciertos, montos * MULTIPLICADOR_PREMIO, 0)
+
+    return [
+        {"apuesta": int(indice), "resultado": "GANADA" if acierto else "PERDIDA", "ganancias": int(ganancia)}
+        for indice, acierto, ganancia in zip(indices, aciertos, ganancias)
+    ]
+
+def procesar_apuestas_partido(datos, partido, almacen):
+    """Liquidación de las apuestas pendientes de un solo partido"""
+    return liquidar_partidos(datos, [partido], almacen)
@@ -0,0 +1,145 @@
+"""Métricas de rendimiento: tiempos de las rutas calientes, contadores y tamaños.
+
+Se activan con la variable de entorno FIFA_METRICAS=1. Desactivadas,
+``medido`` devuelve la función original sin envolver y el resto son
+llamadas que no hacen nada, así que pueden quedar puestas en producción.
+Las métricas son del proceso y se pueden exportar en el formato de texto
+de Prometheus (el que lee el textfile collector de node_exporter).
+"""
+import os
+import threading
+import time
+from functools import wraps
+
+ACTIVAS = os.environ.get("FIFA_METRICAS", "") not in ("", "0")
+
+# Segundos mínimos entre dos escrituras del archivo de Prometheus
+EXPORTAR_CADA = 15
+
+PREFIJO = "fifa_"
+
+_lock = threading.Lock()
+# nombre -> [llamadas, segundos en total, máximo]
+_tiempos = {}
+_contadores = {}
+_valores = {}
+_ultima_exportacion = 0.0
+
+def anotar(nombre, segundos):
+    """Suma una duración medida por fuera de ``medido`` (la rerun completa, por ejemplo)"""
+    if not ACTIVAS:
+        return
+    with _lock:
+        tiempo = _tiempos.get(nombre)
+        if tiempo is None:
+            _tiempos[nombre] = [1, segundos, segundos]
+        else:
+            tiempo[0] += 1
+            tiempo[1] += segundos
+            tiempo[2] = max(tiempo[2], segundos)
+
+def medido(nombre):
+    """Decorador que acumula el tiempo de cada llamada bajo ``nombre``.
+
+    Se decide al decorar: si las métricas están desactivadas la función
+    queda tal cual, sin ningún costo por llamada.
+    """
+    def decorar(funcion):
+        if not ACTIVAS:
+            return funcion
+
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                anotar(nombre, time.perf_counter() - inicio)
+        return envoltura
+    return decorar
+
+def contar(nombre, cantidad=1):
+    """Suma al contador ``nombre`` (solo crece)"""
+    if ACTIVAS:
+        with _lock:
+            _contadores[nombre] = _contadores.get(nombre, 0) + cantidad
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def con_etiquetas(nombre, etiquetas):
+    """Nombre de una serie con etiquetas de Prometheus: ``apuestas{torneo="principal"}``"""
+    if not etiquetas:
+        return nombre
+    pares = ",".join(f'{clave}="{_escapar(valor)}"' for clave, valor in sorted(etiquetas.items()))
+    return f"{nombre}{{{pares}}}"
+
+def fijar(nombre, valor, **etiquetas):
+    """Valor actual de una medida que sube y baja (tamaños, por ejemplo).
+
+    Con etiquetas (``torneo="principal"``) cada combinación es su propia
+    serie, así que varios torneos del mismo proceso no se pisan.
+    """
+    if ACTIVAS:
+        nombre = con_etiquetas(nombre, etiquetas)
+        with _lock:
+            _valores[nombre] = valor
+
+def quitar(**etiquetas):
+    """Borra las medidas con exactamente esas etiquetas (de algo que ya no está en memoria)"""
+    if ACTIVAS:
+        sufijo = con_etiquetas("", etiquetas)
+        with _lock:
+            for nombre in [nombre for nombre in _valores if nombre.endswith(sufijo)]:
+                del _valores[nombre]
+
+def resumen():
+    """Copia de las métricas: filas de tiempos, contadores y valores"""
+    with _lock:
+        tiempos = [
+            {"Paso": nombre, "Llamadas": llamadas, "Total ms": total * 1000,
+             "Media ms": total * 1000 / llamadas, "Máx ms": maximo * 1000}
+            for nombre, (llamadas, total, maximo) in sorted(_tiempos.items())
+        ]
+        return {"tiempos": tiempos, "contadores": dict(_contadores), "valores": dict(_valores)}
+
+def a_prometheus():
+    """Métricas en el formato de texto de Prometheus"""
+    datos = resumen()
+    lineas = []
+    if datos["tiempos"]:
+        lineas += [f"# HELP {PREFIJO}duracion_segundos Tiempo en las rutas calientes",
+                   f"# TYPE {PREFIJO}duracion_segundos summary"]
+        for fila in datos["tiempos"]:
+            etiqueta = f'{{paso="{fila["Paso"]}"}}'
+            lineas.append(f"{PREFIJO}duracion_segundos_sum{etiqueta} {fila['Total ms'] / 1000:.6f}")
+            lineas.append(f"{PREFIJO}duracion_segundos_count{etiqueta} {fila['Llamadas']}")
+        lineas += [f"# HELP {PREFIJO}duracion_maxima_segundos Llamada más lenta de cada paso",
+                   f"# TYPE {PREFIJO}duracion_maxima_segundos gauge"]
+        for fila in datos["tiempos"]:
+            lineas.append(f'{PREFIJO}duracion_maxima_segundos{{paso="{fila["Paso"]}"}} {fila["Máx ms"] / 1000:.6f}')
+    for nombre, valor in sorted(datos["contadores"].items()):
+        lineas += [f"# TYPE {PREFIJO}{nombre}_total counter", f"{PREFIJO}{nombre}_total {valor}"]
+    declarados = set()
+    for nombre, valor in sorted(datos["valores"].items()):
+        base = nombre.split("{", 1)[0]
+        if base not in declarados:
+            declarados.add(base)
+            lineas.append(f"# TYPE {PREFIJO}{base} gauge")
+        lineas.append(f"{PREFIJO}{nombre} {valor}")
+    return "\n".join(lineas) + "\n"
+
+def exportar(ruta):
+    """Escribe el archivo de Prometheus (temporal y renombrado: nunca queda a medias)"""
+    global _ultima_exportacion
+    os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        f.write(a_prometheus())
+    os.replace(temporal, ruta)
+    _ultima_exportacion = time.monotonic()
+
+def exportar_si_toca(ruta):
+    """Exporta como mucho una vez cada EXPORTAR_CADA segundos"""
+    if ACTIVAS and time.monotonic() - _ultima_exportacion >= EXPORTAR_CADA:
+        exportar(ruta)
@@ -0,0 +1,222 @@
+"""Simulación Monte Carlo de lo que falta de la fase de grupos.
+
+Cada equipo tiene una fuerza de ataque y otra de defensa ajustadas con los
+resultados registrados (modelo de Poisson: los goles del local siguen una
+Poisson de media ``media_local * ataque[local] * defensa[visitante]`` y los
+del visitante lo mismo con ``media_visitante``). Los partidos pendientes se
+simulan muchas veces a la vez con NumPy y de ahí salen las probabilidades de
+clasificar de cada equipo y las cuotas justas de cada partido.
+"""
+import numpy as np
+
+import metricas
+from compacto import PREDICCIONES
+from torneo import Calendario, TablaPosiciones, id_partido
+
+SIMULACIONES = 100_000
+
+# Simulaciones por lote, como mucho: los arreglos de cada lote caben en caché
+LOTE = 2_500
+
+# Memoria de un lote: cada celda (simulación x partido, o simulación x
+# equipo) ocupa unos BYTES_POR_CELDA entre goles, marcadores, aportes e
+# índices, así que con muchos partidos el lote se achica para no pasarse
+MEMORIA_LOTE = 64 << 20
+BYTES_POR_CELDA = 64
+
+# Partidos "promedio" que se suman a cada equipo al ajustar: con pocos
+# resultados las fuerzas quedan cerca de la media de la liga
+PARTIDOS_PREVIOS = 2
+
+# Goles por equipo y partido cuando aún no hay resultados
+GOLES_POR_PARTIDO = 1.35
+
+ITERACIONES_AJUSTE = 25
+
+# Goles por lado que cuenta la simulación (los marcadores se indexan con 32 x 32)
+MAX_GOLES = 31
+
+def ajustar_fuerzas(partidos, equipos):
+    """Ataque y defensa de cada equipo (en el orden de ``equipos``) y medias de goles.
+
+    Ajuste iterativo de máxima verosimilitud del modelo de Poisson, con
+    PARTIDOS_PREVIOS partidos de media de la liga sumados a cada equipo.
+    """
+    posicion = {equipo: i for i, equipo in enumerate(equipos)}
+    jugados = [p for p in partidos if p["local"] in posicion and p["visitante"] in posicion]
+    n = len(equipos)
+
+    locales = np.array([posicion[p["local"]] for p in jugados], dtype=np.int64)
+    visitantes = np.array([posicion[p["visitante"]] for p in jugados], dtype=np.int64)
+    goles_local = np.array([p["goles_local"] for p in jugados], dtype=np.float64)
+    goles_visitante = np.array([p["goles_visitante"] for p in jugados], dtype=np.float64)
+
+    previos = PARTIDOS_PREVIOS * GOLES_POR_PARTIDO
+    media_local = (goles_local.sum() + previos) / (len(jugados) + PARTIDOS_PREVIOS)
+    media_visitante = (goles_visitante.sum() + previos) / (len(jugados) + PARTIDOS_PREVIOS)
+    media = (media_local + media_visitante) / 2
+
+    a_favor = (np.bincount(locales, goles_local, n) + np.bincount(visitantes, goles_visitante, n)
+               + PARTIDOS_PREVIOS * media)
+    en_contra = (np.bincount(locales, goles_visitante, n) + np.bincount(visitantes, goles_local, n)
+                 + PARTIDOS_PREVIOS * media)
+
+    ataque = np.ones(n)
+    defensa = np.ones(n)
+    for _ in range(ITERACIONES_AJUSTE):
+        # Goles esperados con ataque 1 contra las defensas que enfrentó cada equipo
+        esperados = (np.bincount(locales, media_local * defensa[visitantes], n)
+                     + np.bincount(visitantes, media_visitante * defensa[locales], n)
+                     + PARTIDOS_PREVIOS * media)
+        ataque = a_favor / esperados
+        esperados = (np.bincount(locales, media_visitante * ataque[visitantes], n)
+                     + np.bincount(visitantes, media_local * ataque[locales], n)
+                     + PARTIDOS_PREVIOS * media)
+        defensa = en_contra / esperados
+
+    return ataque, defensa, media_local, media_visitante
+
+# Pesos del puntaje con que se ordena cada grupo en la simulación: un número
+# por equipo que ordena como la tabla (PTS, DG, GF y orden del grupo). Es
+# exacto en float64 mientras DG esté entre -2048 y 2047 y GF sea menor que 4096
+PESO_GOLES = 1024
+PESO_DIFERENCIA = 4096 * PESO_GOLES
+PESO_PUNTOS = 4096 * PESO_DIFERENCIA
+
+def _puntaje(puntos, diferencia, goles, desempate):
+    return puntos * PESO_PUNTOS + (diferencia + 2048) * PESO_DIFERENCIA + goles * PESO_GOLES + desempate
+
+def _aportes():
+    """Lo que suma al puntaje del local y del visitante cada marcador.
+
+    Indexadas por ``goles_local * 32 + goles_visitante`` (MAX_GOLES < 32).
+    """
+    goles_local, goles_visitante = np.divmod(np.arange(32 * 32), 32)
+    diferencia = goles_local - goles_visitante
+    local = (np.where(diferencia > 0, 3, diferencia == 0) * float(PESO_PUNTOS)
+             + diferencia * float(PESO_DIFERENCIA) + goles_local * float(PESO_GOLES))
+    visitante = (np.where(diferencia < 0, 3, diferencia == 0) * float(PESO_PUNTOS)
+                 - diferencia * float(PESO_DIFERENCIA) + goles_visitante * float(PESO_GOLES))
+    # Código del resultado de cada marcador (el de su predicción en PREDICCIONES)
+    resultado = np.where(diferencia > 0, 0, np.where(diferencia == 0, 1, 2)).astype(np.int8)
+    return local, visitante, resultado
+
+APORTE_LOCAL, APORTE_VISITANTE, RESULTADO_MARCADOR = _aportes()
+
+def cuota(probabilidad):
+    """Cuota decimal justa (sin margen); None si el resultado no salió nunca"""
+    return round(1 / probabilidad, 2) if probabilidad > 0 else None
+
+def fuerzas_torneo(tabla, jugados):
+    """Fuerzas ajustadas de todos los equipos de la tabla, por nombre de equipo"""
+    equipos = [equipo for grupo in tabla.grupos() for equipo in tabla.filas[grupo]]
+    ataque, defensa, media_local, media_visitante = ajustar_fuerzas(jugados, equipos)
+    return {"ataque": dict(zip(equipos, ataque.tolist())), "defensa": dict(zip(equipos, defensa.tolist())),
+            "media_local": media_local, "media_visitante": media_visitante}
+
+@metricas.medido("simular")
+def simular(tabla, pendientes, jugados, simulaciones=SIMULACIONES, semilla=None):
+    """Simula los partidos pendientes de la fase de grupos.
+
+    ``tabla`` es la TablaPosiciones actual, ``pendientes`` los partidos sin
+    resultado y ``jugados`` los resultados registrados (para ajustar las
+    fuerzas). Devuelve las probabilidades de ser primero y de clasificar
+    (dos primeros) de cada equipo, por grupo, y por id de partido
+    pendiente las probabilidades y cuotas justas Local/Empate/Visitante.
+    """
+    return simular_grupos(tabla.filas, pendientes, fuerzas_torneo(tabla, jugados), simulaciones, semilla)
+
+def simular_grupos(filas_grupos, pendientes, fuerzas, simulaciones=SIMULACIONES, semilla=None):
+    """Núcleo de ``simular`` sobre datos simples, para repartirlo entre procesos.
+
+    ``filas_grupos`` son las filas de la tabla por grupo y equipo (como
+    ``TablaPosiciones.filas``) y ``fuerzas`` las de ``fuerzas_torneo``. Los
+    grupos no se cruzan en la fase de grupos, así que simular un subconjunto
+    da las mismas probabilidades que simularlos todos juntos.
+    """
+    azar = np.random.default_rng(semilla)
+    grupos = list(filas_grupos)
+    equipos = [equipo for grupo in grupos for equipo in filas_grupos[grupo]]
+    posicion = {equipo: i for i, equipo in enumerate(equipos)}
+    ataque = np.array([fuerzas["ataque"][equipo] for equipo in equipos])
+    defensa = np.array([fuerzas["defensa"][equipo] for equipo in equipos])
+    media_local = fuerzas["media_local"]
+    media_visitante = fuerzas["media_visitante"]
+
+    pendientes = [p for p in pendientes if p["local"] in posicion and p["visitante"] in posicion]
+    locales = np.array([posicion[p["local"]] for p in pendientes], dtype=np.int64)
+    visitantes = np.array([posicion[p["visitante"]] for p in pendientes], dtype=np.int64)
+    # Media de goles de cada lado: los locales de todos los partidos y después los visitantes
+    medias = np.concatenate([media_local * ataque[locales] * defensa[visitantes],
+                             media_visitante * ataque[visitantes] * defensa[locales]])
+
+    # Los equipos de cada grupo son contiguos en ``equipos``
+    limites = np.cumsum([0] + [len(filas_grupos[grupo]) for grupo in grupos])
+    filas = [filas_grupos[grupo][equipo] for grupo in grupos for equipo in filas_grupos[grupo]]
+    # A igualdad de todo, el orden del grupo (como TablaPosiciones)
+    desempate = np.concatenate([np.arange(fin - inicio, 0, -1) for inicio, fin in zip(limites, limites[1:])])
+    puntaje_base = _puntaje(np.array([f["PTS"] for f in filas], dtype=np.float64),
+                             np.array([f["DG"] for f in filas], dtype=np.float64),
+                             np.array([f["GF"] for f in filas], dtype=np.float64), desempate)
+    tamanos = set(np.diff(limites).tolist())
+
+    n = len(equipos)
+    primeros = np.zeros(n, dtype=np.int64)
+    clasificados = np.zeros(n, dtype=np.int64)
+    resultados = np.zeros((3, len(pendientes)), dtype=np.int64)
+
+    por_lote = max(1, min(LOTE, MEMORIA_LOTE // (BYTES_POR_CELDA * max(1, len(pendientes), n))))
+    hechas = 0
+    while hechas < simulaciones:
+        lote = min(por_lote, simulaciones - hechas)
+        hechas += lote
+        goles_lote = np.minimum(azar.poisson(medias, size=(lote, 2 * len(pendientes))), MAX_GOLES)
+        marcador = goles_lote[:, :len(pendientes)] * 32 + goles_lote[:, len(pendientes):]
+        resultado = RESULTADO_MARCADOR[marcador]
+        for codigo in range(3):
+            resultados[codigo] += (resultado == codigo).sum(axis=0)
+
+        # El puntaje es lineal en puntos, diferencia y goles: lo que suma cada
+        # lado de cada partido se acumula por (simulación, equipo) con un
+        # solo bincount por lado
+        fila = np.arange(lote)[:, None] * n
+        puntaje = puntaje_base + (
+            np.bincount((fila + locales).ravel(), APORTE_LOCAL[marcador].ravel(), lote * n)
+            + np.bincount((fila + visitantes).ravel(), APORTE_VISITANTE[marcador].ravel(), lote * n)
+        ).reshape(lote, n)
+
+        if len(tamanos) == 1:
+            # Grupos del mismo tamaño: todos se ordenan de una vez
+            tamano = next(iter(tamanos))
+            orden = np.argsort(-puntaje.reshape(lote, len(grupos), tamano), axis=2)
+            orden += limites[:-1][None, :, None]
+            primeros += np.bincount(orden[:, :, 0].ravel(), minlength=n)
+            clasificados += np.bincount(orden[:, :, :2].ravel(), minlength=n)
+        else:
+            for inicio, fin in zip(limites, limites[1:]):
+                orden = np.argsort(-puntaje[:, inicio:fin], axis=1) + inicio
+                primeros += np.bincount(orden[:, 0], minlength=n)
+                clasificados += np.bincount(orden[:, :2].ravel(), minlength=n)
+
+    clasificacion = {
+        grupo: [
+            {"Equipo": equipos[i], "Primero": float(primeros[i] / simulaciones),
+             "Clasifica": float(clasificados[i] / simulaciones)}
+            for i in range(inicio, fin)
+        ]
+        for grupo, inicio, fin in zip(grupos, limites, limites[1:])
+    }
+    probabilidades = (resultados / simulaciones).tolist()
+    partidos = {
+        id_partido(p["local"], p["visitante"]): {
+            "probabilidades": {resultado: probabilidades[codigo][i] for codigo, resultado in enumerate(PREDICCIONES)},
+            "cuotas": {resultado: cuota(probabilidades[codigo][i]) for codigo, resultado in enumerate(PREDICCIONES)}
+        }
+        for i, p in enumerate(pendientes)
+    }
+    return {"clasificacion": clasificacion, "partidos": partidos}
+
+def simular_torneo(datos, simulaciones=SIMULACIONES, semilla=None):
+    """Versión de una sola llamada sobre los datos del torneo"""
+    return simular(TablaPosiciones.desde_datos(datos), list(Calendario.desde_datos(datos).pendientes()),
+                   datos["matches"], simulaciones, semilla)
@@ -0,0 +1,264 @@
+"""Diario, compactación y vistas incrementales contra un estado armado de cero.
+
+Se reproducen secuencias aleatorias de eventos en cada almacén, con una
+compactación y un diario retenido muy chicos para que se ejerzan a cada rato,
+y un segundo proceso que se pone al día a intervalos. Al final (y por el
+camino) lo que carga un almacén nuevo tiene que ser el estado en memoria, y
+cada vista mantenida evento a evento la misma que se arma desde los datos.
+"""
+import json
+import random
+
+import pytest
+
+import almacenamiento
+from almacenamiento import ALMACENES
+from compacto import ESTADOS_APUESTA, PREDICCIONES
+from estado import VISTAS, EstadoTorneo
+from torneo import id_partido
+
+EVENTOS = 150
+
+@pytest.fixture(autouse=True)
+def diario_corto(monkeypatch):
+    monkeypatch.setattr(almacenamiento, "COMPACTAR_CADA", 7)
+    monkeypatch.setattr(almacenamiento, "DIARIO_RETENIDO", 3)
+
+def foto(datos):
+    """Los datos como valores comparables (las tablas compactas como dicts)"""
+    return {clave: valor.a_dicts() if clave in ("bets", "ledger") else valor for clave, valor in datos.items()}
+
+def resumen(nombre, vista, datos):
+    """Lo que responde una vista a todas sus consultas"""
+    if nombre == "tabla":
+        return {grupo: vista.tabla(grupo) for grupo in vista.grupos()}
+    if nombre == "calendario":
+        return list(vista.pendientes()), vista.jugados
+    if nombre == "apuestas":
+        return {(jugador, estado): (vista.total(jugador, estado), vista.pagina(jugador, 0, len(datos["bets"]) + 1, estado))
+                for jugador in datos["players"] for estado in [None] + ESTADOS_APUESTA}
+    if nombre == "clasificacion":
+        return vista.primeros(), {jugador: vista.posicion(jugador) for jugador in datos["players"]}
+    if nombre == "pozos":
+        partidos = {apuesta["partido"] for apuesta in datos["bets"]}
+        return {partido: ([(vista.cantidad(partido, p), vista.monto(partido, p)) for p in PREDICCIONES],
+                          {jugador: vista.del_jugador(partido, jugador) for jugador in datos["players"]})
+                for partido in partidos}, vista.apuestas_pendientes(datos, sorted(partidos))
+    if nombre == "historial":
+        return (vista.jornadas, vista.saldos(),
+                [vista.saldos(seq) for seq in range(datos["secuencia"] + 1)],
+                {jugador: vista.por_jornada(jugador) for jugador in datos["players"]})
+    raise AssertionError(nombre)
+
+def comprobar_vistas(estado):
+    for nombre, crear in VISTAS.items():
+        assert resumen(nombre, estado.vista(nombre), estado.datos) == resumen(nombre, crear(estado.datos), estado.datos), nombre
+
+def comprobar_consultas(estado):
+    """Las consultas del almacén (índices de SQLite, columnas en los demás) dan lo mismo que las vistas"""
+    datos = estado.datos
+    partidos = sorted({apuesta["partido"] for apuesta in datos["bets"]})
+    assert estado.almacen.apuestas_pendientes(datos, partidos) == estado.vista("pozos").apuestas_pendientes(datos, partidos)
+    for partido in partidos:
+        assert estado.almacen.contar_apuestas(datos, partido) == estado.vista("pozos").cantidad(partido)
+    for jugador in datos["players"]:
+        assert estado.almacen.apuestas_de_jugador(datos, jugador) == estado.vista("apuestas").pagina(
+            jugador, 0, len(datos["bets"]) + 1)[::-1]
+
+def partido_resultado(rng, partido):
+    return {
+        "fase": partido["fase"],
+        "grupo": partido["grupo"],
+        "local": partido["local"],
+        "visitante": partido["visitante"],
+        "goles_local": rng.randint(0, 3),
+        "goles_visitante": rng.randint(0, 3),
+        "fecha": "2026-06-01 20:00"
+    }
+
+def evento_aleatorio(rng, estado):
+    """Hace una acción al azar como la haría la app"""
+    pendientes = list(estado.vista("calendario").pendientes())
+    jugadores = list(estado.datos["players"])
+    tirada = rng.random()
+    if not pendientes or tirada < 0.02:
+        estado.registrar({"tipo": "reinicio"})
+    elif tirada < 0.06:
+        estado.registrar({"tipo": "fase", "fase": rng.choice(["groups", "semifinals"])})
+    elif tirada < 0.2:
+        estado.registrar_resultados([partido_resultado(rng, p) for p in rng.sample(pendientes, min(3, len(pendientes)))])
+    elif tirada < 0.3:
+        partido = rng.choice(pendientes)
+        filas = [{"tipo": "apuesta", "jugador": rng.choice(jugadores), "local": partido["local"],
+                  "visitante": partido["visitante"], "prediccion": rng.choice(PREDICCIONES), "monto": rng.randint(1, 50)}
+                 for _ in range(rng.randint(0, 3))]
+        filas.append({"tipo": "resultado", **partido_resultado(rng, partido)})
+        estado.importar(filas)
+    else:
+        jugador = rng.choice(jugadores)
+        dinero = estado.datos["players"][jugador]["dinero"]
+        partido = rng.choice(pendientes)
+        estado.apostar({
+            "jugador": jugador,
+            "partido": id_partido(partido["local"], partido["visitante"]),
+            "local": partido["local"],
+            "visitante": partido["visitante"],
+            "prediccion": rng.choice(PREDICCIONES),
+            "monto": rng.randint(1, max(1, dinero)),
+            "fase": partido["fase"],
+            "procesada": False,
+            "resultado": "PENDIENTE"
+        }, dinero)
+
+@pytest.mark.parametrize("semilla", [1, 2, 3])
+@pytest.mark.parametrize("tipo", sorted(ALMACENES))
+def test_diario_y_vistas(tmp_path, tipo, semilla):
+    rng = random.Random(semilla)
+    directorio = str(tmp_path)
+    escritor = EstadoTorneo(ALMACENES[tipo](directorio))
+    lector = EstadoTorneo(ALMACENES[tipo](directorio))
+    for estado in (escritor, lector):
+        for nombre in VISTAS:
+            estado.vista(nombre)
+
+    for numero in range(EVENTOS):
+        evento_aleatorio(rng, escritor)
+        # El lector se pone al día a veces seguido y a veces tras más eventos
+        # de los que retiene el diario (entonces recarga todo)
+        if rng.random() < 0.2:
+            lector.sincronizar()
+            assert foto(lector.datos) == foto(escritor.datos)
+            for nombre in VISTAS:
+                lector.vista(nombre)
+        if numero % 25 == 0:
+            comprobar_vistas(escritor)
+
+    assert foto(ALMACENES[tipo](directorio).cargar()) == foto(escritor.datos)
+    lector.sincronizar()
+    assert foto(lector.datos) == foto(escritor.datos)
+    comprobar_vistas(escritor)
+    comprobar_vistas(lector)
+    comprobar_consultas(escritor)
+
+def apuesta_de(estado, jugador, monto):
+    partido = next(estado.vista("calendario").pendientes())
+    return {
+        "jugador": jugador,
+        "partido": id_partido(partido["local"], partido["visitante"]),
+        "local": partido["local"],
+        "visitante": partido["visitante"],
+        "prediccion": "Local",
+        "monto": monto,
+        "fase": partido["fase"],
+        "procesada": False,
+        "resultado": "PENDIENTE"
+    }
+
+@pytest.mark.parametrize("tipo", ["json", "columnar"])
+def test_linea_cortada_por_una_caida(tmp_path, tipo):
+    directorio = str(tmp_path)
+    primero = EstadoTorneo(ALMACENES[tipo](directorio))
+    lector = EstadoTorneo(ALMACENES[tipo](directorio))
+    assert primero.apostar(apuesta_de(primero, "Tomás", 10), 1000)
+    # El proceso se cae a mitad de la línea del evento siguiente
+    with open(primero.almacen.ruta_diario, 'ab') as f:
+        f.write(b'{"tipo": "apuesta", "apuesta": {"jugador": "Ani')
+
+    # Otro proceso arranca (quita la línea cortada) y apuesta; el primero, sin
+    # recargar, apuesta también sobre un diario que termina limpio
+    otro = EstadoTorneo(ALMACENES[tipo](directorio))
+    assert otro.apostar(apuesta_de(otro, "Lezcano", 20), 1000)
+    assert primero.apostar(apuesta_de(primero, "Bawe", 30), 1000)
+
+    cargados = ALMACENES[tipo](directorio).cargar()
+    assert cargados["secuencia"] == 3
+    assert [apuesta["jugador"] for apuesta in cargados["bets"]] == ["Tomás", "Lezcano", "Bawe"]
+    lector.sincronizar()
+    assert foto(lector.datos) == foto(cargados)
+
+@pytest.mark.parametrize("tipo", ["json", "columnar"])
+def test_linea_cortada_en_el_medio_no_se_salta(tmp_path, tipo):
+    directorio = str(tmp_path)
+    escritor = EstadoTorneo(ALMACENES[tipo](directorio))
+    assert escritor.apostar(apuesta_de(escritor, "Tomás", 10), 1000)
+    with open(escritor.almacen.ruta_diario, 'ab') as f:
+        f.write(b'{"tipo": "apu\n')
+    # Ni ponerse al día ni cargar siguen como si el diario terminara ahí
+    with pytest.raises(ValueError):
+        escritor.apostar(apuesta_de(escritor, "Lezcano", 20), 1000)
+    with pytest.raises(ValueError):
+        ALMACENES[tipo](directorio).cargar()
+
+@pytest.mark.parametrize("tipo", sorted(ALMACENES))
+def test_jugador_agregado_despues_de_la_foto(tmp_path, tipo):
+    directorio = str(tmp_path)
+    escritor = EstadoTorneo(ALMACENES[tipo](directorio))
+    escritor.almacen.guardar(escritor.datos)
+    # Se suma un jugador a la liga y apuesta antes de la próxima compactación
+    with open(tmp_path / almacenamiento.NOMBRE_CONFIGURACION, 'w', encoding='utf-8') as f:
+        json.dump({"jugadores": almacenamiento.JUGADORES_PREDETERMINADOS + ["Caro"]}, f)
+    nuevo = EstadoTorneo(ALMACENES[tipo](directorio))
+    assert nuevo.apostar(apuesta_de(nuevo, "Caro", 100), 1000)
+
+    cargados = ALMACENES[tipo](directorio).cargar()
+    assert cargados["players"]["Caro"]["dinero"] == 900
+    assert foto(cargados) == foto(nuevo.datos)
+
+@pytest.mark.parametrize("tipo", ["json", "columnar"])
+def test_hueco_en_el_diario(tmp_path, tipo):
+    directorio = str(tmp_path)
+    escritor = EstadoTorneo(ALMACENES[tipo](directorio))
+    for jugador in ("Tomás", "Lezcano", "Bawe"):
+        assert escritor.apostar(apuesta_de(escritor, jugador, 10), 1000)
+    # Se pierde el evento del medio
+    with open(escritor.almacen.ruta_diario, 'rb') as f:
+        lineas = f.readlines()
+    with open(escritor.almacen.ruta_diario, 'wb') as f:
+        f.writelines([lineas[0], lineas[2]])
+    with pytest.raises(ValueError):
+        ALMACENES[tipo](directorio).cargar()
+
+def test_sqlite_no_pierde_el_descuento_de_un_jugador_sin_fila(tmp_path):
+    estado = EstadoTorneo(ALMACENES["sqlite"](str(tmp_path)))
+    with estado.almacen._conn:
+        estado.almacen._conn.execute("DELETE FROM jugadores WHERE nombre = 'Tomás'")
+    with pytest.raises(ValueError):
+        estado.apostar(apuesta_de(estado, "Tomás", 10), 1000)
+    # La transacción se deshizo entera (ni la apuesta ni el evento quedaron)
+    # y la memoria, que se toca después de persistir, tampoco cambió
+    cargados = ALMACENES["sqlite"](str(tmp_path)).cargar()
+    assert len(cargados["bets"]) == 0 and cargados["secuencia"] == 0
+    assert len(estado.datos["bets"]) == 0 and estado.datos["players"]["Tomás"]["dinero"] == 1000
+
+@pytest.mark.parametrize("tipo", sorted(ALMACENES))
+def test_falla_al_persistir(tmp_path, tipo, monkeypatch):
+    estado = EstadoTorneo(ALMACENES[tipo](str(tmp_path)))
+    for nombre in VISTAS:
+        estado.vista(nombre)
+    antes = foto(estado.datos)
+
+    def sin_disco(data, evento):
+        raise OSError("disco lleno")
+    monkeypatch.setattr(estado.almacen, "registrar", sin_disco)
+    with pytest.raises(OSError):
+        estado.apostar(apuesta_de(estado, "Tomás", 10), 1000)
+    assert foto(estado.datos) == antes
+    monkeypatch.undo()
+    # Sigue funcionando, y memoria y disco coinciden
+    assert estado.apostar(apuesta_de(estado, "Tomás", 10), 1000)
+    assert foto(ALMACENES[tipo](str(tmp_path)).cargar()) == foto(estado.datos)
+    comprobar_vistas(estado)
+
+def test_recarga_completa_no_vacia_el_dict_de_las_sesiones(tmp_path, monkeypatch):
+    directorio = str(tmp_path)
+    escritor = EstadoTorneo(ALMACENES["json"](directorio))
+    lector = EstadoTorneo(ALMACENES["json"](directorio))
+    leido = lector.datos
+    for jugador in almacenamiento.JUGADORES_PREDETERMINADOS:
+        assert escritor.apostar(apuesta_de(escritor, jugador, 10), 1000)
+    # Compactar dejando solo los dos últimos eventos obliga al lector a recargar
+    monkeypatch.setattr(almacenamiento, "DIARIO_RETENIDO", 2)
+    escritor.almacen.guardar(escritor.datos)
+    lector.sincronizar()
+    assert lector.datos is not leido and lector.datos["secuencia"] == 10
+    assert leido["secuencia"] == 0 and set(leido["players"]) == set(lector.datos["players"])
@@ -0,0 +1,52 @@
+"""Instantánea de espectadores: una por versión, al día y también en disco."""
+import json
+import os
+
+from almacenamiento import ALMACENES, NOMBRE_ESPECTADOR_HTML, NOMBRE_ESPECTADOR_JSON
+from espectador import TOP_RANKING, Espectador
+from estado import EstadoTorneo
+
+def abrir(directorio):
+    estado = EstadoTorneo(ALMACENES["json"](str(directorio)))
+    return estado, Espectador(estado)
+
+def resultado(partido, goles_local, goles_visitante):
+    return {"fase": partido["fase"], "grupo": partido["grupo"], "local": partido["local"],
+            "visitante": partido["visitante"], "goles_local": goles_local,
+            "goles_visitante": goles_visitante, "fecha": "2026-01-01 00:00"}
+
+def test_una_instantanea_por_version(tmp_path):
+    estado, espectador = abrir(tmp_path)
+    instantanea, fragmento = espectador.actual()
+    # Sin cambios es el mismo objeto, no se vuelve a armar
+    assert espectador.actual()[0] is instantanea and espectador.actual()[1] is fragmento
+    assert instantanea["version"] == 0 and len(instantanea["ranking"]) == len(estado.datos["players"])
+    assert len(instantanea["ranking"]) <= TOP_RANKING
+
+def test_se_regenera_al_escribir(tmp_path):
+    estado, espectador = abrir(tmp_path)
+    espectador.actual()
+    partido = estado.vista("calendario").proximos(1)[0]
+    estado.registrar_resultados([resultado(partido, 2, 0)])
+    # La suscripción ya la regeneró: el archivo está al día sin que nadie la pida
+    with open(os.path.join(tmp_path, NOMBRE_ESPECTADOR_JSON), encoding='utf-8') as f:
+        en_disco = json.load(f)
+    assert en_disco["version"] == estado.version == 1
+    local = next(fila for fila in en_disco["grupos"][partido["grupo"]] if fila["Equipo"] == partido["local"])
+    assert local["PTS"] == 3
+    assert all(p["local"] != partido["local"] or p["visitante"] != partido["visitante"]
+               for p in en_disco["proximos"])
+    instantanea, fragmento = espectador.actual()
+    assert instantanea["version"] == 1
+    with open(os.path.join(tmp_path, NOMBRE_ESPECTADOR_HTML), encoding='utf-8') as f:
+        assert fragmento in f.read()
+
+def test_recoge_cambios_de_otro_proceso(tmp_path):
+    _, espectador = abrir(tmp_path)
+    assert espectador.actual()[0]["version"] == 0
+    otro, _ = abrir(tmp_path)
+    partido = otro.vista("calendario").proximos(1)[0]
+    otro.registrar_resultados([resultado(partido, 0, 0)])
+    # El espectador se pone al día con la versión nueva cuando el estado se sincroniza
+    espectador.estado.sincronizar()
+    assert espectador.actual()[0]["version"] == 1
@@ -0,0 +1,84 @@
+"""Importación masiva: lectura de CSV/JSON y validación antes de registrar."""
+import io
+import json
+
+import pytest
+
+from almacenamiento import ALMACENES
+from estado import EstadoTorneo
+from importacion import leer_filas
+from torneo import id_partido
+
+@pytest.fixture
+def estado(tmp_path):
+    return EstadoTorneo(ALMACENES["json"](str(tmp_path)))
+
+def pendientes(estado, n):
+    return estado.vista("calendario").proximos(n)
+
+def resultado(partido, goles_local=1, goles_visitante=0):
+    return {"local": partido["local"], "visitante": partido["visitante"],
+            "goles_local": goles_local, "goles_visitante": goles_visitante}
+
+def apuesta(partido, jugador="Tomás", prediccion="Local", monto=100):
+    return {"jugador": jugador, "local": partido["local"], "visitante": partido["visitante"],
+            "prediccion": prediccion, "monto": monto}
+
+def test_leer_csv_mezclado():
+    archivo = io.BytesIO("\ufefflocal,visitante,goles_local,goles_visitante,jugador,prediccion,monto\n"
+                         "A,B,2,1,,,\nA,B,,,Ana,Local,50\n".encode("utf-8"))
+    filas = leer_filas(archivo, "resultados.csv")
+    assert [fila["local"] for fila in filas] == ["A", "A"] and filas[1]["jugador"] == "Ana"
+
+def test_leer_json_por_secciones():
+    archivo = io.BytesIO(json.dumps({"resultados": [{"local": "A"}], "apuestas": [{"local": "B"}]}).encode())
+    assert leer_filas(archivo, "datos.JSON") == [{"tipo": "resultado", "local": "A"}, {"tipo": "apuesta", "local": "B"}]
+
+@pytest.mark.parametrize("contenido", [b'{"resultados": ', b'"texto"', b'{"resultados": [1]}'])
+def test_leer_json_invalido(contenido):
+    with pytest.raises(ValueError, match="No se pudo leer"):
+        leer_filas(io.BytesIO(contenido), "datos.json")
+
+def test_importar_registra_todo_en_un_evento(estado):
+    primero, segundo = pendientes(estado, 2)
+    partidos, apuestas, errores = estado.importar([apuesta(primero), resultado(primero), resultado(segundo, 0, 0)])
+    assert errores == [] and len(partidos) == 2 and len(apuestas) == 1
+    assert estado.datos["secuencia"] == 1
+    # La apuesta histórica se liquidó con el resultado del mismo archivo
+    assert estado.datos["players"]["Tomás"]["dinero"] == 1000 - 100 + 200
+    assert estado.vista("calendario").partido(apuestas[0]["partido"]) is None
+
+@pytest.mark.parametrize("fila, error", [
+    ("no es un dict", "no es un objeto"),
+    ({"tipo": "gol"}, "tipo desconocido"),
+    ({"local": "X"}, "faltan visitante, goles_local, goles_visitante"),
+    ({"local": "Nadie", "visitante": "Tampoco", "goles_local": 1, "goles_visitante": 1}, "no está en el calendario"),
+])
+def test_filas_mal_formadas(estado, fila, error):
+    _, _, errores = estado.importar([fila])
+    assert len(errores) == 1 and error in errores[0]
+    assert estado.datos["secuencia"] == 0
+
+def test_una_fila_mala_no_importa_ninguna(estado):
+    primero, segundo = pendientes(estado, 2)
+    filas = [resultado(primero), resultado(segundo, -1, 0), resultado(primero),
+             apuesta(segundo, jugador="Nadie"), apuesta(segundo, prediccion="Gana"), apuesta(segundo, monto="0")]
+    _, _, errores = estado.importar(filas)
+    assert [error.split(":")[0] for error in errores] == [f"Fila {numero}" for numero in range(2, 7)]
+    assert "enteros no negativos" in errores[0] and "repetido" in errores[1]
+    assert "no existe" in errores[2] and "predicción" in errores[3] and "entero positivo" in errores[4]
+    assert estado.datos["secuencia"] == 0 and len(estado.datos["bets"]) == 0
+    assert estado.vista("calendario").partido(id_partido(primero["local"], primero["visitante"])) is not None
+
+def test_saldo_acumulado_en_el_archivo(estado):
+    primero, segundo = pendientes(estado, 2)
+    _, _, errores = estado.importar([apuesta(primero, monto=600), apuesta(segundo, monto=400),
+                                     apuesta(segundo, monto=1)])
+    assert errores == ["Fila 3: a Tomás no le alcanza el saldo ($0) para $1"]
+    assert estado.datos["players"]["Tomás"]["dinero"] == 1000
+
+def test_resultado_ya_registrado(estado):
+    primero = pendientes(estado, 1)[0]
+    assert estado.importar([resultado(primero)])[2] == []
+    _, _, errores = estado.importar([resultado(primero), apuesta(primero)])
+    assert len(errores) == 2 and all("ya tiene resultado" in error for error in errores)
@@ -0,0 +1,58 @@
+"""Simulación de la fase de grupos: probabilidades coherentes y lotes acotados."""
+import pytest
+
+import simulacion
+from almacenamiento import datos_iniciales
+from simulacion import cuota, simular_torneo
+from torneo import Calendario, id_partido
+
+SIMULACIONES = 4_000
+
+def jugar(datos, cuantos=None, goles=lambda i, partido: (i % 3, 1)):
+    """Registra los primeros ``cuantos`` partidos pendientes (todos si es None) con marcadores fijos"""
+    for i, partido in enumerate(list(Calendario.desde_datos(datos).pendientes())[:cuantos]):
+        goles_local, goles_visitante = goles(i, partido)
+        datos["matches"].append({"fase": "groups", "grupo": partido["grupo"], "local": partido["local"],
+                                 "visitante": partido["visitante"], "goles_local": goles_local,
+                                 "goles_visitante": goles_visitante, "fecha": "2026-01-01 00:00"})
+    return datos
+
+def comprobar_probabilidades(resultado, datos):
+    for grupo, filas in resultado["clasificacion"].items():
+        assert [fila["Equipo"] for fila in filas] == datos["groups"][grupo]
+        assert sum(fila["Primero"] for fila in filas) == pytest.approx(1)
+        assert sum(fila["Clasifica"] for fila in filas) == pytest.approx(min(2, len(filas)))
+        assert all(0 <= fila["Primero"] <= fila["Clasifica"] <= 1 for fila in filas)
+    for partido in resultado["partidos"].values():
+        assert sum(partido["probabilidades"].values()) == pytest.approx(1)
+        for prediccion, probabilidad in partido["probabilidades"].items():
+            assert partido["cuotas"][prediccion] == cuota(probabilidad)
+
+def test_probabilidades_coherentes():
+    datos = jugar(datos_iniciales(), 5)
+    resultado = simular_torneo(datos, SIMULACIONES, semilla=1)
+    comprobar_probabilidades(resultado, datos)
+    pendientes = {id_partido(p["local"], p["visitante"]) for p in Calendario.desde_datos(datos).pendientes()}
+    assert set(resultado["partidos"]) == pendientes
+    assert simular_torneo(datos, SIMULACIONES, semilla=1) == resultado
+
+def test_grupos_de_distinto_tamano():
+    datos = datos_iniciales({"A": ["Uno", "Dos", "Tres"], "B": ["Cuatro", "Cinco", "Seis", "Siete", "Ocho"]})
+    comprobar_probabilidades(simular_torneo(jugar(datos, 4), SIMULACIONES, semilla=2), datos)
+
+def test_grupo_terminado_ya_esta_decidido():
+    equipos = ["Uno", "Dos", "Tres"]
+    datos = datos_iniciales({"A": equipos})
+    # Cada equipo le gana a los que están después en la lista, de local y de visitante
+    jugar(datos, goles=lambda i, p: (1, 0) if equipos.index(p["local"]) < equipos.index(p["visitante"]) else (0, 1))
+    resultado = simular_torneo(datos, SIMULACIONES, semilla=3)
+    assert resultado["partidos"] == {}
+    assert [(fila["Primero"], fila["Clasifica"]) for fila in resultado["clasificacion"]["A"]] == [(1, 1), (0, 1), (0, 0)]
+
+def test_lotes_chicos_dan_lo_mismo(monkeypatch):
+    datos = jugar(datos_iniciales(), 3)
+    completo = simular_torneo(datos, SIMULACIONES, semilla=4)
+    # Con poca memoria por lote se hacen muchos lotes de pocas simulaciones,
+    # que sacan los mismos goles del generador en el mismo orden
+    monkeypatch.setattr(simulacion, "MEMORIA_LOTE", 64 * 1024)
+    assert simular_torneo(datos, SIMULACIONES, semilla=4) == completo
@@ -0,0 +1,114 @@
+"""Varios torneos en un proceso: league.json, descarte del menos usado, métricas y espectadores."""
+import json
+import os
+
+import pytest
+
+import almacenamiento
+import metricas
+from almacenamiento import NOMBRE_CONFIGURACION, NOMBRE_ESPECTADOR_HTML, leer_configuracion
+from torneos import Torneos
+
+@pytest.fixture(autouse=True)
+def datos_en_tmp(tmp_path, monkeypatch):
+    monkeypatch.setattr(almacenamiento, "DIRECTORIO_DATOS", str(tmp_path))
+
+def crear_torneo(torneo, contenido):
+    """Directorio del torneo con su league.json (un dict se escribe como JSON)"""
+    directorio = almacenamiento.directorio_torneo(torneo)
+    os.makedirs(directorio, exist_ok=True)
+    with open(os.path.join(directorio, NOMBRE_CONFIGURACION), 'w', encoding='utf-8') as f:
+        f.write(contenido if isinstance(contenido, str) else json.dumps(contenido))
+    return directorio
+
+@pytest.fixture
+def con_metricas(monkeypatch):
+    monkeypatch.setattr(metricas, "ACTIVAS", True)
+    monkeypatch.setattr(metricas, "_valores", {})
+    monkeypatch.setattr(metricas, "_contadores", {})
+
+def abrir(torneos, torneo):
+    """Como cada rerun de la app: el torneo (cargado si hace falta) al día"""
+    activo = torneos.obtener(torneo)
+    activo.estado.sincronizar()
+    return activo
+
+def test_descarta_el_menos_usado(con_metricas):
+    for torneo in ("a", "b", "c"):
+        crear_torneo(torneo, {"nombre": f"Liga {torneo}"})
+    torneos = Torneos(maximo=2)
+    a = abrir(torneos, "a")
+    abrir(torneos, "b")
+    # Pedir "a" otra vez la vuelve la más reciente: al cargar "c" sale "b"
+    assert abrir(torneos, "a") is a
+    abrir(torneos, "c")
+    assert torneos.cargados() == ["a", "c"] and "b" not in torneos
+    assert metricas.resumen()["contadores"] == {"torneos_cargados": 3, "torneos_descartados": 1}
+    # Las medidas de "b" se fueron con él; las de los demás siguen
+    valores = metricas.resumen()["valores"]
+    assert not [nombre for nombre in valores if 'torneo="b"' in nombre]
+    assert valores['apuestas{torneo="a"}'] == 0 and valores['apuestas{torneo="c"}'] == 0
+    assert valores["torneos_en_memoria"] == 2
+    # Vuelve a cargarse si alguien lo pide, como uno nuevo
+    assert torneos.obtener("b") is not None and torneos.cargados() == ["c", "b"]
+
+def test_torneo_inexistente():
+    torneos = Torneos()
+    for torneo in ("nadie", "../afuera"):
+        with pytest.raises(KeyError):
+            torneos.obtener(torneo)
+    assert torneos.cargados() == []
+
+def test_quitar_solo_borra_esas_etiquetas(con_metricas):
+    metricas.fijar("apuestas", 1, torneo="a")
+    metricas.fijar("apuestas", 2, torneo="ab")
+    metricas.fijar("apuestas", 3)
+    metricas.quitar(torneo="a")
+    assert metricas.resumen()["valores"] == {'apuestas{torneo="ab"}': 2, "apuestas": 3}
+
+def test_configuracion_valida():
+    directorio = crear_torneo("oficina", {"nombre": "Liga Oficina", "admin": "Ana", "jugadores": ["Ana", "Beto"],
+                                          "grupos": {"Grupo A": ["Uno", "Dos"]}})
+    configuracion = leer_configuracion(directorio)
+    assert configuracion["nombre"] == "Liga Oficina" and configuracion["jugadores"] == ["Ana", "Beto"]
+    assert configuracion["errores"] == []
+
+@pytest.mark.parametrize("contenido", ['{"nombre": "Liga', '[1, 2]', ''])
+def test_configuracion_ilegible_usa_los_predeterminados(contenido):
+    configuracion = leer_configuracion(crear_torneo("rota", contenido))
+    assert configuracion["nombre"] == "Liga FIFA"
+    assert configuracion["jugadores"] == almacenamiento.JUGADORES_PREDETERMINADOS
+    assert len(configuracion["errores"]) == 1
+
+def test_claves_invalidas_se_ignoran_de_a_una():
+    directorio = crear_torneo("mixta", {"nombre": "Liga Mixta", "jugadores": "Ana", "grupos": {"A": []},
+                                        "admin": None, "color": "rojo"})
+    configuracion = leer_configuracion(directorio)
+    assert configuracion["nombre"] == "Liga Mixta"
+    assert configuracion["jugadores"] == almacenamiento.JUGADORES_PREDETERMINADOS
+    assert configuracion["grupos"] == almacenamiento.GRUPOS_PREDETERMINADOS
+    assert configuracion["admin"] == almacenamiento.ADMIN_PREDETERMINADO
+    assert len(configuracion["errores"]) == 4
+
+def test_torneo_con_configuracion_invalida_se_abre():
+    crear_torneo("rota", '{"nombre": ')
+    torneos = Torneos()
+    activo = torneos.obtener("rota")
+    assert set(activo.estado.datos["players"]) == set(almacenamiento.JUGADORES_PREDETERMINADOS)
+    assert activo.configuracion["errores"]
+
+def test_configuracion_del_torneo_cargado_no_se_relee():
+    directorio = crear_torneo("oficina", {"nombre": "Liga Oficina"})
+    torneos = Torneos()
+    assert torneos.configuracion("oficina")["nombre"] == "Liga Oficina"
+    activo = torneos.obtener("oficina")
+    os.remove(os.path.join(directorio, NOMBRE_CONFIGURACION))
+    assert torneos.configuracion("oficina") is activo.configuracion
+
+def test_titulo_del_espectador():
+    directorio = crear_torneo("oficina", {"nombre": "Liga <Oficina>"})
+    espectador = Torneos().obtener("oficina").espectador
+    instantanea, _ = espectador.actual()
+    assert instantanea["nombre"] == "Liga <Oficina>"
+    with open(os.path.join(directorio, NOMBRE_ESPECTADOR_HTML), encoding='utf-8') as f:
+        assert "<title>Liga &lt;Oficina&gt;</title>" in f.read()
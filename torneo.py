@@ -0,0 +1,172 @@
+from bisect import bisect_left, insort
+from functools import lru_cache
+from itertools import islice
+
+# Columnas de la tabla de posiciones
+COLUMNAS_TABLA = ["PJ", "G", "E", "P", "GF", "GC", "DG", "PTS"]
+
+def id_partido(local, visitante):
+    """Identificador estable de un partido (el mismo que usan las apuestas)"""
+    return f"{local} vs {visitante}"
+
+def fila_vacia():
+    return dict.fromkeys(COLUMNAS_TABLA, 0)
+
+class TablaPosiciones:
+    """Tablas de posiciones de todos los grupos, actualizadas partido a partido.
+
+    Cada grupo guarda los acumulados por equipo y una lista ordenada de claves
+    (PTS, DG, GF descendentes; a igualdad, el orden del grupo), así que leer
+    la tabla o los primeros N no exige volver a ordenar.
+    """
+
+    def __init__(self, grupos):
+        self.filas = {}
+        self._posicion = {}
+        self._orden = {}
+        for grupo, equipos in grupos.items():
+            self.filas[grupo] = {equipo: fila_vacia() for equipo in equipos}
+            self._posicion[grupo] = {equipo: i for i, equipo in enumerate(equipos)}
+            self._orden[grupo] = [self._clave(grupo, equipo) for equipo in equipos]
+
+    @classmethod
+    def desde_datos(cls, datos):
+        tabla = cls(datos["groups"])
+        for partido in datos["matches"]:
+            tabla.agregar_partido(partido)
+        return tabla
+
+    def _clave(self, grupo, equipo):
+        fila = self.filas[grupo][equipo]
+        return (-fila["PTS"], -fila["DG"], -fila["GF"], self._posicion[grupo][equipo], equipo)
+
+    def agregar_partido(self, partido):
+        """Suma un partido de fase de grupos a la tabla de su grupo"""
+        grupo = partido.get("grupo")
+        if partido.get("fase") != "groups" or grupo not in self.filas:
+            return
+
+        filas = self.filas[grupo]
+        orden = self._orden[grupo]
+        local = partido["local"]
+        visitante = partido["visitante"]
+        gl = partido["goles_local"]
+        gv = partido["goles_visitante"]
+
+        # Sacar de la lista ordenada las claves viejas de ambos equipos
+        equipos = [equipo for equipo in (local, visitante) if equipo in filas]
+        for equipo in equipos:
+            del orden[bisect_left(orden, self._clave(grupo, equipo))]
+
+        for equipo, goles_favor, goles_contra in [(local, gl, gv), (visitante, gv, gl)]:
+            if equipo in filas:
+                fila = filas[equipo]
+                fila["PJ"] += 1
+                fila["GF"] += goles_favor
+                fila["GC"] += goles_contra
+                fila["DG"] = fila["GF"] - fila["GC"]
+                if goles_favor > goles_contra:
+                    fila["G"] += 1
+                    fila["PTS"] += 3
+                elif goles_favor < goles_contra:
+                    fila["P"] += 1
+                else:
+                    fila["E"] += 1
+                    fila["PTS"] += 1
+
+        for equipo in equipos:
+            insort(orden, self._clave(grupo, equipo))
+
+    def aplicar(self, evento):
+        if evento["tipo"] == "resultado":
+            for partido in evento["partidos"]:
+                self.agregar_partido(partido)
+
+    def grupos(self):
+        return list(self.filas)
+
+    def tabla(self, grupo):
+        """Filas del grupo ya ordenadas, con la columna Equipo primero"""
+        filas = self.filas[grupo]
+        return [{"Equipo": clave[-1], **filas[clave[-1]]} for clave in self._orden[grupo]]
+
+    def primeros(self, grupo, n):
+        return [clave[-1] for clave in self._orden[grupo][:n]]
+
+@lru_cache(maxsize=8)
+def _generar_calendario(grupos):
+    """Todos los cruces de ida y vuelta de cada grupo, en orden de calendario"""
+    partidos = []
+    for grupo, equipos in grupos:
+        for i, local in enumerate(equipos):
+            for j, visitante in enumerate(equipos):
+                if i != j:
+                    partidos.append({
+                        "local": local,
+                        "visitante": visitante,
+                        "fase": "groups",
+                        "grupo": grupo
+                    })
+    return tuple(partidos)
+
+class Calendario:
+    """Partidos de fase de grupos pendientes de resultado.
+
+    El calendario se genera una vez por configuración de grupos; los partidos
+    jugados se quitan de un dict ordenado por id, así que recorrer los
+    pendientes no depende de cuántos resultados haya registrados.
+    """
+
+    def __init__(self, grupos):
+        clave = tuple((grupo, tuple(equipos)) for grupo, equipos in grupos.items())
+        self._pendientes = {id_partido(p["local"], p["visitante"]): p for p in _generar_calendario(clave)}
+        self.jugados = set()
+
+    @classmethod
+    def desde_datos(cls, datos):
+        calendario = cls(datos["groups"])
+        for partido in datos["matches"]:
+            calendario.marcar_jugado(partido)
+        return calendario
+
+    def marcar_jugado(self, partido):
+        clave = id_partido(partido["local"], partido["visitante"])
+        self.jugados.add(clave)
+        self._pendientes.pop(clave, None)
+
+    def aplicar(self, evento):
+        if evento["tipo"] == "resultado":
+            for partido in evento["partidos"]:
+                if partido.get("fase") == "groups":
+                    self.marcar_jugado(partido)
+
+    def __len__(self):
+        return len(self._pendientes)
+
+    def partido(self, clave):
+        """Partido pendiente con ese id, o None si ya se jugó o no existe"""
+        return self._pendientes.get(clave)
+
+    def pendientes(self):
+        """Iterador perezoso sobre los partidos sin resultado"""
+        return iter(self._pendientes.values())
+
+    def proximos(self, n):
+        return list(islice(self.pendientes(), n))
+
+def clasificados_semifinales(tabla):
+    """Los dos primeros de cada grupo"""
+    clasificados = []
+    for grupo in tabla.grupos():
+        clasificados.extend(tabla.primeros(grupo, 2))
+    return clasificados
+
+# Versiones de una sola llamada, sin estado compartido (scripts y benchmarks)
+def calcular_tabla(datos, grupo):
+    return TablaPosiciones.desde_datos(datos).tabla(grupo)
+
+def obtener_partidos_para_apostar(datos):
+    return list(Calendario.desde_datos(datos).pendientes())
+
+def obtener_clasificados_semifinales(datos):
+    return clasificados_semifinales(TablaPosiciones.desde_datos(datos))
@@ -0,0 +1,82 @@
+"""Varios torneos en un mismo proceso.
+
+Cada torneo se identifica por su id (``?torneo=<id>`` en la URL) y tiene su
+propio directorio de datos (ver almacenamiento.directorio_torneo). Se cargan
+al pedirlos por primera vez y se guardan en memoria hasta ``MAX_TORNEOS``:
+al pasarse se descarta el que hace más tiempo que nadie pide, así que una
+liga sin actividad no ocupa memoria ni se carga al arrancar.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import metricas
+from almacenamiento import crear_almacen, directorio_torneo, existe_torneo, leer_configuracion
+from espectador import Espectador
+from estado import EstadoTorneo
+
+# Torneos cargados a la vez en el proceso
+MAX_TORNEOS = max(1, int(os.environ.get("FIFA_TORNEOS_ACTIVOS", "4")))
+
+class TorneoActivo:
+    """Estado compartido de un torneo cargado, con su instantánea para espectadores"""
+
+    def __init__(self, torneo):
+        self.id = torneo
+        self.estado = EstadoTorneo(crear_almacen(directorio_torneo(torneo)), torneo=torneo)
+        # Se crea ya para que regenere la instantánea después de cada escritura
+        self.espectador = Espectador(self.estado)
+
+    @property
+    def configuracion(self):
+        return self.estado.almacen.configuracion
+
+class Torneos:
+    """Torneos cargados, por id, con un máximo y descarte del menos usado (LRU)"""
+
+    def __init__(self, maximo=MAX_TORNEOS, crear=TorneoActivo):
+        self.maximo = maximo
+        self._crear = crear
+        self._lock = threading.Lock()
+        self._cargados = OrderedDict()
+
+    def obtener(self, torneo):
+        """Torneo cargado con ese id (lo carga si hace falta); KeyError si no existe"""
+        with self._lock:
+            activo = self._cargados.get(torneo)
+            if activo is not None:
+                self._cargados.move_to_end(torneo)
+                return activo
+        if not existe_torneo(torneo):
+            raise KeyError(torneo)
+        # La carga va fuera del bloqueo para no frenar a los demás torneos; si
+        # dos sesiones cargan el mismo a la vez, se queda el primero
+        nuevo = self._crear(torneo)
+        metricas.contar("torneos_cargados")
+        with self._lock:
+            activo = self._cargados.setdefault(torneo, nuevo)
+            self._cargados.move_to_end(torneo)
+            while len(self._cargados) > self.maximo:
+                descartado, _ = self._cargados.popitem(last=False)
+                metricas.quitar(torneo=descartado)
+                metricas.contar("torneos_descartados")
+            metricas.fijar("torneos_en_memoria", len(self._cargados))
+        return activo
+
+    def configuracion(self, torneo):
+        """Configuración del torneo: la del cargado, sin volver a leer league.json"""
+        with self._lock:
+            activo = self._cargados.get(torneo)
+        if activo is not None:
+            return activo.configuracion
+        # Todavía no está en memoria (la página lo carga enseguida)
+        return leer_configuracion(directorio_torneo(torneo))
+
+    def __contains__(self, torneo):
+        with self._lock:
+            return torneo in self._cargados
+
+    def cargados(self):
+        """Ids de los torneos en memoria, del menos al más usado"""
+        with self._lock:
+            return list(self._cargados)
@@ -0,0 +1,170 @@
+"""Cálculos pesados del torneo en otros procesos.
+
+Un ProcessPoolExecutor por proceso de la app, creado la primera vez que se
+usa. Las tareas devuelven futures: la interfaz dibuja lo que ya tiene y
+consulta (``done``) o espera el resultado al final de la rerun, así que el
+hilo de Streamlit no queda bloqueado mientras trabajan los demás núcleos.
+
+Con un solo trabajador (FIFA_TRABAJADORES=1, o en una máquina de un solo
+núcleo) las tareas corren en un hilo de este mismo proceso, para que la
+primera vista no espere a la simulación. Con FIFA_TRABAJADORES=0 se
+ejecutan en el momento y el future ya llega resuelto.
+"""
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from importlib.machinery import ModuleSpec
+
+import numpy as np
+
+import metricas
+from simulacion import SIMULACIONES, fuerzas_torneo, simular_grupos
+
+TRABAJADORES = int(os.environ.get("FIFA_TRABAJADORES", os.cpu_count() or 1))
+
+# Cómo se crean los trabajadores. No con fork: el servidor de Streamlit
+# tiene muchos hilos, y un hijo copiado mientras otro hilo tiene tomado un
+# bloqueo (el del estado, el de las métricas) se queda trabado al tomarlo.
+# Con forkserver los trabajadores salen de un proceso aparte sin hilos, que
+# ya tiene importada la simulación (PRECARGA)
+INICIO = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+PRECARGA = ["simulacion"]
+
+# Partes en que se reparte una tarea por trabajador: con más de una, un
+# trabajador que termina antes toma otra parte en vez de quedar esperando
+PARTES_POR_TRABAJADOR = 2
+
+_lock = threading.Lock()
+_pool = None
+_hilo = None
+
+def activos():
+    """True si las tareas van a otros procesos"""
+    return TRABAJADORES > 1
+
+def _obtener_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            contexto = multiprocessing.get_context(INICIO)
+            if INICIO == "forkserver":
+                contexto.set_forkserver_preload(PRECARGA)
+            _pool = ProcessPoolExecutor(max_workers=TRABAJADORES, mp_context=contexto)
+        return _pool
+
+def _sin_reimportar_principal():
+    """Evita que cada trabajador nuevo vuelva a ejecutar el script principal.
+
+    Un trabajador (spawn o forkserver) ejecuta el __main__ del proceso que
+    lo crea, salvo si su ``__spec__`` se llama "__main__". Dentro de
+    Streamlit ese __main__ es app.py, sin ``__spec__``: el trabajador
+    cargaría el torneo y dibujaría la página. Las tareas son funciones de
+    otros módulos, así que no lo necesitan.
+    """
+    principal = sys.modules["__main__"]
+    if getattr(principal, "__spec__", None) is None:
+        principal.__spec__ = ModuleSpec("__main__", None)
+
+def _obtener_hilo():
+    global _hilo
+    with _lock:
+        if _hilo is None:
+            _hilo = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trabajador")
+        return _hilo
+
+def _descartar_pool(pool):
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def enviar(funcion, *args):
+    """Ejecuta ``funcion(*args)`` en un trabajador y devuelve su Future.
+
+    ``funcion`` y los argumentos tienen que poder serializarse con pickle, y
+    se serializan después de volver: no hay que pasar nada que se siga
+    modificando.
+    """
+    if TRABAJADORES == 1:
+        return _obtener_hilo().submit(funcion, *args)
+    if not activos():
+        futuro = Future()
+        try:
+            futuro.set_result(funcion(*args))
+        except Exception as error:
+            futuro.set_exception(error)
+        return futuro
+
+    pool = _obtener_pool()
+    _sin_reimportar_principal()
+    try:
+        return pool.submit(funcion, *args)
+    except BrokenProcessPool:
+        # Un trabajador murió (falta de memoria, por ejemplo): se crea otro pool
+        _descartar_pool(pool)
+        return _obtener_pool().submit(funcion, *args)
+
+def combinar(futuros, funcion):
+    """Future que se resuelve con ``funcion(resultados)`` cuando terminan todos"""
+    combinado = Future()
+    faltan = [len(futuros)]
+    lock = threading.Lock()
+
+    def terminado(_):
+        with lock:
+            faltan[0] -= 1
+            if faltan[0]:
+                return
+        try:
+            combinado.set_result(funcion([futuro.result() for futuro in futuros]))
+        except Exception as error:
+            combinado.set_exception(error)
+
+    if not futuros:
+        combinado.set_result(funcion([]))
+    for futuro in futuros:
+        futuro.add_done_callback(terminado)
+    return combinado
+
+def repartir(elementos, partes):
+    """Reparte ``elementos`` en como mucho ``partes`` trozos contiguos de tamaño parecido"""
+    partes = max(1, min(partes, len(elementos)))
+    limites = np.linspace(0, len(elementos), partes + 1).round().astype(int)
+    return [elementos[inicio:fin] for inicio, fin in zip(limites, limites[1:])]
+
+def _unir_simulaciones(resultados):
+    clasificacion = {}
+    partidos = {}
+    for resultado in resultados:
+        clasificacion.update(resultado["clasificacion"])
+        partidos.update(resultado["partidos"])
+    return {"clasificacion": clasificacion, "partidos": partidos}
+
+def simular(tabla, pendientes, jugados, simulaciones=SIMULACIONES, semilla=None):
+    """Future de ``simulacion.simular``, repartida por grupos entre los trabajadores.
+
+    Las fuerzas se ajustan aquí, con todos los resultados, y cada parte
+    simula sus grupos con su propia semilla derivada de ``semilla``. Las
+    filas se copian antes de volver, porque la tabla sigue cambiando.
+    """
+    inicio = time.perf_counter()
+    fuerzas = fuerzas_torneo(tabla, jugados)
+    grupos = tabla.grupos()
+    partes = repartir(grupos, TRABAJADORES * PARTES_POR_TRABAJADOR) if activos() else [grupos]
+    semillas = np.random.SeedSequence(semilla).spawn(len(partes))
+
+    futuros = []
+    for parte, semilla_parte in zip(partes, semillas):
+        filas = {grupo: {equipo: dict(fila) for equipo, fila in tabla.filas[grupo].items()} for grupo in parte}
+        pendientes_parte = [p for p in pendientes if p.get("grupo") in filas]
+        futuros.append(enviar(simular_grupos, filas, pendientes_parte, fuerzas, simulaciones, semilla_parte))
+    metricas.contar("tareas_trabajadores", len(futuros))
+
+    futuro = combinar(futuros, _unir_simulaciones)
+    futuro.add_done_callback(lambda _: metricas.anotar("trabajadores.simular", time.perf_counter() - inicio))
+    return futuro